@@ -1,26 +1,90 @@
 """API endpoints for document management and search functionality."""
 
+import asyncio
 import logging
 import time
+from collections.abc import Callable, Coroutine
 from pathlib import Path as FilePath
+from typing import Any
 
-from fastapi import APIRouter, Depends, File, HTTPException, Path, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.core.config import settings
-from app.core.exceptions import DocumentProcessingError
+from app.core.exceptions import (
+    DocumentProcessingError,
+    ServiceOverloadedError,
+    UploadTooLargeError,
+)
 from app.models.document import (
+    BulkFileResult,
+    BulkUploadResponse,
     DocumentBase,
     DocumentResponse,
+    IngestionJobResponse,
     SearchQuery,
     SearchResponse,
     SearchResult,
 )
+from app.services.container import container
 from app.services.document_service import DocumentService
+from app.services.ingestion import IngestionJob
 from app.services.vector_store import VectorStore
 
+
+class MultipartLimitRoute(APIRoute):
+    """Route that parses multipart bodies with the bulk upload file limit.
+
+    Starlette otherwise stops at 1000 files with a generic 400 before the
+    endpoint runs. The form is parsed here first and FastAPI reuses it, so
+    the limit is ``MAX_BULK_UPLOAD_FILES`` and passing it is reported as 413.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        """Wrap the endpoint handler so the form is parsed with the limit.
+
+        Returns:
+            Callable: The request handler
+        """
+        handler = super().get_route_handler()
+
+        async def parse_form_then_handle(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "")
+            if content_type.startswith("multipart/form-data"):
+                limit = settings.MAX_BULK_UPLOAD_FILES
+                try:
+                    await request.form(max_files=limit)
+                except StarletteHTTPException as e:
+                    if not str(e.detail).startswith("Too many files"):
+                        raise
+                    raise HTTPException(
+                        status_code=413,
+                        detail=(
+                            f"Too many files in one request, the limit is "
+                            f"{limit}; send more as ZIP or TAR archives"
+                        ),
+                    )
+            return await handler(request)
+
+        return parse_form_then_handle
+
+
 router = APIRouter(
     prefix="/documents",
     tags=["documents"],
+    route_class=MultipartLimitRoute,
     responses={
         status.HTTP_401_UNAUTHORIZED: {
             "description": "Missing or invalid API key",
@@ -45,31 +109,35 @@ logger = logging.getLogger(__name__)
 
 # Dependency for vector store
 async def get_vector_store() -> VectorStore:
-    """Get an instance of the vector store.
+    """Get the shared vector store instance.
 
     Returns:
-        VectorStore: A configured vector store instance
+        VectorStore: The process-wide vector store instance
     """
-    store = VectorStore()
-    return store
+    return container.get_vector_store()
 
 
 @router.post(
     "/upload",
     response_model=DocumentResponse,
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Upload a document",
-    description="Upload and process a document file (PDF, DOCX, or TXT).",
+    description=(
+        "Upload a document file (PDF, DOCX, or TXT) and queue it for ingestion."
+    ),
     responses={
-        status.HTTP_201_CREATED: {
-            "description": "Document uploaded successfully",
+        status.HTTP_202_ACCEPTED: {
+            "description": "Document stored and queued for ingestion",
             "content": {
                 "application/json": {
                     "example": {
-                        "message": "Document uploaded successfully",
+                        "message": "Document accepted for processing",
                         "filename": "example.pdf",
                         "size": 1024,
                         "path": "data/uploads/example.pdf",
+                        "sha256": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822c"
+                        "d15d6c15b0f00a08",
+                        "job_id": "3f2b9c1e0d7a4e5f8a6b1c2d3e4f5a6b",
                         "created_at": "2024-02-14T12:00:00Z",
                     }
                 }
@@ -89,6 +157,14 @@ async def get_vector_store() -> VectorStore:
                 }
             },
         },
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "description": "Ingestion queue is full",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Ingestion queue is full, try again later"}
+                }
+            },
+        },
     },
 )
 async def upload_document(
@@ -97,32 +173,180 @@ async def upload_document(
     )
 ) -> DocumentResponse:
     """
-    Upload and process a document.
+    Upload a document and queue it for ingestion.
 
-    The file will be validated, processed, and stored for later retrieval and searching.
-    Supported formats are PDF, DOCX, and TXT files.
+    The file is validated and stored, then parsed, chunked, embedded and
+    indexed in the background. Supported formats are PDF, DOCX, and TXT files.
 
     - Validates file format and size
-    - Processes document content
     - Stores the document for future access
+    - Returns the ID of the ingestion job; poll `/documents/jobs/{job_id}`
+      to follow it
     """
     try:
         logger.info(f"Processing upload request for file: {file.filename}")
         result = await document_service.process_document(file)
+        # The first call loads the embedding model; keep it off the event loop
+        pipeline = await asyncio.to_thread(container.get_ingestion_pipeline)
+        job = pipeline.submit(
+            FilePath(str(result["path"])),
+            {
+                "filename": result["filename"],
+                "path": result["path"],
+                "size": result["size"],
+                "sha256": result["sha256"],
+            },
+        )
         return DocumentResponse(
             filename=str(result["filename"]),
             size=int(result["size"]),
             path=str(result["path"]),
-            message="Document uploaded successfully",
+            sha256=str(result["sha256"]),
+            job_id=job.id,
+            message="Document accepted for processing",
         )
+    except UploadTooLargeError as e:
+        logger.warning(f"Upload rejected: {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
     except DocumentProcessingError as e:
         logger.error(f"Document processing error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    except ServiceOverloadedError as e:
+        logger.warning(f"Upload rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Unexpected error during document upload: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkUploadResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Upload documents in bulk",
+    description=(
+        "Upload many documents at once, as multiple files and/or ZIP or TAR "
+        "archives, and queue them for ingestion."
+    ),
+    responses={
+        status.HTTP_200_OK: {"description": "All documents ingested (wait=true)"},
+        status.HTTP_202_ACCEPTED: {"description": "Documents queued for ingestion"},
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {
+            "description": "More files than MAX_BULK_UPLOAD_FILES",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Too many files in one request, the limit is "
+                        "1000; send more as ZIP or TAR archives"
+                    }
+                }
+            },
+        },
+    },
+)
+async def bulk_upload_documents(
+    response: Response,
+    files: list[UploadFile] = File(
+        ..., description="Documents (PDF, DOCX, TXT) or ZIP/TAR archives of them"
+    ),
+    wait: bool = Query(
+        False, description="Wait until every document is indexed before replying"
+    ),
+) -> BulkUploadResponse:
+    """
+    Upload documents in bulk.
+
+    Archives are read one member at a time and each document is queued for
+    ingestion as soon as it is stored, so parsing overlaps with extraction.
+    Files in unsupported formats are skipped. The pipeline embeds chunks of
+    many documents in shared batches.
+
+    - Returns a result per file with its ingestion job ID
+    - Reports ingestion throughput; with `wait=true` the request returns once
+      every document is indexed and the throughput covers the whole pipeline
+    """
+    start_time = time.perf_counter()
+    pipeline = await asyncio.to_thread(container.get_ingestion_pipeline)
+
+    results: list[BulkFileResult] = []
+    jobs: dict[int, IngestionJob] = {}
+    async for entry in document_service.store_uploads(files):
+        if entry["status"] != "stored":
+            results.append(BulkFileResult(**entry))
+            continue
+        # Waits while the pipeline is saturated instead of rejecting files
+        job = await pipeline.enqueue(
+            FilePath(entry["path"]),
+            {key: entry[key] for key in ("filename", "path", "size", "sha256")},
+        )
+        jobs[len(results)] = job
+        results.append(
+            BulkFileResult(**{**entry, "status": "queued", "job_id": job.id})
+        )
+
+    ingested = [results[index] for index in jobs]
+    chunks_per_second = None
+    if wait:
+        await asyncio.gather(*(job.wait() for job in jobs.values()))
+        for index, job in jobs.items():
+            result = results[index]
+            result.status = "failed" if job.status == "failed" else "completed"
+            result.detail = job.error
+            result.chunks = job.chunks
+        ingested = [result for result in ingested if result.status == "completed"]
+        response.status_code = status.HTTP_200_OK
+
+    elapsed = time.perf_counter() - start_time
+    if wait:
+        chunks_per_second = sum(r.chunks or 0 for r in ingested) / elapsed
+    total_bytes = sum(result.size or 0 for result in ingested)
+
+    counts: dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    logger.info(f"Bulk upload of {len(results)} files: {counts}")
+
+    return BulkUploadResponse(
+        results=results,
+        counts=counts,
+        total_bytes=total_bytes,
+        elapsed_ms=elapsed * 1000,
+        files_per_second=len(ingested) / elapsed,
+        megabytes_per_second=total_bytes / (1024 * 1024) / elapsed,
+        chunks_per_second=chunks_per_second,
+    )
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=IngestionJobResponse,
+    summary="Get ingestion job status",
+    description="Report the progress and per-stage timings of an ingestion job.",
+    responses={
+        status.HTTP_404_NOT_FOUND: {
+            "description": "Job not found",
+            "content": {
+                "application/json": {"example": {"detail": "Job not found: 3f2b9c1e"}}
+            },
+        }
+    },
+)
+async def get_ingestion_job(
+    job_id: str = Path(..., description="ID returned by the upload endpoint")
+) -> IngestionJobResponse:
+    """
+    Retrieve the status of an ingestion job.
+
+    Returns the job's current stage, the number of chunks produced and, for
+    each stage reached so far, how long the job was queued and processed.
+    """
+    pipeline = await asyncio.to_thread(container.get_ingestion_pipeline)
+    job = pipeline.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return IngestionJobResponse(**job.to_dict())
+
+
 @router.get(
     "/{filename}",
     response_model=DocumentBase,
@@ -194,7 +418,7 @@ async def search_documents(
         logger.info(f"Processing search query: {query.query}")
         start_time = time.time()
 
-        results = await vector_store.search(query.query, query.limit)
+        results = await vector_store.search(query.query, query.limit, query.mode)
 
         # Convert results to response model
         search_results = [
@@ -206,6 +430,8 @@ async def search_documents(
                 ),
                 score=score,
                 snippet=snippet,
+                page_start=doc.get("page_start"),
+                page_end=doc.get("page_end"),
             )
             for doc, score, snippet in results
         ]
@@ -215,6 +441,9 @@ async def search_documents(
         return SearchResponse(
             results=search_results, total=len(search_results), query_time_ms=query_time
         )
+    except ServiceOverloadedError as e:
+        logger.warning(f"Search rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         raise HTTPException(status_code=500, detail="Search operation failed")
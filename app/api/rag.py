@@ -1,35 +1,92 @@
 """RAG (Retrieval-Augmented Generation) API endpoints for question answering."""
 
+import asyncio
+import json
+import logging
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import aclosing
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
-from app.api.documents import get_vector_store
+from app.core.config import settings
 from app.core.middleware import RateLimiter
+from app.services.cancellation import DISCONNECTED, CancellationToken
+from app.services.container import container
 from app.services.rag_service import RAGService
-from app.services.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 rate_limiter = RateLimiter(requests_per_minute=60)
 
 
-async def get_rag_service(
-    request: Request, vector_store: VectorStore = Depends(get_vector_store)
-) -> RAGService:
-    """Get an instance of the RAG service with rate limiting.
+def format_sse(data: dict[str, Any], event: str | None = None) -> str:
+    """Frame a payload as one Server-Sent Events message.
 
     Args:
-        request: The incoming request for rate limiting
-        vector_store: The vector store instance for document retrieval
+        data: JSON-serializable payload
+        event: Event name, or None for the default ``message`` event
 
     Returns:
-        RAGService: A configured RAG service instance
+        str: The framed message, terminated by a blank line
+    """
+    payload = json.dumps(data, default=str)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n"
+
+
+async def sse_stream(
+    events: AsyncGenerator[dict[str, Any], None],
+) -> AsyncIterator[str]:
+    """Frame streamed RAG events as SSE, reporting failures as an error event.
+
+    The response status has already been sent once streaming starts, so an
+    error is delivered in-band as an ``error`` event instead of an HTTP code.
+    ``events`` is closed along with this stream, so a disconnected client
+    cancels the generation behind it.
+
+    Args:
+        events: Events from ``RAGService.generate_streaming_response``
+
+    Yields:
+        str: SSE messages
+    """
+    try:
+        async with aclosing(events):
+            async for event in events:
+                yield format_sse(event)
+    except Exception as e:
+        logger.error(f"Streaming answer failed: {str(e)}")
+        yield format_sse({"detail": str(e), "finished": True}, event="error")
+
+
+async def cancel_on_disconnect(request: Request, token: CancellationToken) -> None:
+    """Cancel a request's token as soon as its client disconnects.
+
+    Only for endpoints that do not read the request body.
+
+    Args:
+        request: The incoming request
+        token: Token to cancel
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            token.cancel(DISCONNECTED)
+            return
+
+
+async def check_rate_limit(request: Request) -> None:
+    """Reject the request if the client exceeded the rate limit.
+
+    Args:
+        request: The incoming request for rate limiting
 
     Raises:
         HTTPException: If rate limit is exceeded
     """
-    # Check rate limit
     is_limited, count = await rate_limiter.is_rate_limited(request)
     if is_limited:
         error_msg = (
@@ -37,25 +94,51 @@ async def get_rag_service(
             "requests per minute."
         )
         raise HTTPException(status_code=429, detail=error_msg)
-    return RAGService(vector_store)
+
+
+async def get_rag_service(_: None = Depends(check_rate_limit)) -> RAGService:
+    """Get the shared RAG service once the rate limit check has passed.
+
+    The first call loads the LLM, so it runs in a worker thread to keep the
+    event loop free for other requests.
+
+    Returns:
+        RAGService: The process-wide RAG service instance
+    """
+    return await asyncio.to_thread(container.get_rag_service)
 
 
 @router.post("/ask")
 async def ask_question(
-    query: str, num_chunks: int = 3, rag_service: RAGService = Depends(get_rag_service)
+    request: Request,
+    query: str,
+    num_chunks: int = 3,
+    use_cache: bool = True,
+    rag_service: RAGService = Depends(get_rag_service),
 ) -> dict[str, Any]:
     """Ask a question and get a response using RAG.
 
+    Generation stops if the client disconnects, and fails with 504 once it
+    has run for GENERATION_TIMEOUT_SECONDS.
+
     Args:
+        request: The incoming request, watched for a client disconnect
         query: The question to ask
         num_chunks: Number of document chunks to retrieve
+        use_cache: Set to false to bypass the semantic answer cache
         rag_service: The RAG service instance
 
     Returns:
         dict[str, Any]: The generated response with context
     """
-    response = await rag_service.generate_response(query, num_chunks)
-    return response
+    token = CancellationToken(settings.GENERATION_TIMEOUT_SECONDS)
+    watcher = asyncio.create_task(cancel_on_disconnect(request, token))
+    try:
+        return await rag_service.generate_response(
+            query, num_chunks, use_cache, cancel_token=token
+        )
+    finally:
+        watcher.cancel()
 
 
 @router.post("/ask/stream")
@@ -64,6 +147,14 @@ async def ask_question_stream(
 ) -> StreamingResponse:
     """Ask a question and get a streaming response.
 
+    The answer is sent as Server-Sent Events while it is generated: one
+    ``data: {"token": ..., "finished": false}`` message per piece of text,
+    then ``data: {"context": [...], "context_packing": {...}, "finished":
+    true}``; ``context_packing`` reports chunks cut short or left out to fit
+    the context window. Failures, including passing
+    GENERATION_TIMEOUT_SECONDS, arrive as an ``event: error`` message.
+    Generation stops if the client disconnects.
+
     Args:
         query: The question to ask
         num_chunks: Number of document chunks to retrieve
@@ -72,7 +163,13 @@ async def ask_question_stream(
     Returns:
         StreamingResponse: A streaming response with generated text
     """
+    token = CancellationToken(settings.GENERATION_TIMEOUT_SECONDS)
+    events = rag_service.generate_streaming_response(
+        query, num_chunks, cancel_token=token
+    )
     return StreamingResponse(
-        rag_service.generate_streaming_response(query, num_chunks),
+        sse_stream(events),
         media_type="text/event-stream",
+        # Deliver each event immediately through caches and reverse proxies
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
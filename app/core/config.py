@@ -29,17 +29,39 @@ class Settings(BaseSettings):
     # Document Processing
     UPLOAD_DIR: Path = Path("data/uploads")
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB in bytes
+    UPLOAD_READ_SIZE: int = 1024 * 1024  # Bytes read from an upload at a time
+    MAX_ARCHIVE_ENTRIES: int = 100_000  # Files taken from one bulk archive
+    # Files in one multipart request; more are rejected, send them as archives
+    MAX_BULK_UPLOAD_FILES: int = 1000
+    MAX_BULK_UPLOAD_SIZE: int = 1024 * 1024 * 1024  # Bytes stored per bulk upload
+    # Compressed text and metadata extracted from uploads, keyed by content hash
+    EXTRACTION_CACHE_DIR: Path = Path("data/extraction_cache")
+    EXTRACTION_CACHE_COMPRESSION_LEVEL: int = 6  # zlib level, 0-9
 
     # Vector Store
     CHROMA_DB_DIR: Path = Path("data/chromadb")
     COLLECTION_NAME: str = "documents"
     VECTOR_DB_HOST: str = "vectordb"
     VECTOR_DB_PORT: int = 8001
+    VECTOR_WRITE_BATCH_SIZE: int = 1024  # Max chunks per collection.add call
+    # Changes to the sparse index within this many seconds are saved together
+    SPARSE_INDEX_SAVE_SECONDS: float = 30
 
     # Embedding
     EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
-    CHUNK_SIZE: int = 512
-    CHUNK_OVERLAP: int = 50
+    # Chunk size and overlap in embedding-model tokens; chunks are also capped
+    # at the embedding model's maximum sequence length
+    CHUNK_SIZE: int = 256
+    CHUNK_OVERLAP: int = 32
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # Max queries per micro-batch
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # Max time a query waits for a batch
+    QUERY_CACHE_MAX_ENTRIES: int = 10000
+    QUERY_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # Memory budget for vectors
+    QUERY_CACHE_TTL_SECONDS: float = 3600
+    # On-disk cache of chunk embeddings reused when documents are re-indexed
+    EMBEDDING_CACHE_DIR: Path = Path("data/embedding_cache")
+    EMBEDDING_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # 0 disables the cache
+    EMBEDDING_CACHE_DTYPE: str = "float16"  # float16 or float32
 
     # LLM settings
     LLM_MODEL_NAME: str = "mistralai/Mistral-7B-Instruct-v0.2"
@@ -47,6 +69,48 @@ class Settings(BaseSettings):
     TEMPERATURE: float = 0.7
     TOP_P: float = 0.95
     CONTEXT_WINDOW: int = 4096
+    # Generation stops once a request has run this long, queueing included
+    GENERATION_TIMEOUT_SECONDS: float = 120
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # Min cosine for a hit
+    ANSWER_CACHE_TTL_SECONDS: float = 24 * 3600
+
+    # Executors (workers, and tasks allowed to wait for a worker)
+    EMBEDDING_WORKERS: int = 1
+    EMBEDDING_MAX_PENDING: int = 64
+    # Document chunks are embedded by their own workers, so a large upload
+    # never queues in front of query embeddings
+    INGEST_EMBEDDING_WORKERS: int = 1
+    INGEST_EMBEDDING_MAX_PENDING: int = 16
+    VECTOR_DB_WORKERS: int = 4
+    VECTOR_DB_MAX_PENDING: int = 64
+    PARSING_WORKERS: int = 2
+    PARSING_MAX_PENDING: int = 16
+    # Chunking, token counting and extraction cache reads of documents being
+    # ingested, kept off the vector_db workers that searches wait on
+    CHUNKING_WORKERS: int = 2
+    CHUNKING_MAX_PENDING: int = 16
+    # PDFs with this many pages are extracted in page ranges across the
+    # parsing workers, each range holding at least PDF_MIN_PAGES_PER_RANGE
+    PDF_PARALLEL_MIN_PAGES: int = 200
+    PDF_MIN_PAGES_PER_RANGE: int = 50
+    GENERATION_WORKERS: int = 1
+    GENERATION_MAX_PENDING: int = 4
+    # Concurrent generations decoded together in one batch; 1 runs each
+    # request through the pipeline on its own in a generation worker
+    GENERATION_MAX_BATCH_SIZE: int = 8
+    # Attention keys and values of prompt prefixes reused across requests
+    PREFIX_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 0 disables the cache
+    PREFIX_CACHE_BLOCK_TOKENS: int = 16
+
+    # Ingestion pipeline (workers per stage, and jobs buffered between stages)
+    INGEST_PARSE_WORKERS: int = 2
+    INGEST_CHUNK_WORKERS: int = 2
+    INGEST_EMBED_WORKERS: int = 1
+    INGEST_WRITE_WORKERS: int = 1
+    INGEST_QUEUE_SIZE: int = 16
+    # Finished jobs kept for status queries; unfinished jobs are always kept
+    INGEST_MAX_JOBS: int = 10_000
 
     # Security
     API_KEY_HEADER: str = "X-API-Key"
@@ -10,12 +10,42 @@ class DocumentProcessingError(Exception):
     pass
 
 
+class UploadTooLargeError(DocumentProcessingError):
+    """Raised when an upload exceeds the maximum allowed size."""
+
+    pass
+
+
+class BulkUploadTooLargeError(UploadTooLargeError):
+    """Raised when the files of one bulk upload exceed their total size limit."""
+
+    pass
+
+
 class RAGError(Exception):
     """Raised when there's an error in the RAG pipeline."""
 
     pass
 
 
+class GenerationCancelledError(RAGError):
+    """Raised when generation stops because the client disconnected."""
+
+    pass
+
+
+class GenerationTimeoutError(GenerationCancelledError):
+    """Raised when generation stops because the request deadline passed."""
+
+    pass
+
+
+class ServiceOverloadedError(Exception):
+    """Raised when a worker pool is saturated and cannot accept more work."""
+
+    pass
+
+
 async def exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Handle custom exceptions and return appropriate JSON responses.
 
@@ -27,9 +57,18 @@ async def exception_handler(request: Request, exc: Exception) -> JSONResponse:
         JSONResponse: A JSON response with appropriate status code and error message
     """
     status_code = 500
-    if isinstance(exc, DocumentProcessingError):
+    if isinstance(exc, UploadTooLargeError):
+        status_code = 413
+    elif isinstance(exc, DocumentProcessingError):
         status_code = 400
+    elif isinstance(exc, GenerationTimeoutError):
+        status_code = 504
+    elif isinstance(exc, GenerationCancelledError):
+        # Nobody is listening; "client closed request" for the access log
+        status_code = 499
     elif isinstance(exc, RAGError):
         status_code = 422
+    elif isinstance(exc, ServiceOverloadedError):
+        status_code = 503
 
     return JSONResponse(status_code=status_code, content={"detail": str(exc)})
@@ -0,0 +1,226 @@
+"""Bounded executors that keep blocking work off the event loop."""
+
+import asyncio
+import functools
+import multiprocessing
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, TypeVar
+
+from app.core.config import settings
+from app.core.exceptions import ServiceOverloadedError
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """Thread or process pool that rejects work once its queue is full.
+
+    At most ``max_workers`` tasks run at once and at most ``max_pending`` more
+    wait for a worker. Further submissions fail fast with
+    ``ServiceOverloadedError`` instead of queueing without bound, so one
+    saturated workload cannot build an ever-growing backlog.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_pending: int,
+        use_processes: bool = False,
+    ) -> None:
+        """Initialize the executor. The worker pool is created on first use.
+
+        Args:
+            name: Name used in logs, errors and metrics
+            max_workers: Number of worker threads or processes
+            max_pending: Number of tasks allowed to wait for a free worker
+            use_processes: Use a process pool instead of a thread pool
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self._lock = threading.Lock()
+        self._executor: Executor | None = None
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._task_times = metrics.histogram(f"executor_{name}_task_ms")
+
+    def _get_executor(self) -> Executor:
+        """Return the worker pool, creating it if needed.
+
+        Must be called with the lock held.
+
+        Returns:
+            Executor: The underlying thread or process pool
+        """
+        if self._executor is None:
+            if self.use_processes:
+                # Spawn rather than fork: the parent holds model and BLAS threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+        return self._executor
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """Submit a blocking call unless the executor is saturated.
+
+        Args:
+            fn: Function to run in a worker
+            *args: Positional arguments for ``fn``
+            **kwargs: Keyword arguments for ``fn``
+
+        Returns:
+            Future[T]: Future for the call's result
+
+        Raises:
+            ServiceOverloadedError: If the worker queue is full
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise ServiceOverloadedError(
+                    f"The {self.name} workers are busy. Please try again later."
+                )
+            self._in_flight += 1
+            executor = self._get_executor()
+
+        started = time.perf_counter()
+        try:
+            future = executor.submit(functools.partial(fn, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+        def _done(_: "Future[T]") -> None:
+            self._task_times.observe((time.perf_counter() - started) * 1000)
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+
+        future.add_done_callback(_done)
+        return future
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking call in a worker and await its result.
+
+        Args:
+            fn: Function to run in a worker
+            *args: Positional arguments for ``fn``
+            **kwargs: Keyword arguments for ``fn``
+
+        Returns:
+            T: The function's return value
+
+        Raises:
+            ServiceOverloadedError: If the worker queue is full
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker pool, dropping tasks that have not started.
+
+        Args:
+            wait: Wait for running tasks to finish
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth and throughput counters.
+
+        Returns:
+            dict[str, Any]: Worker limits, in-flight tasks and totals
+        """
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+class ExecutorRegistry:
+    """Separately sized executors for each kind of blocking workload."""
+
+    def __init__(self) -> None:
+        """Create the executors from application settings."""
+        self.embedding = BoundedExecutor(
+            "embedding", settings.EMBEDDING_WORKERS, settings.EMBEDDING_MAX_PENDING
+        )
+        self.ingest_embedding = BoundedExecutor(
+            "ingest_embedding",
+            settings.INGEST_EMBEDDING_WORKERS,
+            settings.INGEST_EMBEDDING_MAX_PENDING,
+        )
+        self.vector_db = BoundedExecutor(
+            "vector_db", settings.VECTOR_DB_WORKERS, settings.VECTOR_DB_MAX_PENDING
+        )
+        self.parsing = BoundedExecutor(
+            "parsing",
+            settings.PARSING_WORKERS,
+            settings.PARSING_MAX_PENDING,
+            use_processes=True,
+        )
+        self.chunking = BoundedExecutor(
+            "chunking", settings.CHUNKING_WORKERS, settings.CHUNKING_MAX_PENDING
+        )
+        self.generation = BoundedExecutor(
+            "generation",
+            settings.GENERATION_WORKERS,
+            settings.GENERATION_MAX_PENDING,
+        )
+
+    def all(self) -> list[BoundedExecutor]:
+        """Return every managed executor.
+
+        Returns:
+            list[BoundedExecutor]: The executors
+        """
+        return [
+            self.embedding,
+            self.ingest_embedding,
+            self.vector_db,
+            self.parsing,
+            self.chunking,
+            self.generation,
+        ]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down every executor.
+
+        Args:
+            wait: Wait for running tasks to finish
+        """
+        for executor in self.all():
+            executor.shutdown(wait=wait)
+
+    def stats(self) -> dict[str, Any]:
+        """Return statistics for every executor.
+
+        Returns:
+            dict[str, Any]: Executor statistics keyed by name
+        """
+        return {executor.name: executor.stats() for executor in self.all()}
+
+
+executors = ExecutorRegistry()
@@ -0,0 +1,141 @@
+"""In-process metrics: counters and fixed-bucket histograms."""
+
+import bisect
+import threading
+from collections.abc import Sequence
+from typing import Any
+
+# Bucket upper bounds for latencies measured in milliseconds
+LATENCY_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Bucket upper bounds for LLM generation latencies in milliseconds
+GENERATION_MS_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+# Bucket upper bounds for batch sizes
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    def __init__(self) -> None:
+        """Initialize the counter at zero."""
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the counter.
+
+        Args:
+            amount: Amount to add
+        """
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Thread-safe histogram with fixed, non-cumulative bucket counts."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        """Initialize an empty histogram.
+
+        Args:
+            buckets: Sorted bucket upper bounds; larger values go in an overflow
+                bucket
+        """
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation.
+
+        Args:
+            value: Observed value
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the current histogram state.
+
+        Returns:
+            dict[str, Any]: Count, sum, mean, max and per-bucket counts keyed by
+                upper bound (``"+Inf"`` for the overflow bucket)
+        """
+        with self._lock:
+            labels = [str(bound) for bound in self.buckets] + ["+Inf"]
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else 0.0,
+                "max": self.max,
+                "buckets": dict(zip(labels, self.counts)),
+            }
+
+
+class MetricsRegistry:
+    """Named collection of counters and histograms shared by the application."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._counters: dict[str, Counter] = {}
+        self._histograms: dict[str, Histogram] = {}
+
+    def counter(self, name: str) -> Counter:
+        """Return the counter with the given name, creating it if needed.
+
+        Args:
+            name: Metric name
+
+        Returns:
+            Counter: The shared counter
+        """
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter()
+            return self._counters[name]
+
+    def histogram(
+        self, name: str, buckets: Sequence[float] = LATENCY_MS_BUCKETS
+    ) -> Histogram:
+        """Return the histogram with the given name, creating it if needed.
+
+        Args:
+            name: Metric name
+            buckets: Bucket upper bounds used when the histogram is created
+
+        Returns:
+            Histogram: The shared histogram
+        """
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(buckets)
+            return self._histograms[name]
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the current value of every metric.
+
+        Returns:
+            dict[str, Any]: Counter values and histogram snapshots by name
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+        return {
+            "counters": {name: c.value for name, c in sorted(counters.items())},
+            "histograms": {
+                name: h.snapshot() for name, h in sorted(histograms.items())
+            },
+        }
+
+
+metrics = MetricsRegistry()
@@ -1,5 +1,9 @@
 """Initialize and configure the FastAPI application."""
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
@@ -8,13 +12,40 @@ from fastapi.staticfiles import StaticFiles
 
 from app.api import documents, rag
 from app.core.config import settings
-from app.core.exceptions import DocumentProcessingError, RAGError, exception_handler
+from app.core.exceptions import (
+    DocumentProcessingError,
+    RAGError,
+    ServiceOverloadedError,
+    exception_handler,
+)
+from app.core.executors import executors
 from app.core.logging import setup_logging
+from app.core.metrics import metrics as app_metrics
 from app.core.middleware import LoggingMiddleware
+from app.services.container import container
 
 # Setup logging
 logger = setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Build shared services at startup and release them at shutdown.
+
+    Args:
+        app: The FastAPI application instance
+
+    Yields:
+        None: Control back to the application while it is serving requests
+    """
+    container.startup()
+    app.state.container = container
+    try:
+        yield
+    finally:
+        container.shutdown()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
@@ -22,6 +53,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
     openapi_tags=[
         {
             "name": "documents",
@@ -49,6 +81,7 @@ app.add_middleware(LoggingMiddleware)
 # Register exception handlers
 app.add_exception_handler(DocumentProcessingError, exception_handler)
 app.add_exception_handler(RAGError, exception_handler)
+app.add_exception_handler(ServiceOverloadedError, exception_handler)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -109,6 +142,21 @@ async def health_check() -> dict[str, str]:
     return {"status": "healthy"}
 
 
+@app.get("/metrics", tags=["health"])
+async def metrics() -> dict[str, Any]:
+    """Report service counters and runtime metrics.
+
+    Returns:
+        dict[str, Any]: Counters for the shared services plus application
+            counters and histograms
+    """
+    return {
+        "services": container.stats(),
+        "executors": executors.stats(),
+        **app_metrics.snapshot(),
+    }
+
+
 @app.post("/documents")
 async def upload_document() -> JSONResponse:
     """Upload a document to the system."""
@@ -1,7 +1,7 @@
 """Pydantic models for document handling and search operations."""
 
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
@@ -11,6 +11,10 @@ def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+# Retrieval modes: dense vectors, sparse BM25 keywords, or both fused
+SearchMode = Literal["hybrid", "dense", "sparse"]
+
+
 class Document(BaseModel):
     """Document model for storing document information."""
 
@@ -21,6 +25,9 @@ class Document(BaseModel):
     metadata: dict[str, Any] = Field(
         default_factory=dict, description="Additional metadata"
     )
+    page_offsets: list[int] | None = Field(
+        None, description="Offset in the content where each page starts"
+    )
     created_at: datetime = Field(default_factory=utc_now)
     updated_at: datetime = Field(default_factory=utc_now)
 
@@ -37,9 +44,63 @@ class DocumentResponse(DocumentBase):
     """Response model for document operations."""
 
     message: str = Field(..., description="Operation status message")
+    sha256: str | None = Field(None, description="SHA-256 digest of the content")
+    job_id: str | None = Field(None, description="ID of the ingestion job")
     created_at: datetime = Field(default_factory=utc_now)
 
 
+class StageTiming(BaseModel):
+    """Time an ingestion job spent waiting for and running in one stage."""
+
+    queue_ms: float = Field(..., description="Time spent queued for the stage")
+    run_ms: float | None = Field(None, description="Time spent in the stage")
+
+
+class IngestionJobResponse(BaseModel):
+    """Status of a document ingestion job."""
+
+    job_id: str = Field(..., description="ID of the ingestion job")
+    status: Literal["queued", "parse", "chunk", "embed", "write", "completed", "failed"]
+    filename: str = Field(..., description="Name of the document file")
+    document_id: str | None = Field(None, description="ID of the parsed document")
+    chunks: int = Field(0, description="Number of chunks the document produced")
+    new_chunks: int = Field(0, description="Chunks embedded because they changed")
+    deleted_chunks: int = Field(0, description="Stored chunks no longer present")
+    unchanged: bool = Field(False, description="Whether the content was indexed")
+    error: str | None = Field(None, description="Why the job failed")
+    created_at: datetime
+    finished_at: datetime | None = None
+    stages: dict[str, StageTiming] = Field(
+        default_factory=dict, description="Timings of the stages run so far"
+    )
+
+
+class BulkFileResult(BaseModel):
+    """Outcome for one file of a bulk upload."""
+
+    filename: str = Field(..., description="File name, including archive path")
+    status: Literal["queued", "skipped", "failed", "completed"]
+    detail: str | None = Field(None, description="Why the file was not ingested")
+    size: int | None = Field(None, description="Size of the file in bytes")
+    sha256: str | None = Field(None, description="SHA-256 digest of the content")
+    job_id: str | None = Field(None, description="ID of the ingestion job")
+    chunks: int | None = Field(None, description="Chunks indexed, when waited for")
+
+
+class BulkUploadResponse(BaseModel):
+    """Response model for bulk uploads."""
+
+    results: list[BulkFileResult]
+    counts: dict[str, int] = Field(..., description="Number of files per status")
+    total_bytes: int = Field(..., description="Bytes of documents stored")
+    elapsed_ms: float = Field(..., description="Time taken by the request")
+    files_per_second: float = Field(..., description="Documents ingested per second")
+    megabytes_per_second: float = Field(..., description="Document MB per second")
+    chunks_per_second: float | None = Field(
+        None, description="Chunks indexed per second, when waited for"
+    )
+
+
 class SearchQuery(BaseModel):
     """Search query model."""
 
@@ -47,6 +108,10 @@ class SearchQuery(BaseModel):
     limit: int = Field(
         default=5, ge=1, le=20, description="Maximum number of results to return"
     )
+    mode: SearchMode = Field(
+        default="hybrid",
+        description="Retrieval mode: hybrid (BM25 + vectors), dense or sparse",
+    )
 
 
 class SearchResult(BaseModel):
@@ -55,6 +120,8 @@ class SearchResult(BaseModel):
     document: DocumentBase
     score: float = Field(..., description="Relevance score")
     snippet: str | None = Field(None, description="Matching text snippet")
+    page_start: int | None = Field(None, description="First page of the snippet")
+    page_end: int | None = Field(None, description="Last page of the snippet")
 
 
 class SearchResponse(BaseModel):
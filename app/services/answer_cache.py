@@ -0,0 +1,197 @@
+"""Semantic cache of generated answers keyed by query embedding."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+
+class CachedAnswer:
+    """A generated answer together with what it was generated from."""
+
+    def __init__(
+        self,
+        vector: np.ndarray,
+        corpus_generation: int,
+        num_chunks: int,
+        response: dict[str, Any],
+    ) -> None:
+        """Initialize a cache entry.
+
+        Args:
+            vector: Normalized embedding of the question
+            corpus_generation: Vector store generation the answer was built on
+            num_chunks: Number of context chunks the answer was built from
+            response: The response returned to the client
+        """
+        self.vector = vector
+        self.corpus_generation = corpus_generation
+        self.num_chunks = num_chunks
+        self.response = response
+        self.stored_at = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """Reuse answers for questions that are paraphrases of earlier ones.
+
+    A lookup hits when a cached question's embedding has a cosine similarity of
+    at least ``threshold`` with the new question, was answered from the same
+    number of chunks and against the same corpus generation. Any change to the
+    corpus invalidates every entry. Entries are evicted least recently used
+    first beyond ``max_entries`` and expire after ``ttl_seconds``.
+    """
+
+    def __init__(self, max_entries: int, threshold: float, ttl_seconds: float) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached answers
+            threshold: Minimum cosine similarity for a cache hit
+            ttl_seconds: Time after which an entry expires, 0 to disable
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        self._next_id = 0
+        self._corpus_generation: int | None = None
+        # Stacked vectors of all entries, rebuilt lazily after changes
+        self._matrix: np.ndarray | None = None
+        self._matrix_ids: list[int] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(
+        self, vector: np.ndarray, corpus_generation: int, num_chunks: int
+    ) -> dict[str, Any] | None:
+        """Find a cached answer for a semantically equivalent question.
+
+        Args:
+            vector: Normalized embedding of the question
+            corpus_generation: Current vector store generation
+            num_chunks: Number of context chunks requested
+
+        Returns:
+            dict[str, Any] | None: A copy of the cached response, or None
+        """
+        with self._lock:
+            self._invalidate_if_stale(corpus_generation)
+            self._expire()
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix_ids = list(self._entries)
+                self._matrix = np.vstack(
+                    [self._entries[i].vector for i in self._matrix_ids]
+                )
+
+            # Vectors are normalized, so the dot product is cosine similarity
+            similarities = self._matrix @ vector
+            for index in np.argsort(similarities)[::-1]:
+                if similarities[index] < self.threshold:
+                    break
+                entry_id = self._matrix_ids[index]
+                entry = self._entries[entry_id]
+                if entry.num_chunks == num_chunks:
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return dict(entry.response)
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        vector: np.ndarray,
+        corpus_generation: int,
+        num_chunks: int,
+        response: dict[str, Any],
+    ) -> None:
+        """Cache an answer.
+
+        Answers built on an older corpus generation than the cache has seen
+        are dropped, since the collection changed while they were generated.
+
+        Args:
+            vector: Normalized embedding of the question
+            corpus_generation: Vector store generation the answer was built on
+            num_chunks: Number of context chunks the answer was built from
+            response: The response returned to the client
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._invalidate_if_stale(corpus_generation)
+            if corpus_generation != self._corpus_generation:
+                return
+            self._entries[self._next_id] = CachedAnswer(
+                np.asarray(vector, dtype=np.float32),
+                corpus_generation,
+                num_chunks,
+                dict(response),
+            )
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def _invalidate_if_stale(self, corpus_generation: int) -> None:
+        """Drop every entry if the corpus has moved to a newer generation.
+
+        Must be called with the lock held.
+
+        Args:
+            corpus_generation: Current vector store generation
+        """
+        if self._corpus_generation is None or corpus_generation > (
+            self._corpus_generation
+        ):
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._corpus_generation = corpus_generation
+
+    def _expire(self) -> None:
+        """Remove entries older than the TTL. Must be called with the lock held."""
+        if not self.ttl_seconds:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [i for i, entry in self._entries.items() if entry.stored_at < cutoff]
+        for entry_id in expired:
+            del self._entries[entry_id]
+            self.evictions += 1
+        if expired:
+            self._matrix = None
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache size and hit/miss/eviction counters.
+
+        Returns:
+            dict[str, Any]: Cache statistics
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "corpus_generation": self._corpus_generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
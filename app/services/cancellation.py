@@ -0,0 +1,116 @@
+"""Cancellation tokens and deadlines that stop LLM generation early."""
+
+import threading
+import time
+from typing import Any
+
+import torch
+from transformers import StoppingCriteria  # type: ignore
+
+# Reasons a generation is cancelled, also used in metric names
+DISCONNECTED = "disconnect"
+DEADLINE = "deadline"
+
+
+class CancellationToken:
+    """Cancellation flag and deadline shared by a request and its generation.
+
+    The request side calls ``cancel`` when the client goes away; the worker
+    thread polls ``cancelled``, which also turns true once the deadline has
+    passed.
+    """
+
+    def __init__(self, timeout: float | None = None) -> None:
+        """Initialize the token.
+
+        Args:
+            timeout: Seconds from now until the deadline, None for no deadline
+        """
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self._lock = threading.Lock()
+        self._reason: str | None = None
+
+    def cancel(self, reason: str = DISCONNECTED) -> None:
+        """Cancel the request. Only the first reason given is kept.
+
+        Args:
+            reason: Why the request was cancelled
+        """
+        with self._lock:
+            if self._reason is None:
+                self._reason = reason
+
+    @property
+    def reason(self) -> str | None:
+        """Why the request was cancelled, or None if it is still live."""
+        if self._reason is None and self.expired:
+            self.cancel(DEADLINE)
+        return self._reason
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the request was cancelled or its deadline has passed."""
+        return self.reason is not None
+
+    @property
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+
+class CancellationCriteria(StoppingCriteria):
+    """Stopping criterion that ends generation once its token is cancelled.
+
+    ``generate`` calls it after every decoding step, so a cancelled
+    generation stops within one step. It also counts the steps taken and
+    records why it stopped generation, if it did.
+    """
+
+    def __init__(self, token: CancellationToken) -> None:
+        """Initialize the criterion.
+
+        Args:
+            token: Token of the request being generated
+        """
+        self.token = token
+        self.steps = 0
+        self.stopped_reason: str | None = None
+
+    def should_stop(self) -> bool:
+        """Check the token, remembering the reason if generation must stop.
+
+        Returns:
+            bool: Whether the request was cancelled or its deadline passed
+        """
+        reason = self.token.reason
+        if reason is not None and self.stopped_reason is None:
+            self.stopped_reason = reason
+        return reason is not None
+
+    def step(self) -> bool:
+        """Count a decoding step and check whether generation must stop.
+
+        Returns:
+            bool: Whether the request was cancelled or its deadline passed
+        """
+        self.steps += 1
+        return self.should_stop()
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: Any, **kwargs: Any
+    ) -> torch.BoolTensor:
+        """Decide after a decoding step whether every sequence should stop.
+
+        Args:
+            input_ids: Sequences generated so far
+            scores: Scores of the last step, unused
+
+        Returns:
+            torch.BoolTensor: One flag per sequence, all equal
+        """
+        return torch.full(
+            (input_ids.shape[0],),
+            self.step(),
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
@@ -0,0 +1,352 @@
+"""Token-aware streaming chunker for document text."""
+
+import re
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, NamedTuple
+
+# End of a sentence (with trailing quotes/brackets) or a paragraph break
+BOUNDARY_PATTERN = re.compile(r"[.!?][\"')\]]*\s+|\n[ \t]*\n\s*")
+
+# Characters of unbroken text buffered per token before it is cut anyway
+MAX_CHARS_PER_TOKEN = 16
+
+# Sentences measured per tokenizer call
+MEASURE_BATCH_SIZE = 256
+
+
+class Chunk(NamedTuple):
+    """A chunk of document text sized in tokenizer tokens.
+
+    ``page_start`` and ``page_end`` are the first and last page the chunk's
+    text came from when the text was chunked page by page.
+    """
+
+    text: str
+    token_count: int
+    page_start: int | None = None
+    page_end: int | None = None
+
+
+class _Unit(NamedTuple):
+    """A sentence (or sentence fragment) waiting to be packed into a chunk."""
+
+    text: str
+    token_count: int
+    paragraph_end: bool
+    page_start: int | None = None
+    page_end: int | None = None
+
+
+class _Sentence(NamedTuple):
+    """A raw sentence cut from the text stream, with the pages it spans."""
+
+    text: str
+    paragraph_end: bool
+    page_start: int | None
+    page_end: int | None
+
+
+class TokenChunker:
+    """Split text into chunks that fit the embedding model's sequence length.
+
+    Chunks are measured in tokenizer tokens, packed from whole sentences and
+    closed early at paragraph breaks once they are at least half full.
+    Consecutive chunks share up to ``overlap_tokens`` tokens of trailing
+    sentences. Sentences longer than a chunk are split on token boundaries.
+
+    Input is consumed as a stream of text pieces, so only the current chunk
+    and an unfinished sentence are ever held in memory.
+    """
+
+    def __init__(self, tokenizer: Any, max_tokens: int, overlap_tokens: int) -> None:
+        """Initialize the chunker.
+
+        Args:
+            tokenizer: Hugging Face tokenizer of the embedding model
+            max_tokens: Maximum tokens per chunk, excluding special tokens
+            overlap_tokens: Tokens of context repeated between chunks
+        """
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self._max_pending_chars = max_tokens * MAX_CHARS_PER_TOKEN
+
+    def count_tokens(self, texts: Sequence[str]) -> list[int]:
+        """Count tokens for several texts in one tokenizer call.
+
+        Args:
+            texts: Texts to measure
+
+        Returns:
+            list[int]: Token count of each text, without special tokens
+        """
+        if not texts:
+            return []
+        encoded = self.tokenizer(list(texts), add_special_tokens=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def chunk_text(self, text: str) -> list[Chunk]:
+        """Chunk a complete text.
+
+        Args:
+            text: Text to chunk
+
+        Returns:
+            list[Chunk]: The chunks in document order
+        """
+        return list(self.chunk([text]))
+
+    def chunk(self, pieces: Iterable[str]) -> Iterator[Chunk]:
+        """Chunk a stream of text pieces such as file blocks.
+
+        Args:
+            pieces: Consecutive pieces of one document's text
+
+        Yields:
+            Chunk: The chunks in document order
+        """
+        return self._chunk(pieces, first_page=None)
+
+    def chunk_pages(self, pages: Iterable[str], first_page: int = 1) -> Iterator[Chunk]:
+        """Chunk a stream of pages, recording the pages each chunk spans.
+
+        Pages are joined exactly as given, so sentences and overlap carry
+        across page boundaries and the chunk texts match ``chunk`` over the
+        same text.
+
+        Args:
+            pages: Consecutive pages of one document's text
+            first_page: Number of the first page
+
+        Yields:
+            Chunk: The chunks in document order, with ``page_start`` and
+                ``page_end`` set
+        """
+        return self._chunk(pages, first_page=first_page)
+
+    def _chunk(self, pieces: Iterable[str], first_page: int | None) -> Iterator[Chunk]:
+        """Pack measured sentences from a text stream into chunks.
+
+        Args:
+            pieces: Consecutive pieces of one document's text
+            first_page: Page number of the first piece, or None if the pieces
+                are not pages
+
+        Yields:
+            Chunk: The chunks in document order
+        """
+        current: list[_Unit] = []
+        total = 0
+        has_new_text = False
+        for unit in self._units(pieces, first_page):
+            if current and total + unit.token_count > self.max_tokens:
+                yield self._emit(current, total)
+                current, total = self._overlap(current)
+                # Drop carried sentences until the new one fits
+                while current and total + unit.token_count > self.max_tokens:
+                    total -= current.pop(0).token_count
+            current.append(unit)
+            total += unit.token_count
+            has_new_text = True
+            if unit.paragraph_end and total >= self.max_tokens // 2:
+                yield self._emit(current, total)
+                current, total = self._overlap(current)
+                has_new_text = False
+
+        # Do not emit a chunk made only of overlap carried from the last one
+        if current and has_new_text:
+            yield self._emit(current, total)
+
+    def _units(
+        self, pieces: Iterable[str], first_page: int | None = None
+    ) -> Iterator[_Unit]:
+        """Split streamed text into measured sentences.
+
+        Args:
+            pieces: Consecutive pieces of text
+            first_page: Page number of the first piece, or None if the pieces
+                are not pages
+
+        Yields:
+            _Unit: Sentences no longer than ``max_tokens``
+        """
+        pending = ""
+        # Offsets in ``pending`` where each buffered page starts
+        pages: list[tuple[int, int | None]] = []
+        for number, piece in enumerate(pieces):
+            page = None if first_page is None else first_page + number
+            pages.append((len(pending), page))
+            pending += piece
+            sentences: list[_Sentence] = []
+            position = 0
+            for match in BOUNDARY_PATTERN.finditer(pending):
+                sentences.append(
+                    self._sentence(
+                        pending,
+                        position,
+                        match.end(),
+                        "\n" in match.group(),
+                        pages,
+                    )
+                )
+                position = match.end()
+                if len(sentences) >= MEASURE_BATCH_SIZE:
+                    yield from self._measure(sentences)
+                    sentences = []
+
+            # Cut text that never reaches a boundary at the last whitespace,
+            # so the buffer stays within one window however long the run is
+            while len(pending) - position > self._max_pending_chars:
+                limit = position + self._max_pending_chars
+                cut = max(
+                    pending.rfind(" ", position, limit),
+                    pending.rfind("\n", position, limit),
+                )
+                cut = cut if cut > position else limit
+                sentences.append(self._sentence(pending, position, cut, False, pages))
+                position = cut
+                if len(sentences) >= MEASURE_BATCH_SIZE:
+                    yield from self._measure(sentences)
+                    sentences = []
+
+            pending = pending[position:]
+            pages = self._rebase_pages(pages, position)
+            yield from self._measure(sentences)
+
+        yield from self._measure(
+            [self._sentence(pending, 0, len(pending), True, pages)]
+        )
+
+    @staticmethod
+    def _sentence(
+        text: str,
+        start: int,
+        end: int,
+        paragraph_end: bool,
+        pages: list[tuple[int, int | None]],
+    ) -> _Sentence:
+        """Cut a sentence from buffered text and find the pages it spans.
+
+        Args:
+            text: Buffered text
+            start: Offset of the sentence in ``text``
+            end: Offset one past the end of the sentence
+            paragraph_end: Whether the sentence ends a paragraph
+            pages: Offsets in ``text`` where each buffered page starts
+
+        Returns:
+            _Sentence: The sentence
+        """
+        raw = text[start:end]
+        first = start + len(raw) - len(raw.lstrip())
+        last = max(first, start + len(raw.rstrip()) - 1)
+        page_start = page_end = None
+        for offset, page in pages:
+            if offset <= first:
+                page_start = page
+            if offset <= last:
+                page_end = page
+        return _Sentence(raw, paragraph_end, page_start, page_end)
+
+    @staticmethod
+    def _rebase_pages(
+        pages: list[tuple[int, int | None]], position: int
+    ) -> list[tuple[int, int | None]]:
+        """Shift page offsets after consumed text is dropped from the buffer.
+
+        Args:
+            pages: Offsets where each buffered page starts
+            position: Number of characters dropped from the buffer's start
+
+        Returns:
+            list[tuple[int, int | None]]: Offsets of the pages still buffered
+        """
+        rebased = [(offset - position, page) for offset, page in pages]
+        # Keep the page the remaining text starts in, drop those before it
+        current = max(i for i, (offset, _) in enumerate(rebased) if offset <= 0)
+        return [(0, rebased[current][1]), *rebased[current + 1 :]]
+
+    def _measure(self, sentences: list[_Sentence]) -> Iterator[_Unit]:
+        """Count tokens for sentences and split any that exceed a chunk.
+
+        Args:
+            sentences: Raw sentences with their pages and paragraph ends
+
+        Yields:
+            _Unit: Measured sentences in order
+        """
+        cleaned = [
+            sentence._replace(text=" ".join(sentence.text.split()))
+            for sentence in sentences
+        ]
+        cleaned = [sentence for sentence in cleaned if sentence.text]
+        counts = self.count_tokens([sentence.text for sentence in cleaned])
+        for sentence, count in zip(cleaned, counts):
+            if count <= self.max_tokens:
+                yield _Unit(sentence.text, count, *sentence[1:])
+            else:
+                yield from self._split_long(sentence)
+
+    def _split_long(self, sentence: _Sentence) -> Iterator[_Unit]:
+        """Split a sentence longer than a chunk on token boundaries.
+
+        Fragments keep the page range of the whole sentence.
+
+        Args:
+            sentence: The cleaned sentence
+
+        Yields:
+            _Unit: Fragments of at most ``max_tokens`` tokens
+        """
+        text = sentence.text
+        encoded = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True
+        )
+        offsets = encoded["offset_mapping"]
+        for start in range(0, len(offsets), self.max_tokens):
+            window = offsets[start : start + self.max_tokens]
+            is_last = start + self.max_tokens >= len(offsets)
+            yield _Unit(
+                text[window[0][0] : window[-1][1]].strip(),
+                len(window),
+                sentence.paragraph_end and is_last,
+                sentence.page_start,
+                sentence.page_end,
+            )
+
+    def _overlap(self, units: list[_Unit]) -> tuple[list[_Unit], int]:
+        """Select the trailing sentences carried into the next chunk.
+
+        Args:
+            units: Sentences of the chunk just emitted
+
+        Returns:
+            tuple[list[_Unit], int]: Carried sentences and their token total
+        """
+        carried: list[_Unit] = []
+        total = 0
+        for unit in reversed(units):
+            if total + unit.token_count > self.overlap_tokens:
+                break
+            carried.insert(0, unit)
+            total += unit.token_count
+        return carried, total
+
+    @staticmethod
+    def _emit(units: list[_Unit], total: int) -> Chunk:
+        """Join sentences into a chunk, keeping paragraph breaks.
+
+        Args:
+            units: Sentences of the chunk
+            total: Their token total
+
+        Returns:
+            Chunk: The joined chunk
+        """
+        parts = []
+        for unit in units:
+            parts.append(unit.text)
+            parts.append("\n" if unit.paragraph_end else " ")
+        return Chunk(
+            "".join(parts[:-1]), total, units[0].page_start, units[-1].page_end
+        )
@@ -0,0 +1,145 @@
+"""Process-wide container for expensive, shareable service instances."""
+
+import logging
+import threading
+from typing import Any
+
+from app.core.executors import executors
+from app.services.extraction_cache import extraction_cache
+from app.services.ingestion import IngestionPipeline
+from app.services.model_registry import model_registry
+from app.services.rag_service import RAGService
+from app.services.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Build heavyweight services once per process and hand out shared instances.
+
+    The container is started and stopped by the application lifespan. Services
+    are also created lazily on first access so code paths that run outside the
+    lifespan (scripts, test clients used without a context manager) still share
+    a single instance instead of building their own.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty container."""
+        self._lock = threading.Lock()
+        self._vector_store: VectorStore | None = None
+        self.vector_store_instances = 0
+        self.vector_store_reuses = 0
+        self._ingestion: IngestionPipeline | None = None
+        # Separate lock so a slow LLM load never blocks vector store access
+        self._rag_lock = threading.Lock()
+        self._rag_service: RAGService | None = None
+        self.rag_service_instances = 0
+        self.rag_service_reuses = 0
+
+    def startup(self) -> None:
+        """Eagerly build all services so the first request does not pay for it."""
+        logger.info("Starting service container")
+        self.get_vector_store()
+
+    def shutdown(self) -> None:
+        """Release all services held by the container."""
+        logger.info("Shutting down service container")
+        with self._rag_lock:
+            if self._rag_service is not None:
+                self._rag_service.close()
+                self._rag_service = None
+        with self._lock:
+            if self._ingestion is not None:
+                self._ingestion.close()
+                self._ingestion = None
+            if self._vector_store is not None:
+                self._vector_store.close()
+                self._vector_store = None
+        model_registry.clear()
+        executors.shutdown()
+
+    def get_vector_store(self) -> VectorStore:
+        """Return the shared vector store, creating it on first use.
+
+        Returns:
+            VectorStore: The process-wide vector store instance
+        """
+        with self._lock:
+            if self._vector_store is None:
+                self._vector_store = VectorStore()
+                self.vector_store_instances += 1
+                logger.info("Created shared vector store instance")
+            else:
+                self.vector_store_reuses += 1
+            return self._vector_store
+
+    def get_ingestion_pipeline(self) -> IngestionPipeline:
+        """Return the shared ingestion pipeline, creating it on first use.
+
+        Returns:
+            IngestionPipeline: The process-wide ingestion pipeline
+        """
+        vector_store = self.get_vector_store()
+        with self._lock:
+            if self._ingestion is None:
+                self._ingestion = IngestionPipeline(vector_store)
+            return self._ingestion
+
+    def get_rag_service(self) -> RAGService:
+        """Return the shared RAG service, loading the LLM on first use.
+
+        The language model is loaded lazily rather than at startup so search
+        and upload endpoints do not wait for (or pay memory for) the LLM.
+
+        Returns:
+            RAGService: The process-wide RAG service instance
+        """
+        vector_store = self.get_vector_store()
+        with self._rag_lock:
+            if self._rag_service is None:
+                self._rag_service = RAGService(vector_store)
+                self.rag_service_instances += 1
+                logger.info("Created shared RAG service instance")
+            else:
+                self.rag_service_reuses += 1
+            return self._rag_service
+
+    def stats(self) -> dict[str, Any]:
+        """Return instance and reuse counters for the managed services.
+
+        Returns:
+            dict[str, Any]: Counters keyed by service name, plus ingestion
+                queue depths
+        """
+        return {
+            "vector_store": {
+                "instances": self.vector_store_instances,
+                "reuses": self.vector_store_reuses,
+                "active": self._vector_store is not None,
+                **(self._vector_store.stats() if self._vector_store else {}),
+            },
+            "rag_service": {
+                "instances": self.rag_service_instances,
+                "reuses": self.rag_service_reuses,
+                "active": self._rag_service is not None,
+                **(
+                    {
+                        "answer_cache": self._rag_service.answer_cache.stats(),
+                        "prefix_cache": self._rag_service.prefix_cache.stats(),
+                        "scheduler": (
+                            self._rag_service.scheduler.stats()
+                            if self._rag_service.scheduler
+                            else None
+                        ),
+                    }
+                    if self._rag_service
+                    else {}
+                ),
+            },
+            "ingestion": self._ingestion.stats() if self._ingestion else None,
+            "extraction_cache": extraction_cache.stats(),
+            "models": model_registry.stats(),
+        }
+
+
+container = ServiceContainer()
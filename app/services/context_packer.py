@@ -0,0 +1,136 @@
+"""Fit retrieved chunks into the token budget left in the LLM context window."""
+
+from collections.abc import Callable, Sequence
+from typing import Any, NamedTuple
+
+from app.services.chunker import BOUNDARY_PATTERN
+from app.services.vector_store import SearchHit
+
+# Tokens allowed per context line for tokenizing it as part of the prompt
+# rather than on its own, where tokens can merge or split at the seams
+LINE_SLACK_TOKENS = 1
+
+
+class PackedContext(NamedTuple):
+    """Retrieved chunks that fit the prompt's token budget."""
+
+    hits: list[SearchHit]
+    budget_tokens: int
+    used_tokens: int
+    # Chunks cut short at a sentence boundary, marked "truncated" in hits
+    truncated: int
+    # Chunks left out entirely
+    dropped: int
+
+    def report(self) -> dict[str, Any]:
+        """Summarize the packing for an API response.
+
+        Returns:
+            dict[str, Any]: Budget and usage in tokens and chunk counts
+        """
+        return {
+            "budget_tokens": self.budget_tokens,
+            "used_tokens": self.used_tokens,
+            "chunks": len(self.hits),
+            "truncated": self.truncated,
+            "dropped": self.dropped,
+        }
+
+
+class ContextPacker:
+    """Fill a token budget with retrieved chunks in order of relevance.
+
+    Chunks are taken whole while they fit, using the LLM token count stored
+    with each chunk at ingest when there is one. The first chunk that does
+    not fit is cut at the last sentence boundary that does, and every chunk
+    after it is dropped, so a less relevant chunk never displaces a more
+    relevant one.
+    """
+
+    def __init__(self, tokenizer: Any) -> None:
+        """Initialize the packer.
+
+        Args:
+            tokenizer: Tokenizer of the LLM the prompt is written for
+        """
+        self.tokenizer = tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens of a text, without special tokens.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            int: Number of tokens
+        """
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut a text at the last sentence boundary within a token budget.
+
+        Args:
+            text: Text to cut
+            max_tokens: Most tokens the result may have
+
+        Returns:
+            str: The longest run of whole sentences from the start of the
+                text that fits, or an empty string if not even the first
+                sentence does
+        """
+        ends = [match.end() for match in BOUNDARY_PATTERN.finditer(text)]
+        # Token counts grow with the prefix, so search for the last one fitting
+        low, high, best = 0, len(ends) - 1, ""
+        while low <= high:
+            middle = (low + high) // 2
+            prefix = text[: ends[middle]].rstrip()
+            if self.count_tokens(prefix) <= max_tokens:
+                best, low = prefix, middle + 1
+            else:
+                high = middle - 1
+        return best
+
+    def pack(
+        self,
+        hits: Sequence[SearchHit],
+        budget_tokens: int,
+        format_line: Callable[[dict[str, Any], float, str], str],
+    ) -> PackedContext:
+        """Select the chunks, whole or truncated, that fit a token budget.
+
+        Args:
+            hits: Retrieved chunks, most relevant first
+            budget_tokens: Tokens available for the context lines
+            format_line: Formats a chunk as its line of the prompt
+
+        Returns:
+            PackedContext: The chunks to put in the prompt and a report of
+                what was cut
+        """
+        packed: list[SearchHit] = []
+        used = truncated = dropped = 0
+        for index, (doc, score, snippet) in enumerate(hits):
+            if not snippet:
+                # Not part of the prompt, so free
+                packed.append((doc, score, snippet))
+                continue
+            remaining = budget_tokens - used
+            overhead = self.count_tokens(format_line(doc, score, ""))
+            overhead += LINE_SLACK_TOKENS
+            stored = doc.get("llm_token_count")
+            tokens = stored if stored is not None else self.count_tokens(snippet)
+            if overhead + tokens <= remaining:
+                packed.append((doc, score, snippet))
+                used += overhead + tokens
+                continue
+
+            cut = self.truncate(snippet, remaining - overhead)
+            if cut:
+                packed.append(({**doc, "truncated": True}, score, cut))
+                used += overhead + self.count_tokens(cut)
+                truncated += 1
+            else:
+                dropped += 1
+            dropped += sum(1 for _, _, later in hits[index + 1 :] if later)
+            break
+        return PackedContext(packed, budget_tokens, used, truncated, dropped)
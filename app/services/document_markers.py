@@ -0,0 +1,91 @@
+"""Persistent record of the documents whose indexing completed."""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class DocumentMarkers:
+    """Fingerprint of each document whose chunks are all stored, in SQLite.
+
+    A marker is removed before any chunk of its document is written or
+    changed, and set again only once the document's last write succeeded,
+    so a document whose indexing failed part way never looks current.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Open or create the marker database.
+
+        Args:
+            path: Location of the SQLite file
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = sqlite3.connect(
+            path, check_same_thread=False
+        )
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS markers (
+                document_id TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL
+            ) WITHOUT ROWID;
+            """)
+        self._db.commit()
+
+    def get(self, document_id: str) -> str | None:
+        """Look up the fingerprint a document was fully indexed with.
+
+        Args:
+            document_id: ID of the document
+
+        Returns:
+            str | None: The fingerprint, or None if the document is not
+                known to be fully indexed
+        """
+        with self._lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT fingerprint FROM markers WHERE document_id = ?",
+                (document_id,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, document_id: str, fingerprint: str) -> None:
+        """Record that a document is fully indexed.
+
+        Args:
+            document_id: ID of the document
+            fingerprint: Fingerprint its chunks were written with
+        """
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO markers (document_id, fingerprint) "
+                "VALUES (?, ?)",
+                (document_id, fingerprint),
+            )
+            self._db.commit()
+
+    def remove(self, document_id: str) -> None:
+        """Forget a document's marker before its chunks change.
+
+        Args:
+            document_id: ID of the document
+        """
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "DELETE FROM markers WHERE document_id = ?", (document_id,)
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
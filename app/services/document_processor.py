@@ -1,13 +1,284 @@
 """Service for processing and extracting content from various document formats."""
 
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 
 import fitz  # type: ignore  # PyMuPDF
-from docx import Document as DocxDocument
 
-from app.core.exceptions import DocumentProcessingError
+from app.core.config import settings
+from app.core.exceptions import DocumentProcessingError, ServiceOverloadedError
+from app.core.executors import executors
 from app.models.document import Document
+from app.services.docx_reader import iter_docx_text, read_core_properties
+from app.services.extraction_cache import extraction_cache, file_sha256, write_pieces
+from app.services.text_reader import detect_file_encoding, iter_text_file
+
+logger = logging.getLogger(__name__)
+
+# Versions of the extractors whose output is cached; bump one whenever its
+# output or the entry format changes so stale cache entries are no longer
+# used. Plain text is read directly, as caching it would only store a second
+# copy of the file.
+EXTRACTOR_VERSIONS = {".pdf": 3, ".docx": 3}
+
+
+def document_id_for(file_path: Path) -> str:
+    """Derive a stable document ID from a file's location.
+
+    The ID is a SHA-256 of the path relative to the upload directory (or of
+    the absolute path for files elsewhere), so it is the same in every process
+    and re-uploading a file under the same name replaces the same document.
+
+    Args:
+        file_path: Path to the document file
+
+    Returns:
+        str: 32 hex characters identifying the document
+    """
+    path = file_path.resolve()
+    try:
+        source = path.relative_to(settings.UPLOAD_DIR.resolve()).as_posix()
+    except ValueError:
+        source = path.as_posix()
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+
+
+class PinnedFile(NamedTuple):
+    """A stored file's content pinned under a private name while it is read.
+
+    Uploads are replaced by renaming a new file over the old one, never
+    rewritten in place, so the pinned link keeps the bytes that were hashed
+    even if the file is uploaded again before it has been parsed.
+    """
+
+    # Where the file was uploaded, which names the document
+    path: Path
+    # Private link to the content that was hashed, read by the parsers
+    pinned: Path
+    sha256: str
+
+    def release(self) -> None:
+        """Remove the private link. The uploaded file is left alone."""
+        self.pinned.unlink(missing_ok=True)
+
+    def duplicate(self) -> "PinnedFile":
+        """Link the pinned content under another private name.
+
+        Returns:
+            PinnedFile: The same content, released independently of this one
+        """
+        return self._replace(pinned=_link_privately(self.pinned))
+
+
+def _link_privately(file_path: Path) -> Path:
+    """Link a file under a private name next to it.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Path: A hard link to the same content, or a copy where hard links
+            are not supported
+    """
+    link = file_path.with_name(f".parse-{uuid.uuid4().hex}{file_path.suffix}")
+    try:
+        os.link(file_path, link)
+    except OSError:
+        shutil.copyfile(file_path, link)
+    return link
+
+
+def pin_file(file_path: Path) -> PinnedFile:
+    """Link a file under a private name and hash the linked content.
+
+    Args:
+        file_path: Path to the document file
+
+    Returns:
+        PinnedFile: The private link and the SHA-256 of its content
+    """
+    pinned = _link_privately(file_path)
+    try:
+        return PinnedFile(file_path, pinned, file_sha256(pinned))
+    except BaseException:
+        pinned.unlink(missing_ok=True)
+        raise
+
+
+class DocumentSource(NamedTuple):
+    """A parsed document whose text is read back from disk as it is chunked."""
+
+    id: str
+    title: str
+    doc_type: str
+    metadata: dict[str, Any]
+    # Opens a stream of the text in consecutive pieces, one per page if paged
+    read: Callable[[], Iterator[str]]
+    paged: bool
+    # Pinned content the text is streamed from, when it is not cached
+    file: PinnedFile | None = None
+
+    def release(self) -> None:
+        """Release the pinned content, once the text has been read."""
+        if self.file is not None:
+            self.file.release()
+
+
+def _separated(pieces: Iterable[str], separator: str = "\n") -> Iterator[str]:
+    """Yield pieces with a separator after every one but the last.
+
+    Args:
+        pieces: Consecutive pieces of text
+        separator: Text put between two pieces
+
+    Yields:
+        str: The pieces, so that joining them gives ``separator.join(pieces)``
+    """
+    previous: str | None = None
+    for piece in pieces:
+        if previous is not None:
+            yield previous + separator
+        previous = piece
+    if previous is not None:
+        yield previous
+
+
+def _read_cached(content_sha256: str, extractor: str) -> Iterator[str]:
+    """Stream cached text pieces, joined by newlines like the extractors' output.
+
+    Args:
+        content_sha256: Hex SHA-256 of the source file
+        extractor: Extractor name and version
+
+    Returns:
+        Iterator[str]: Consecutive pieces of the text
+    """
+    return _separated(extraction_cache.iter_pieces(content_sha256, extractor))
+
+
+def _read_pdf_metadata(file_path: Path) -> dict[str, Any]:
+    """Read a PDF's metadata without extracting any text.
+
+    Args:
+        file_path: Path to the PDF file
+
+    Returns:
+        dict[str, Any]: Page count, title, author and subject
+
+    Raises:
+        DocumentProcessingError: If the PDF cannot be opened
+    """
+    try:
+        with fitz.open(file_path) as pdf:
+            return {
+                "page_count": len(pdf),
+                "title": pdf.metadata.get("title", ""),
+                "author": pdf.metadata.get("author", ""),
+                "subject": pdf.metadata.get("subject", ""),
+            }
+    except Exception as e:
+        raise DocumentProcessingError(f"Error processing PDF: {str(e)}")
+
+
+def _iter_pdf_pages(file_path: Path, start: int, stop: int) -> Iterator[str]:
+    """Extract the text of a range of PDF pages one page at a time.
+
+    Args:
+        file_path: Path to the PDF file
+        start: Index of the first page
+        stop: Index one past the last page
+
+    Yields:
+        str: Text of each page in the range
+
+    Raises:
+        DocumentProcessingError: If there's an error processing the PDF
+    """
+    try:
+        with fitz.open(file_path) as pdf:
+            for number in range(start, stop):
+                yield pdf[number].get_text()
+    except Exception as e:
+        raise DocumentProcessingError(f"Error processing PDF: {str(e)}")
+
+
+def _write_pdf_pages(
+    file_path: Path, start: int, stop: int, part: Path, compression_level: int
+) -> None:
+    """Extract a range of PDF pages into part of an extraction cache entry.
+
+    Pages are written as they are extracted, so a worker holds one page of
+    text at a time however large the range is.
+
+    Args:
+        file_path: Path to the PDF file
+        start: Index of the first page
+        stop: Index one past the last page
+        part: File to write the pages to
+        compression_level: zlib compression level from 0 to 9
+
+    Raises:
+        DocumentProcessingError: If there's an error processing the PDF
+    """
+    write_pieces(part, _iter_pdf_pages(file_path, start, stop), compression_level)
+
+
+def pdf_page_ranges(
+    page_count: int, parts: int, min_pages: int
+) -> list[tuple[int, int]]:
+    """Split a PDF's pages into contiguous ranges of near-equal size.
+
+    Args:
+        page_count: Number of pages in the PDF
+        parts: Maximum number of ranges
+        min_pages: Minimum pages per range
+
+    Returns:
+        list[tuple[int, int]]: ``(start, stop)`` page indexes in order
+    """
+    parts = max(1, min(parts, page_count // max(min_pages, 1)))
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for part in range(parts):
+        stop = start + size + (1 if part < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _write_docx(file_path: Path, part: Path, compression_level: int) -> dict[str, Any]:
+    """Extract the text of a DOCX file into part of an extraction cache entry.
+
+    The document XML is streamed rather than loaded into a python-docx
+    model, and table rows are included in document order. Paragraphs are
+    written as they are read.
+
+    Args:
+        file_path: Path to the DOCX file
+        part: File to write the paragraphs to
+        compression_level: zlib compression level from 0 to 9
+
+    Returns:
+        dict[str, Any]: Document metadata
+
+    Raises:
+        DocumentProcessingError: If there's an error processing the DOCX
+    """
+    try:
+        write_pieces(part, iter_docx_text(file_path), compression_level)
+        return {"core_properties": read_core_properties(file_path)}
+
+    except Exception as e:
+        raise DocumentProcessingError(f"Error processing DOCX: {str(e)}")
 
 
 class DocumentProcessor:
@@ -17,7 +288,14 @@ class DocumentProcessor:
 
     @staticmethod
     async def process_document(file_path: Path) -> Document:
-        """Process a document file and extract its content.
+        """Process a document file and extract its whole content.
+
+        The file is pinned and hashed first, and every parser reads the
+        pinned content, so the hash recorded as the ``sha256`` metadata is
+        that of the bytes parsed even if the file is replaced meanwhile.
+        PDF and DOCX extractions are cached by that hash and extractor
+        version, so an unchanged file is only parsed once. Ingestion streams
+        the text with ``parse_document`` instead of holding it whole.
 
         Args:
             file_path: Path to the document file
@@ -28,6 +306,51 @@ class DocumentProcessor:
         Raises:
             DocumentProcessingError: If there's an error processing the document
         """
+        pinned = await DocumentProcessor.pin_document(file_path)
+        try:
+            source = await DocumentProcessor.parse_document(pinned)
+        finally:
+            pinned.release()
+
+        try:
+            pieces: list[str] = await executors.chunking.run(list, source.read())
+        except ServiceOverloadedError:
+            raise
+        except Exception as e:
+            raise DocumentProcessingError(f"Error processing document: {str(e)}")
+        finally:
+            source.release()
+        page_offsets = None
+        if source.paged:
+            page_offsets, position = [], 0
+            for piece in pieces:
+                page_offsets.append(position)
+                position += len(piece)
+        return Document(
+            id=source.id,
+            title=source.title,
+            content="".join(pieces),
+            doc_type=source.doc_type,
+            metadata=source.metadata,
+            page_offsets=page_offsets,
+        )
+
+    @staticmethod
+    async def pin_document(file_path: Path) -> PinnedFile:
+        """Pin a document file's current content and hash it.
+
+        Release the returned file once it has been parsed.
+
+        Args:
+            file_path: Path to the document file
+
+        Returns:
+            PinnedFile: The pinned content and its SHA-256
+
+        Raises:
+            DocumentProcessingError: If the format is unsupported or the file
+                cannot be read
+        """
         try:
             file_extension = file_path.suffix.lower()
 
@@ -37,116 +360,172 @@ class DocumentProcessor:
                 msg += f"Supported formats: {supported_formats_str}"
                 raise DocumentProcessingError(msg)
 
-            content = ""
-            metadata: dict[str, Any] = {}
-
-            # Process based on file type
-            if file_extension == ".pdf":
-                content, metadata = await DocumentProcessor._process_pdf(file_path)
-            elif file_extension == ".docx":
-                content, metadata = await DocumentProcessor._process_docx(file_path)
-            elif file_extension == ".txt":
-                content = await DocumentProcessor._process_txt(file_path)
-
-            # Create document object
-            document = Document(
-                id=str(hash(file_path)),
-                title=str(file_path.stem),
-                content=content,
-                doc_type=file_extension[1:],  # Remove the dot
-                metadata=metadata,
-            )
-
-            return document
+            return await executors.parsing.run(pin_file, file_path)
 
+        except (DocumentProcessingError, ServiceOverloadedError):
+            raise
         except Exception as e:
             raise DocumentProcessingError(f"Error processing document: {str(e)}")
 
     @staticmethod
-    async def _process_pdf(file_path: Path) -> tuple[str, dict[str, Any]]:
-        """Process PDF files using PyMuPDF.
+    async def parse_document(pinned: PinnedFile) -> DocumentSource:
+        """Extract a pinned document file for streaming into the chunker.
+
+        PDF and DOCX text is extracted into the extraction cache, unless it
+        is there already, and read back from it piece by piece: page by page
+        for PDFs, so chunks can record their pages. Plain text is decoded
+        block by block straight from a link to the pinned content, which
+        the source holds until it is released. The pinned file may be
+        released once this returns.
 
         Args:
-            file_path: Path to the PDF file
+            pinned: File returned by ``pin_document``
 
         Returns:
-            tuple[str, dict[str, Any]]: Tuple containing:
-                - str: Extracted text content
-                - dict: Document metadata
+            DocumentSource: The document, with metadata including the
+                ``sha256`` of the content parsed
 
         Raises:
-            DocumentProcessingError: If there's an error processing the PDF
+            DocumentProcessingError: If there's an error processing the document
         """
         try:
-            text_content = []
-            metadata = {}
-
-            # Extract text with PyMuPDF
-            with fitz.open(file_path) as pdf:
-                metadata = {
-                    "page_count": len(pdf),
-                    "title": pdf.metadata.get("title", ""),
-                    "author": pdf.metadata.get("author", ""),
-                    "subject": pdf.metadata.get("subject", ""),
-                }
-
-                for page in pdf:
-                    text_content.append(page.get_text())
+            file_path = pinned.path
+            file_extension = file_path.suffix.lower()
+            file: PinnedFile | None = None
 
-            return "\n".join(text_content), metadata
+            # Process based on file type
+            if file_extension in EXTRACTOR_VERSIONS:
+                extractor = (
+                    f"{file_extension[1:]}-v{EXTRACTOR_VERSIONS[file_extension]}"
+                )
+                metadata = await DocumentProcessor._extract_cached(pinned, extractor)
+                read: Callable[[], Iterator[str]] = partial(
+                    _read_cached, pinned.sha256, extractor
+                )
+            else:
+                encoding = await executors.parsing.run(
+                    detect_file_encoding, pinned.pinned
+                )
+                metadata = {"encoding": encoding}
+                file = await executors.chunking.run(pinned.duplicate)
+                read = partial(iter_text_file, file.pinned, encoding)
+
+            return DocumentSource(
+                id=document_id_for(file_path),
+                title=str(file_path.stem),
+                doc_type=file_extension[1:],  # Remove the dot
+                metadata={**metadata, "sha256": pinned.sha256},
+                read=read,
+                paged=file_extension == ".pdf",
+                file=file,
+            )
 
+        except ServiceOverloadedError:
+            raise
         except Exception as e:
-            raise DocumentProcessingError(f"Error processing PDF: {str(e)}")
+            raise DocumentProcessingError(f"Error processing document: {str(e)}")
 
     @staticmethod
-    async def _process_docx(file_path: Path) -> tuple[str, dict[str, Any]]:
-        """Process DOCX files.
+    async def _extract_cached(pinned: PinnedFile, extractor: str) -> dict[str, Any]:
+        """Extract a PDF or DOCX file into the cache unless it is there already.
+
+        The cache entry is what the text is streamed from afterwards, so an
+        entry that cannot be written fails the document.
 
         Args:
-            file_path: Path to the DOCX file
+            pinned: The pinned document file
+            extractor: Extractor name and version
 
         Returns:
-            tuple[str, dict[str, Any]]: Tuple containing:
-                - str: Extracted text content
-                - dict: Document metadata
-
-        Raises:
-            DocumentProcessingError: If there's an error processing the DOCX
+            dict[str, Any]: Extracted metadata
         """
-        try:
-            doc = DocxDocument(str(file_path))
-            paragraphs = [paragraph.text for paragraph in doc.paragraphs]
-            content = "\n".join(paragraphs)
-
-            metadata = {
-                "core_properties": {
-                    "author": doc.core_properties.author,
-                    "created": doc.core_properties.created,
-                    "modified": doc.core_properties.modified,
-                }
-            }
+        # Cache I/O runs in threads, so the hit and miss counters stay in
+        # this process
+        cached = await executors.chunking.run(
+            extraction_cache.get_metadata, pinned.sha256, extractor
+        )
+        if cached is not None:
+            return cached
+
+        if pinned.pinned.suffix.lower() == ".pdf":
+            return await DocumentProcessor._process_pdf(pinned, extractor)
+        return await DocumentProcessor._process_docx(pinned, extractor)
 
-            return content, metadata
+    @staticmethod
+    async def _process_pdf(pinned: PinnedFile, extractor: str) -> dict[str, Any]:
+        """Extract a PDF into the extraction cache in the parsing process pool.
 
-        except Exception as e:
-            raise DocumentProcessingError(f"Error processing DOCX: {str(e)}")
+        PDFs of at least ``PDF_PARALLEL_MIN_PAGES`` pages are split into one
+        page range per parsing worker, each extracted into its own part of
+        the cache entry concurrently; the parts are joined in page order.
+        Smaller PDFs are extracted by a single worker.
+
+        Args:
+            pinned: The pinned PDF file
+            extractor: Extractor name and version
+
+        Returns:
+            dict[str, Any]: Extracted metadata
+        """
+        file_path = pinned.pinned
+        metadata = await executors.parsing.run(_read_pdf_metadata, file_path)
+        page_count = metadata["page_count"]
+        ranges = pdf_page_ranges(
+            page_count,
+            executors.parsing.max_workers,
+            settings.PDF_MIN_PAGES_PER_RANGE,
+        )
+        if page_count < settings.PDF_PARALLEL_MIN_PAGES or len(ranges) < 2:
+            ranges = [(0, page_count)]
+
+        parts = [
+            await executors.chunking.run(extraction_cache.new_part) for _ in ranges
+        ]
+        results = await asyncio.gather(
+            *(
+                executors.parsing.run(
+                    _write_pdf_pages,
+                    file_path,
+                    start,
+                    stop,
+                    part,
+                    extraction_cache.compression_level,
+                )
+                for (start, stop), part in zip(ranges, parts)
+            ),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            for part in parts:
+                part.unlink(missing_ok=True)
+            raise errors[0]
+
+        await executors.chunking.run(
+            extraction_cache.assemble, pinned.sha256, extractor, metadata, parts
+        )
+        return metadata
 
     @staticmethod
-    async def _process_txt(file_path: Path) -> str:
-        """Process plain text files.
+    async def _process_docx(pinned: PinnedFile, extractor: str) -> dict[str, Any]:
+        """Extract a DOCX file into the extraction cache in the parsing pool.
 
         Args:
-            file_path: Path to the text file
+            pinned: The pinned DOCX file
+            extractor: Extractor name and version
 
         Returns:
-            str: Content of the text file
-
-        Raises:
-            DocumentProcessingError: If there's an error processing the text file
+            dict[str, Any]: Extracted metadata
         """
+        part = await executors.chunking.run(extraction_cache.new_part)
         try:
-            with open(file_path, encoding="utf-8") as f:
-                return f.read()
-
-        except Exception as e:
-            raise DocumentProcessingError(f"Error processing TXT: {str(e)}")
+            metadata = await executors.parsing.run(
+                _write_docx, pinned.pinned, part, extraction_cache.compression_level
+            )
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        await executors.chunking.run(
+            extraction_cache.assemble, pinned.sha256, extractor, metadata, [part]
+        )
+        return metadata
@@ -1,26 +1,223 @@
 """Service for handling document storage and retrieval operations."""
 
-from pathlib import Path
+import asyncio
+import hashlib
+import logging
+import os
+import tarfile
+import tempfile
+import zipfile
+from collections.abc import AsyncIterator, Iterator, Sequence
+from pathlib import Path, PurePosixPath
+from typing import IO, Any
 
 from fastapi import UploadFile
 
-from app.core.exceptions import DocumentProcessingError
+from app.core.config import settings
+from app.core.exceptions import (
+    BulkUploadTooLargeError,
+    DocumentProcessingError,
+    UploadTooLargeError,
+)
+from app.services.document_processor import DocumentProcessor
+
+logger = logging.getLogger(__name__)
+
+# Archive formats accepted by bulk upload, by filename suffix
+ARCHIVE_SUFFIXES = (
+    ".zip",
+    ".tar",
+    ".tar.gz",
+    ".tgz",
+    ".tar.bz2",
+    ".tbz2",
+    ".tar.xz",
+    ".txz",
+)
+
+
+def is_archive(filename: str) -> bool:
+    """Check whether a filename names a supported archive.
+
+    Args:
+        filename: Name of the uploaded file
+
+    Returns:
+        bool: True for ZIP and (compressed) TAR archives
+    """
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_stem(filename: str) -> Path:
+    """Return the directory an archive's members are stored under.
+
+    Args:
+        filename: Name of the uploaded archive
+
+    Returns:
+        Path: The archive's base name without its archive suffix
+    """
+    name = Path(filename).name
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.lower().endswith(suffix) and len(name) > len(suffix):
+            return Path(name[: -len(suffix)])
+    return Path(name)
+
+
+def safe_relative_path(name: str) -> Path | None:
+    """Turn an archive member name into a path safe to create in the upload dir.
+
+    Args:
+        name: Member name as stored in the archive
+
+    Returns:
+        Path | None: Relative path without ``..`` or absolute components, or
+            None for hidden files and archiver metadata such as ``__MACOSX``
+    """
+    parts = [
+        part
+        for part in PurePosixPath(name.replace("\\", "/")).parts
+        if part not in ("", ".", "..", "/")
+    ]
+    if not parts or parts[0] == "__MACOSX" or any(p.startswith(".") for p in parts):
+        return None
+    return Path(*parts)
+
+
+def iter_archive(fileobj: IO[bytes], filename: str) -> Iterator[tuple[str, IO[bytes]]]:
+    """Yield the regular files in an archive one at a time.
+
+    Each member is opened as a stream and must be consumed before the next
+    one is requested; TAR archives are read strictly sequentially, so nothing
+    is extracted up front.
+
+    Args:
+        fileobj: The archive file
+        filename: Name of the archive, used to detect its format
+
+    Yields:
+        tuple[str, IO[bytes]]: Member name and a stream of its content
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, member
+    else:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for tar_info in archive:
+                if not tar_info.isfile():
+                    continue
+                stream = archive.extractfile(tar_info)
+                if stream is not None:
+                    yield tar_info.name, stream
 
 
 class DocumentService:
     """Service for managing document storage and retrieval."""
 
-    def __init__(self, upload_dir: str = "data/uploads") -> None:
+    def __init__(
+        self,
+        upload_dir: str = "data/uploads",
+        max_upload_size: int = settings.MAX_UPLOAD_SIZE,
+        read_size: int = settings.UPLOAD_READ_SIZE,
+        max_archive_entries: int = settings.MAX_ARCHIVE_ENTRIES,
+        max_bulk_size: int = settings.MAX_BULK_UPLOAD_SIZE,
+    ) -> None:
         """Initialize the document service.
 
         Args:
             upload_dir: Directory path for storing uploaded documents
+            max_upload_size: Maximum size of an uploaded file in bytes
+            read_size: Number of bytes read from an upload at a time
+            max_archive_entries: Maximum number of files taken from an archive
+            max_bulk_size: Maximum total size in bytes of the files stored
+                from one bulk upload
         """
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.max_upload_size = max_upload_size
+        self.read_size = read_size
+        self.max_archive_entries = max_archive_entries
+        self.max_bulk_size = max_bulk_size
+
+    def store_stream(
+        self,
+        relative_path: Path,
+        stream: IO[bytes],
+        max_total: int | None = None,
+    ) -> dict[str, Any]:
+        """Copy a stream into the upload directory.
+
+        The stream is copied in ``read_size`` blocks into a temporary file in
+        the upload directory while its SHA-256 is computed, so memory use does
+        not grow with the file size. The temporary file is renamed into place
+        only once the whole stream has been read. This blocks, so call it in
+        a worker thread from async code.
+
+        Args:
+            relative_path: Destination path relative to the upload directory
+            stream: Binary stream to copy
+            max_total: Bytes left of the bulk upload this stream belongs to,
+                or None outside a bulk upload
+
+        Returns:
+            dict[str, Any]: Document information containing:
+                - filename: Path of the stored file relative to the upload dir
+                - size: Size of the file in bytes
+                - path: Path where the file is stored
+                - sha256: Hex digest of the file content
+
+        Raises:
+            UploadTooLargeError: If the stream exceeds ``max_upload_size``
+            BulkUploadTooLargeError: If the stream exceeds ``max_total``
+            DocumentProcessingError: If the stream is empty
+        """
+        file_path = self.upload_dir / relative_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path: Path | None = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=self.upload_dir, prefix=".upload-", delete=False
+            ) as tmp:
+                tmp_path = Path(tmp.name)
+                while block := stream.read(self.read_size):
+                    size += len(block)
+                    if size > self.max_upload_size:
+                        raise UploadTooLargeError(
+                            "File size exceeds maximum limit of "
+                            f"{self.max_upload_size // (1024 * 1024)}MB"
+                        )
+                    if max_total is not None and size > max_total:
+                        raise BulkUploadTooLargeError(
+                            "Bulk upload exceeds maximum total size of "
+                            f"{self.max_bulk_size // (1024 * 1024)}MB"
+                        )
+                    digest.update(block)
+                    tmp.write(block)
+
+            if size == 0:
+                raise DocumentProcessingError("Empty file is not allowed")
+
+            os.replace(tmp_path, file_path)
+            tmp_path = None
+        finally:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+
+        return {
+            "filename": relative_path.as_posix(),
+            "size": size,
+            "path": str(file_path),
+            "sha256": digest.hexdigest(),
+        }
 
     async def process_document(self, file: UploadFile) -> dict[str, str | int]:
-        """Process and store an uploaded document.
+        """Stream an uploaded document to disk.
 
         Args:
             file: The uploaded file to process
@@ -30,35 +227,182 @@ class DocumentService:
                 - filename: Name of the stored file
                 - size: Size of the file in bytes
                 - path: Path where the file is stored
+                - sha256: Hex digest of the file content
 
         Raises:
+            UploadTooLargeError: If the upload exceeds ``max_upload_size``
             DocumentProcessingError: If there's an error processing the document
         """
         try:
             # Create safe filename
             if file.filename is None:
                 raise DocumentProcessingError("Filename is required")
-            safe_filename = Path(file.filename).name
-            file_path = self.upload_dir / safe_filename
+            safe_filename = Path(Path(file.filename).name)
+            return await asyncio.to_thread(self.store_stream, safe_filename, file.file)
+        except DocumentProcessingError as e:
+            raise e
+        except Exception as e:
+            raise DocumentProcessingError(f"Error processing document: {str(e)}")
 
-            # Read and validate content
-            content = await file.read()
-            if len(content) == 0:
-                raise DocumentProcessingError("Empty file is not allowed")
+    async def store_uploads(
+        self, files: Sequence[UploadFile]
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Store several uploads, expanding archives into their member files.
+
+        Files are stored one at a time as they are read, so the caller can
+        start processing the first documents while later ones are still being
+        extracted. Files in unsupported formats are skipped, and a file that
+        cannot be stored is reported without stopping the others. Once the
+        stored files reach ``max_bulk_size`` in total, the file being written
+        is removed and reported as failed and the rest of the upload is
+        ignored, so an archive cannot expand beyond the limit on disk.
+
+        Args:
+            files: Uploaded documents and ZIP/TAR archives of documents
+
+        Yields:
+            dict[str, Any]: For each file, its ``filename`` and a ``status`` of
+                ``stored``, ``skipped`` or ``failed`` with a ``detail``; stored
+                files also carry the fields returned by ``store_stream``
+        """
+        remaining = self.max_bulk_size
+        for file in files:
+            entries = self._upload_entries(file)
+            async for entry in entries:
+                if isinstance(entry, dict):
+                    yield entry
+                    continue
+                relative_path, name, stream = entry
+                try:
+                    result = await self._store_entry(
+                        relative_path, name, stream, remaining
+                    )
+                except BulkUploadTooLargeError as e:
+                    await entries.aclose()
+                    yield self._limit_reached(relative_path, e)
+                    return
+                yield result
+                remaining -= result.get("size") or 0
+
+    async def _upload_entries(
+        self, file: UploadFile
+    ) -> AsyncIterator[tuple[Path | None, str, IO[bytes]] | dict[str, Any]]:
+        """Yield the files of one upload, expanding an archive.
+
+        Args:
+            file: Uploaded document or archive of documents
+
+        Yields:
+            tuple[Path | None, str, IO[bytes]] | dict[str, Any]: Each file's
+                destination relative to the upload dir (None to skip it),
+                its name as uploaded and a stream of its content, or the
+                failed result of an archive that could not be read further
+        """
+        filename = file.filename or ""
+        if not is_archive(filename):
+            name = Path(filename).name
+            yield Path(name) if name else None, filename, file.file
+            return
+
+        entries = iter_archive(file.file, filename)
+        count = 0
+        try:
+            while True:
+                try:
+                    entry = await asyncio.to_thread(next, entries, None)
+                except Exception as e:
+                    logger.error(f"Error reading archive {filename}: {str(e)}")
+                    yield {
+                        "filename": filename,
+                        "status": "failed",
+                        "detail": f"Error reading archive: {str(e)}",
+                    }
+                    return
+                if entry is None:
+                    return
+
+                count += 1
+                if count > self.max_archive_entries:
+                    yield {
+                        "filename": filename,
+                        "status": "failed",
+                        "detail": "Archive has more than "
+                        f"{self.max_archive_entries} files; the rest were ignored",
+                    }
+                    return
+
+                name, stream = entry
+                relative_path = safe_relative_path(name)
+                yield (
+                    archive_stem(filename) / relative_path if relative_path else None,
+                    name,
+                    stream,
+                )
+        finally:
+            entries.close()
 
-            # Save the file
-            with open(file_path, "wb") as f:
-                f.write(content)
+    async def _store_entry(
+        self,
+        relative_path: Path | None,
+        name: str,
+        stream: IO[bytes],
+        max_total: int,
+    ) -> dict[str, Any]:
+        """Store one file of a bulk upload if its format is supported.
 
+        Args:
+            relative_path: Destination relative to the upload dir, or None to
+                skip the file
+            name: Name of the file as uploaded, for reporting
+            stream: Binary stream of the file's content
+            max_total: Bytes left of the bulk upload
+
+        Returns:
+            dict[str, Any]: The file's result as yielded by ``store_uploads``
+
+        Raises:
+            BulkUploadTooLargeError: If the file exceeds ``max_total``
+        """
+        if relative_path is None:
+            return {"filename": name, "status": "skipped", "detail": "Ignored file"}
+        if relative_path.suffix.lower() not in DocumentProcessor.supported_formats:
             return {
-                "filename": safe_filename,
-                "size": len(content),
-                "path": str(file_path),
+                "filename": relative_path.as_posix(),
+                "status": "skipped",
+                "detail": "Unsupported file format",
             }
-        except DocumentProcessingError as e:
-            raise e
+        try:
+            stored = await asyncio.to_thread(
+                self.store_stream, relative_path, stream, max_total
+            )
+        except BulkUploadTooLargeError:
+            raise
         except Exception as e:
-            raise DocumentProcessingError(f"Error processing document: {str(e)}")
+            return {
+                "filename": relative_path.as_posix(),
+                "status": "failed",
+                "detail": str(e),
+            }
+        return {**stored, "status": "stored", "detail": None}
+
+    @staticmethod
+    def _limit_reached(
+        relative_path: Path | None, error: BulkUploadTooLargeError
+    ) -> dict[str, Any]:
+        """Report the file that took a bulk upload past its size limit.
+
+        Args:
+            relative_path: Destination of the file relative to the upload dir
+            error: The error raised while storing it
+
+        Returns:
+            dict[str, Any]: The file's failed result
+        """
+        return {
+            "filename": relative_path.as_posix() if relative_path else "",
+            "status": "failed",
+            "detail": f"{error}; the rest were ignored",
+        }
 
     async def get_document(self, filename: str) -> Path:
         """Retrieve a document by filename.
@@ -0,0 +1,202 @@
+"""Streaming text extraction from DOCX files without building a document model."""
+
+import zipfile
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from lxml import etree  # type: ignore  # installed with python-docx
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+DCTERMS = "{http://purl.org/dc/terms/}"
+
+DOCUMENT_PART = "word/document.xml"
+CORE_PROPERTIES_PART = "docProps/core.xml"
+
+# Separator between the cells of a table row
+CELL_SEPARATOR = " | "
+
+
+def _paragraph_text(paragraph: Any) -> str:
+    """Join the text runs, tabs and line breaks of a paragraph.
+
+    Text of paragraphs nested inside it, such as text boxes, is left out.
+
+    Args:
+        paragraph: ``w:p`` element
+
+    Returns:
+        str: Text of the paragraph
+    """
+    parts = []
+    for element in paragraph.iter(W + "t", W + "tab", W + "br", W + "cr"):
+        if next(element.iterancestors(W + "p")) is not paragraph:
+            continue
+        if element.tag == W + "t":
+            parts.append(element.text or "")
+        elif element.tag == W + "tab":
+            parts.append("\t")
+        else:
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _release(element: Any) -> None:
+    """Free a parsed element and the already processed siblings before it.
+
+    Args:
+        element: Element whose content has been consumed
+    """
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+class _BodyText:
+    """Turn parse events of paragraphs, table rows and cells into lines."""
+
+    def __init__(self) -> None:
+        """Start outside any paragraph or table."""
+        # One list of cell texts per open row and of paragraphs per open cell,
+        # innermost last, so nested tables are read correctly
+        self.rows: list[list[str]] = []
+        self.cells: list[list[str]] = []
+        # Paragraphs open around the current element, for text boxes
+        self.open_paragraphs = 0
+
+    def start(self, tag: str) -> None:
+        """Enter a paragraph, row or cell.
+
+        Args:
+            tag: Tag of the element
+        """
+        if tag == W + "p":
+            self.open_paragraphs += 1
+        elif tag == W + "tr":
+            self.rows.append([])
+        else:
+            self.cells.append([])
+
+    def end(self, element: Any) -> str | None:
+        """Leave a paragraph, row or cell and collect its text.
+
+        Args:
+            element: The completely parsed element
+
+        Returns:
+            str | None: A body-level line that is now complete, if any
+        """
+        if element.tag == W + "tc":
+            text = " ".join(p for p in self.cells.pop() if p)
+            if self.rows:
+                self.rows[-1].append(text)
+            return None
+
+        if element.tag == W + "tr":
+            text = CELL_SEPARATOR.join(self.rows.pop())
+        else:
+            self.open_paragraphs -= 1
+            # Text boxes repeat their content as a legacy fallback
+            if any(a.tag == MC + "Fallback" for a in element.iterancestors()):
+                return None
+            text = _paragraph_text(element)
+
+        if self.cells:
+            self.cells[-1].append(text)
+            return None
+        return text
+
+    def can_release(self, element: Any) -> bool:
+        """Check whether a parsed element may be freed.
+
+        Nothing inside an unfinished paragraph is freed, and paragraphs in
+        cells are left for their row to free.
+
+        Args:
+            element: The completely parsed element
+
+        Returns:
+            bool: Whether the element has been fully consumed
+        """
+        if self.open_paragraphs:
+            return False
+        return element.tag != W + "p" or not self.cells
+
+
+def iter_docx_text(file_path: Path) -> Iterator[str]:
+    """Stream the text of a DOCX body in document order.
+
+    ``word/document.xml`` is parsed incrementally straight from the zip and
+    each element is freed once read, so memory stays flat however large the
+    document is. Every body paragraph yields one line. Every table row
+    yields one line, with its cells joined by ``CELL_SEPARATOR``.
+
+    Args:
+        file_path: Path to the DOCX file
+
+    Yields:
+        str: Paragraph and table row texts
+    """
+    body = _BodyText()
+    with zipfile.ZipFile(file_path) as archive, archive.open(DOCUMENT_PART) as xml:
+        for event, element in etree.iterparse(
+            xml,
+            events=("start", "end"),
+            tag=(W + "p", W + "tr", W + "tc"),
+            resolve_entities=False,
+            no_network=True,
+            huge_tree=True,
+        ):
+            if event == "start":
+                body.start(element.tag)
+                continue
+            line = body.end(element)
+            if line is not None:
+                yield line
+            if body.can_release(element):
+                _release(element)
+
+
+def _parse_datetime(value: str | None) -> datetime | None:
+    """Parse a W3CDTF timestamp from the core properties.
+
+    Args:
+        value: Timestamp such as ``2024-01-02T03:04:05Z``
+
+    Returns:
+        datetime | None: The timestamp, or None if missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+
+def read_core_properties(file_path: Path) -> dict[str, Any]:
+    """Read the author and timestamps of a DOCX file.
+
+    Args:
+        file_path: Path to the DOCX file
+
+    Returns:
+        dict[str, Any]: ``author``, ``created`` and ``modified``, with empty
+            or None values where the file does not record them
+    """
+    properties: dict[str, Any] = {"author": "", "created": None, "modified": None}
+    with zipfile.ZipFile(file_path) as archive:
+        if CORE_PROPERTIES_PART not in archive.namelist():
+            return properties
+        parser = etree.XMLParser(resolve_entities=False, no_network=True)
+        root = etree.fromstring(archive.read(CORE_PROPERTIES_PART), parser)
+
+    properties["author"] = root.findtext(DC + "creator") or ""
+    properties["created"] = _parse_datetime(root.findtext(DCTERMS + "created"))
+    properties["modified"] = _parse_datetime(root.findtext(DCTERMS + "modified"))
+    return properties
@@ -0,0 +1,171 @@
+"""Cross-request micro-batching for query embeddings."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Sequence
+
+import numpy as np
+
+from app.core.executors import executors
+from app.core.metrics import BATCH_SIZE_BUCKETS, metrics
+
+logger = logging.getLogger(__name__)
+
+# (text, future resolved with its embedding, enqueue time from perf_counter)
+PendingQuery = tuple[str, "asyncio.Future[np.ndarray]", float]
+
+
+class EmbeddingBatcher:
+    """Gather texts from concurrent callers and embed them in one encode call.
+
+    A batch is flushed when it reaches ``max_batch_size`` texts or when the
+    oldest waiting text has waited ``max_wait_ms``, whichever comes first. The
+    worker task is bound to the running event loop and restarted transparently
+    if the batcher is used from a different loop.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        """Initialize the batcher.
+
+        Args:
+            encode: Blocking function embedding a list of texts into a 2-D array
+            max_batch_size: Maximum number of texts per encode call
+            max_wait_ms: Maximum time a text waits for others to join its batch
+        """
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._worker: asyncio.Task[None] | None = None
+        self._pending: list[PendingQuery] = []
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._batch_sizes = metrics.histogram(
+            "embedding_batch_size", BATCH_SIZE_BUCKETS
+        )
+        self._queue_waits = metrics.histogram("embedding_queue_wait_ms")
+        self._encode_times = metrics.histogram("embedding_encode_ms")
+
+    def _ensure_worker(self) -> None:
+        """Start the worker task on the running loop if it is not running there."""
+        loop = asyncio.get_running_loop()
+        worker = self._worker
+        if self._loop is loop and worker is not None and not worker.done():
+            return
+        # Futures from a previous loop can never be resolved; start afresh
+        self._loop = loop
+        self._pending = []
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a single text as part of the next batch.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            np.ndarray: The text's embedding vector
+        """
+        self._ensure_worker()
+        assert self._loop is not None
+        future: asyncio.Future[np.ndarray] = self._loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed several texts, letting them share batches with other callers.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            np.ndarray: Embeddings, one row per text
+        """
+        vectors = await asyncio.gather(*(self.embed(text) for text in texts))
+        return np.vstack(vectors)
+
+    async def _run(self) -> None:
+        """Collect pending texts into batches and encode them until cancelled."""
+        while True:
+            await self._has_items.wait()
+            if len(self._pending) < self.max_batch_size:
+                # Give other requests a short window to join this batch
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            if not self._pending:
+                self._has_items.clear()
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+
+            # Drop callers that gave up while waiting
+            batch = [item for item in batch if not item[1].done()]
+            if batch:
+                await self._encode_batch(batch)
+
+    async def _encode_batch(self, batch: list[PendingQuery]) -> None:
+        """Encode one batch in the embedding executor and resolve its futures.
+
+        Args:
+            batch: Pending texts to encode
+        """
+        started = time.perf_counter()
+        self._batch_sizes.observe(len(batch))
+        for _, _, enqueued in batch:
+            self._queue_waits.observe((started - enqueued) * 1000)
+
+        try:
+            vectors = await executors.embedding.run(
+                self._encode, [text for text, _, _ in batch]
+            )
+        except Exception as e:
+            logger.error(f"Batched embedding failed: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._encode_times.observe((time.perf_counter() - started) * 1000)
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def close(self) -> None:
+        """Stop the worker task and fail any texts still waiting."""
+        worker, loop = self._worker, self._loop
+        self._worker = None
+        if worker is None or loop is None or loop.is_closed():
+            return
+
+        pending, self._pending = self._pending, []
+
+        def _cancel() -> None:
+            worker.cancel()
+            for _, future, _ in pending:
+                if not future.done():
+                    future.cancel()
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            _cancel()
+        else:
+            loop.call_soon_threadsafe(_cancel)
@@ -0,0 +1,133 @@
+"""Bounded LRU cache for query embeddings."""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different spellings share a cache entry.
+
+    Args:
+        text: Raw query text
+
+    Returns:
+        str: NFC-normalized text with surrounding and repeated whitespace collapsed
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache:
+    """LRU cache mapping (model name, normalized query) to an embedding vector.
+
+    Entries are evicted when they are older than ``ttl_seconds``, when there
+    are more than ``max_entries`` of them, or when the vectors together take
+    more than ``max_bytes`` of memory, least recently used first.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached vectors
+            max_bytes: Maximum total size of cached vectors in bytes
+            ttl_seconds: Time after which an entry expires, 0 to disable
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], tuple[np.ndarray, float]] = (
+            OrderedDict()
+        )
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, model_name: str, query: str) -> np.ndarray | None:
+        """Look up the embedding for a query.
+
+        Args:
+            model_name: Name of the embedding model
+            query: Query text, normalized with ``normalize_query``
+
+        Returns:
+            np.ndarray | None: The cached vector, or None on a miss
+        """
+        key = (model_name, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            vector, stored_at = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, model_name: str, query: str, vector: np.ndarray) -> None:
+        """Store the embedding for a query, evicting old entries as needed.
+
+        Args:
+            model_name: Name of the embedding model
+            query: Query text, normalized with ``normalize_query``
+            vector: The query's embedding
+        """
+        if self.max_entries <= 0 or vector.nbytes > self.max_bytes:
+            return
+        key = (model_name, query)
+        # Never hand out a view that a caller could modify in place
+        vector = np.array(vector, copy=True)
+        vector.setflags(write=False)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, time.monotonic())
+            self.bytes += vector.nbytes
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        """Remove an entry. Must be called with the lock held.
+
+        Args:
+            key: Cache key to remove
+        """
+        vector, _ = self._entries.pop(key)
+        self.bytes -= vector.nbytes
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache size and hit/miss/eviction counters.
+
+        Returns:
+            dict[str, Any]: Cache statistics
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
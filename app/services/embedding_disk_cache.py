@@ -0,0 +1,296 @@
+"""Persistent on-disk cache of chunk embeddings keyed by chunk text hash."""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+SQL_BATCH_SIZE = 500
+
+# Rows the vector file is created with before it first grows
+INITIAL_CAPACITY = 1024
+
+
+def text_key(text: str) -> bytes:
+    """Hash a chunk text into a cache key.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        bytes: First 16 bytes of the text's SHA-256
+    """
+    return hashlib.sha256(text.encode("utf-8")).digest()[:16]
+
+
+class DiskEmbeddingCache:
+    """Embeddings of chunk texts, stored in a memory-mapped matrix on disk.
+
+    Each embedding model gets its own directory holding ``vectors.bin``, a
+    ``(capacity, dimension)`` matrix of float16 or float32 rows opened with
+    ``np.memmap``, and ``index.sqlite``, which maps text hashes to matrix
+    rows and tracks when each row was last used. Lookups read rows straight
+    from the page cache without loading the matrix. Once the vectors take
+    more than ``max_bytes``, the least recently used rows are evicted and
+    their slots reused.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        model_name: str,
+        dimension: int,
+        max_bytes: int,
+        dtype: str = "float16",
+    ) -> None:
+        """Open or create the cache for an embedding model.
+
+        Args:
+            cache_dir: Directory holding the caches of all models
+            model_name: Name of the embedding model
+            dimension: Embedding dimension of the model
+            max_bytes: Maximum size of the stored vectors in bytes, 0 to disable
+            dtype: Storage type of the vectors, ``float16`` or ``float32``
+        """
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = dimension * self.dtype.itemsize
+        self.max_entries = max_bytes // self.row_bytes if self.row_bytes else 0
+        self._lock = threading.Lock()
+        self._vectors: np.memmap | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        safe_name = re.sub(r"[^\w.-]+", "_", model_name)
+        self.directory = Path(cache_dir) / f"{safe_name}-{dimension}-{self.dtype.name}"
+        self.vectors_path = self.directory / "vectors.bin"
+        self._db: sqlite3.Connection | None = None
+        if self.max_entries <= 0:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            self.directory / "index.sqlite", check_same_thread=False
+        )
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                key BLOB PRIMARY KEY,
+                slot INTEGER NOT NULL,
+                last_used INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+            """)
+        self._db.commit()
+        # Logical clock ordering uses, resumed from the most recent one on disk
+        (self._clock,) = self._db.execute(
+            "SELECT COALESCE(MAX(last_used), 0) FROM entries"
+        ).fetchone()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything."""
+        return self._db is not None
+
+    def _map(self, rows: int) -> np.memmap:
+        """Return the vector matrix mapped with at least ``rows`` rows.
+
+        Must be called with the lock held.
+
+        Args:
+            rows: Number of rows that must be addressable
+
+        Returns:
+            np.memmap: The mapped matrix
+        """
+        if self._vectors is not None and len(self._vectors) >= rows:
+            return self._vectors
+
+        size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        capacity = max(size // self.row_bytes, INITIAL_CAPACITY)
+        while capacity < rows:
+            capacity *= 2
+        capacity = min(capacity, max(self.max_entries, rows))
+        if size < capacity * self.row_bytes:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(capacity * self.row_bytes)
+
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(
+            self.vectors_path,
+            dtype=self.dtype,
+            mode="r+",
+            shape=(capacity, self.dimension),
+        )
+        return self._vectors
+
+    def get_many(self, texts: Sequence[str]) -> tuple[np.ndarray, list[int]]:
+        """Look up the embeddings of several chunk texts.
+
+        Args:
+            texts: Chunk texts
+
+        Returns:
+            tuple[np.ndarray, list[int]]: A float32 matrix with one row per
+                text, zero for misses, and the positions of the misses
+        """
+        found = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if self._db is None or not texts:
+            self.misses += len(texts)
+            return found, list(range(len(texts)))
+
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            slots: dict[bytes, int] = {}
+            for start in range(0, len(keys), SQL_BATCH_SIZE):
+                batch = list(set(keys[start : start + SQL_BATCH_SIZE]))
+                placeholders = ",".join("?" * len(batch))
+                slots.update(
+                    self._db.execute(
+                        f"SELECT key, slot FROM entries WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                )
+
+            missing = [i for i, key in enumerate(keys) if key not in slots]
+            hit_positions = [i for i, key in enumerate(keys) if key in slots]
+            if hit_positions:
+                hit_slots = [slots[keys[i]] for i in hit_positions]
+                vectors = self._map(max(hit_slots) + 1)
+                found[hit_positions] = vectors[hit_slots]
+                self._clock += 1
+                self._db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(self._clock, key) for key in slots],
+                )
+                self._db.commit()
+
+            self.hits += len(hit_positions)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """Store the embeddings of several chunk texts.
+
+        Args:
+            texts: Chunk texts
+            vectors: Their embeddings, one row per text
+        """
+        if self._db is None or not texts:
+            return
+
+        new: dict[bytes, np.ndarray] = {}
+        for text, vector in zip(texts, vectors):
+            new[text_key(text)] = vector
+        keys = list(new)
+        with self._lock:
+            for start in range(0, len(keys), SQL_BATCH_SIZE):
+                batch = keys[start : start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                for (key,) in self._db.execute(
+                    f"SELECT key FROM entries WHERE key IN ({placeholders})", batch
+                ):
+                    del new[key]
+            # A batch larger than the whole cache only keeps its tail
+            items = list(new.items())[-self.max_entries :]
+            if not items:
+                return
+
+            # Evict least recently used rows and reuse their slots
+            (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+            overflow = count + len(items) - self.max_entries
+            slots: list[int] = []
+            if overflow > 0:
+                evicted = self._db.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?",
+                    (overflow,),
+                ).fetchall()
+                self._db.executemany(
+                    "DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted]
+                )
+                slots.extend(slot for _, slot in evicted)
+                self.evictions += len(evicted)
+
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE name = 'next_slot'"
+            ).fetchone()
+            next_slot = row[0] if row else 0
+            fresh = len(items) - len(slots)
+            slots.extend(range(next_slot, next_slot + fresh))
+
+            # Vectors are on disk before the index points at them
+            matrix = self._map(max(slots) + 1)
+            matrix[slots] = np.asarray([vector for _, vector in items], self.dtype)
+            matrix.flush()
+
+            self._clock += 1
+            self._db.executemany(
+                "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, self._clock) for (key, _), slot in zip(items, slots)],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('next_slot', ?)",
+                (next_slot + fresh,),
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        """Return the number of cached embeddings."""
+        if self._db is None:
+            return 0
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return int(count)
+
+    def clear(self) -> None:
+        """Remove every entry and truncate the vector file."""
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM meta")
+            self._db.commit()
+            self._vectors = None
+            if self.vectors_path.exists():
+                os.truncate(self.vectors_path, 0)
+
+    def close(self) -> None:
+        """Flush the vectors and close the index."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache size and hit/miss/eviction counters.
+
+        Returns:
+            dict[str, Any]: Cache statistics
+        """
+        entries = len(self)
+        return {
+            "entries": entries,
+            "bytes": entries * self.row_bytes,
+            "max_bytes": self.max_entries * self.row_bytes,
+            "dtype": self.dtype.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
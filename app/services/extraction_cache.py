@@ -0,0 +1,424 @@
+"""Compressed on-disk cache of text and metadata extracted from documents.
+
+Entries are keyed by the SHA-256 of the source file and the version of the
+extractor that parsed it, so re-processing an unchanged file (for example to
+re-chunk it with new settings) skips parsing entirely. The text is stored as
+a sequence of pieces, such as pages, that are written and read back one
+frame at a time, so no entry is ever held in memory whole.
+
+Usage::
+
+    python -m app.services.extraction_cache stats
+    python -m app.services.extraction_cache purge [--keep-bytes N]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes hashed at a time when a file's content hash is not known
+HASH_READ_SIZE = 1024 * 1024
+
+ENTRY_SUFFIX = ".pkl.z"
+
+# Length of the compressed frame that follows, as a big-endian uint32
+FRAME_HEADER = struct.Struct(">I")
+
+# Characters of text pieces compressed together in one frame
+FRAME_CHARS = 256 * 1024
+
+
+def file_sha256(file_path: Path) -> str:
+    """Hash a file's content without reading it into memory at once.
+
+    Args:
+        file_path: File to hash
+
+    Returns:
+        str: Hex SHA-256 of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(HASH_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_frame(f: Any, record: Any, compression_level: int) -> None:
+    """Append one length-prefixed, compressed pickle to a file.
+
+    Args:
+        f: Binary file open for writing
+        record: Object to store
+        compression_level: zlib compression level from 0 to 9
+    """
+    frame = zlib.compress(
+        pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL), compression_level
+    )
+    f.write(FRAME_HEADER.pack(len(frame)))
+    f.write(frame)
+
+
+def write_pieces(path: Path, pieces: Iterable[str], compression_level: int = 6) -> None:
+    """Write text pieces to a file as frames of at most ``FRAME_CHARS``.
+
+    Parsing workers write their part of an entry this way, and the parts are
+    joined into the entry by ``ExtractionCache.assemble``.
+
+    Args:
+        path: File to write
+        pieces: Consecutive pieces of text, such as pages
+        compression_level: zlib compression level from 0 to 9
+    """
+    with open(path, "wb") as f:
+        frame: list[str] = []
+        size = 0
+        for piece in pieces:
+            frame.append(piece)
+            size += len(piece)
+            if size >= FRAME_CHARS:
+                _write_frame(f, frame, compression_level)
+                frame, size = [], 0
+        if frame:
+            _write_frame(f, frame, compression_level)
+
+
+def read_frames(path: Path) -> Iterator[Any]:
+    """Read back the frames of a file one at a time.
+
+    Args:
+        path: File written with ``write_pieces`` or an entry
+
+    Yields:
+        Any: Each stored object in order
+
+    Raises:
+        ValueError: If the file ends in the middle of a frame
+    """
+    with open(path, "rb") as f:
+        while header := f.read(FRAME_HEADER.size):
+            if len(header) < FRAME_HEADER.size:
+                raise ValueError("Truncated frame header")
+            (size,) = FRAME_HEADER.unpack(header)
+            frame = f.read(size)
+            if len(frame) < size:
+                raise ValueError("Truncated frame")
+            yield pickle.loads(zlib.decompress(frame))
+
+
+class ExtractionCache:
+    """Extracted document text and metadata, stored as compressed frames.
+
+    Each entry is a file named after the content hash and extractor, fanned
+    out into subdirectories by the first two hash characters. It holds a
+    sequence of length-prefixed, zlib-compressed pickles: the metadata
+    first, then lists of text pieces in order. Writes are atomic, and
+    unreadable entries are treated as misses and removed.
+
+    The directory is scanned once, when statistics are first asked for;
+    from then on the entry count and size are kept up to date as entries
+    are stored and removed by this process.
+    """
+
+    def __init__(self, cache_dir: Path, compression_level: int = 6) -> None:
+        """Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding the cache entries
+            compression_level: zlib compression level from 0 to 9
+        """
+        self.cache_dir = Path(cache_dir)
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        # Size of each entry, and their total, once the directory is scanned
+        self._sizes: dict[Path, int] | None = None
+        self._bytes = 0
+
+    def _path(self, content_sha256: str, extractor: str) -> Path:
+        """Return the file of an entry.
+
+        Args:
+            content_sha256: Hex SHA-256 of the source file
+            extractor: Extractor name and version, such as ``pdf-v1``
+
+        Returns:
+            Path: Location of the entry
+        """
+        name = f"{content_sha256}.{extractor}{ENTRY_SUFFIX}"
+        return self.cache_dir / content_sha256[:2] / name
+
+    def _track(self, path: Path, size: int | None) -> None:
+        """Update the running totals for an entry stored or removed.
+
+        Must be called with the lock held.
+
+        Args:
+            path: Location of the entry
+            size: Its new size in bytes, or None if it was removed
+        """
+        if self._sizes is None:
+            # Not scanned yet; the first scan sees the change on disk
+            return
+        self._bytes -= self._sizes.pop(path, 0)
+        if size is not None:
+            self._sizes[path] = size
+            self._bytes += size
+
+    def _drop(self, path: Path) -> None:
+        """Remove an unreadable entry.
+
+        Args:
+            path: Location of the entry
+        """
+        path.unlink(missing_ok=True)
+        with self._lock:
+            self._track(path, None)
+
+    def get_metadata(
+        self, content_sha256: str, extractor: str
+    ) -> dict[str, Any] | None:
+        """Look up the metadata of previously extracted content.
+
+        Only the first frame of the entry is read; the text is streamed by
+        ``iter_pieces``.
+
+        Args:
+            content_sha256: Hex SHA-256 of the source file
+            extractor: Extractor name and version
+
+        Returns:
+            dict[str, Any] | None: The metadata, or None on a miss
+        """
+        path = self._path(content_sha256, extractor)
+        metadata: dict[str, Any] | None = None
+        try:
+            frames = read_frames(path)
+            try:
+                metadata = next(frames)
+            finally:
+                frames.close()
+            # Mark as recently used for size-based purging
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Dropping unreadable extraction cache entry {path}: {e}")
+            self._drop(path)
+            metadata = None
+
+        with self._lock:
+            if metadata is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return metadata
+
+    def iter_pieces(self, content_sha256: str, extractor: str) -> Iterator[str]:
+        """Stream the text pieces of an entry, one frame in memory at a time.
+
+        An entry found unreadable part way is removed before the error is
+        raised, so the next extraction of the file starts afresh.
+
+        Args:
+            content_sha256: Hex SHA-256 of the source file
+            extractor: Extractor name and version
+
+        Yields:
+            str: The stored pieces in order
+
+        Raises:
+            FileNotFoundError: If the entry does not exist
+        """
+        path = self._path(content_sha256, extractor)
+        frames = read_frames(path)
+        try:
+            # Skip the metadata
+            next(frames)
+            for pieces in frames:
+                yield from pieces
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            logger.warning(f"Dropping unreadable extraction cache entry {path}: {e}")
+            self._drop(path)
+            raise
+        finally:
+            frames.close()
+
+    def put(
+        self,
+        content_sha256: str,
+        extractor: str,
+        pieces: Iterable[str],
+        metadata: dict[str, Any],
+    ) -> None:
+        """Store extracted content.
+
+        Args:
+            content_sha256: Hex SHA-256 of the source file
+            extractor: Extractor name and version
+            pieces: Consecutive pieces of the extracted text
+            metadata: Extracted metadata
+        """
+        part = self.new_part()
+        try:
+            write_pieces(part, pieces, self.compression_level)
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        self.assemble(content_sha256, extractor, metadata, [part])
+
+    def new_part(self) -> Path:
+        """Create an empty file for ``write_pieces`` to write part of an entry.
+
+        Returns:
+            Path: The new file, in the cache directory
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=self.cache_dir, prefix=".part-")
+        os.close(fd)
+        return Path(name)
+
+    def assemble(
+        self,
+        content_sha256: str,
+        extractor: str,
+        metadata: dict[str, Any],
+        parts: Sequence[Path],
+    ) -> None:
+        """Store an entry from parts written by ``write_pieces``.
+
+        The parts are copied after the metadata in order and then removed,
+        whether or not the entry could be stored.
+
+        Args:
+            content_sha256: Hex SHA-256 of the source file
+            extractor: Extractor name and version
+            metadata: Extracted metadata
+            parts: Files holding consecutive pieces of the text
+        """
+        path = self._path(content_sha256, extractor)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".entry-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    _write_frame(f, metadata, self.compression_level)
+                    for part in parts:
+                        with open(part, "rb") as source:
+                            shutil.copyfileobj(source, f)
+                    size = f.tell()
+                os.replace(tmp_name, path)
+            except BaseException:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
+        finally:
+            for part in parts:
+                part.unlink(missing_ok=True)
+        with self._lock:
+            self.writes += 1
+            self._track(path, size)
+
+    def _entry_stats(self) -> list[tuple[Path, os.stat_result]]:
+        """Return every entry with its stat.
+
+        Returns:
+            list[tuple[Path, os.stat_result]]: Entry paths and stats
+        """
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for path in self.cache_dir.glob(f"*/*{ENTRY_SUFFIX}"):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def purge(self, keep_bytes: int = 0) -> dict[str, int]:
+        """Remove entries, least recently used first.
+
+        Args:
+            keep_bytes: Size the cache may keep, 0 to remove every entry
+
+        Returns:
+            dict[str, int]: Number of entries and bytes removed
+        """
+        entries = sorted(self._entry_stats(), key=lambda entry: entry[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        removed = freed = 0
+        for path, stat in entries:
+            if total - freed <= keep_bytes:
+                break
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self._track(path, None)
+            removed += 1
+            freed += stat.st_size
+        return {"removed": removed, "bytes_freed": freed}
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache size and hit/miss/write counters.
+
+        Returns:
+            dict[str, Any]: Cache statistics
+        """
+        with self._lock:
+            if self._sizes is None:
+                self._sizes = {path: stat.st_size for path, stat in self._entry_stats()}
+                self._bytes = sum(self._sizes.values())
+            return {
+                "entries": len(self._sizes),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+            }
+
+
+extraction_cache = ExtractionCache(
+    settings.EXTRACTION_CACHE_DIR, settings.EXTRACTION_CACHE_COMPRESSION_LEVEL
+)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Print statistics for, or purge, the extraction cache."""
+    parser = argparse.ArgumentParser(description="Inspect or purge the cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Print entry count and size")
+    purge = commands.add_parser("purge", help="Remove cached extractions")
+    purge.add_argument(
+        "--keep-bytes",
+        type=int,
+        default=0,
+        help="Keep the most recently used entries up to this size",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "purge":
+        result = extraction_cache.purge(keep_bytes=args.keep_bytes)
+    else:
+        result = extraction_cache.stats()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,655 @@
+"""Asynchronous document ingestion pipeline with bounded stage queues."""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import aclosing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, NamedTuple, TypeVar
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.exceptions import ServiceOverloadedError
+from app.core.executors import executors
+from app.core.metrics import metrics
+from app.models.document import utc_now
+from app.services.document_processor import (
+    DocumentProcessor,
+    DocumentSource,
+    PinnedFile,
+    document_id_for,
+)
+from app.services.vector_store import ChunkBatch, DocumentUpdate, VectorStore
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Stages every job passes through, in order
+STAGES = ("parse", "chunk", "embed", "write")
+
+# Stages whose workers take several queued jobs at once, so small documents
+# share embedding calls and sparse index commits
+GROUPED_STAGES = ("embed", "write")
+
+# Jobs taken by a stage worker in one go, with the payload each stage produced
+StageItems = list[tuple["IngestionJob", Any]]
+
+# What a stage worker passes on, a job with its payload at a time
+StageOutput = AsyncGenerator[tuple["IngestionJob", Any], None]
+
+# Delay before retrying work rejected by a saturated executor
+OVERLOAD_RETRY_SECONDS = 0.05
+
+
+class EmbeddedBatch(NamedTuple):
+    """A batch of new chunks with their embeddings, one row per chunk."""
+
+    batch: ChunkBatch
+    embeddings: np.ndarray
+
+
+class IngestionJob:
+    """State and per-stage timings of one document moving through the pipeline."""
+
+    def __init__(self, path: Path, metadata: dict[str, Any]) -> None:
+        """Initialize a queued job.
+
+        Args:
+            path: Path of the stored upload
+            metadata: Metadata added to every chunk of the document
+        """
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.metadata = metadata
+        self.status = "queued"
+        self.error: str | None = None
+        self.document_id: str | None = None
+        self.chunks = 0
+        self.new_chunks = 0
+        self.deleted_chunks = 0
+        # Set when the document is already indexed as it is
+        self.unchanged = False
+        # Batches of new chunks made by the chunk stage and stored so far
+        self.batches = 0
+        self.batches_written = 0
+        # Applied once every batch is written
+        self.final_update: DocumentUpdate | None = None
+        self.created_at = utc_now()
+        self.finished_at: datetime | None = None
+        self.stages: dict[str, dict[str, float]] = {}
+        self._enqueued_at = time.perf_counter()
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has completed or failed."""
+        return self.status in ("completed", "failed")
+
+    def start_stage(self, stage: str) -> float:
+        """Record that a stage picked the job, or one of its batches, up.
+
+        Queue time is recorded when the stage first sees the job.
+
+        Args:
+            stage: Name of the stage
+
+        Returns:
+            float: Start time from ``time.perf_counter``
+        """
+        started = time.perf_counter()
+        self.status = stage
+        if stage not in self.stages:
+            queue_ms = (started - self._enqueued_at) * 1000
+            self.stages[stage] = {"queue_ms": queue_ms, "run_ms": 0.0}
+        return started
+
+    def finish_stage(self, stage: str, started: float) -> float:
+        """Record that a stage finished with the job, or one of its batches.
+
+        Run time adds up over the batches of a document.
+
+        Args:
+            stage: Name of the stage
+            started: Start time returned by ``start_stage``
+
+        Returns:
+            float: Time spent in the stage this time in milliseconds
+        """
+        self._enqueued_at = time.perf_counter()
+        run_ms = (self._enqueued_at - started) * 1000
+        self.stages[stage]["run_ms"] += run_ms
+        return run_ms
+
+    def complete(self) -> None:
+        """Mark the job as completed."""
+        self.status = "completed"
+        self.finished_at = utc_now()
+        self._done.set()
+
+    def fail(self, error: Exception) -> None:
+        """Mark the job as failed.
+
+        Args:
+            error: The exception that stopped the job
+        """
+        self.status = "failed"
+        self.error = str(error)
+        self.finished_at = utc_now()
+        self._done.set()
+
+    async def wait(self) -> None:
+        """Wait until the job has completed or failed."""
+        await self._done.wait()
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the job's public state.
+
+        Returns:
+            dict[str, Any]: Job status, document details and stage timings
+        """
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.metadata.get("filename", self.path.name),
+            "document_id": self.document_id,
+            "chunks": self.chunks,
+            "new_chunks": self.new_chunks,
+            "deleted_chunks": self.deleted_chunks,
+            "unchanged": self.unchanged,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "stages": {stage: dict(timing) for stage, timing in self.stages.items()},
+        }
+
+
+class IngestionPipeline:
+    """Parse, chunk, embed and write uploaded documents in the background.
+
+    Each stage has its own pool of worker tasks and reads from a bounded
+    queue. A worker blocks when the next stage's queue is full, so a slow
+    stage throttles the ones before it, and ``submit`` fails fast with
+    ``ServiceOverloadedError`` once the first queue is full. Documents are
+    streamed from parsing on: the chunk stage passes new chunks on in
+    batches of at most ``VECTOR_WRITE_BATCH_SIZE`` while it reads the text,
+    so a document is embedded as it is chunked and never held whole. Embed
+    and write workers drain up to ``group_max_chunks`` new chunks' worth of
+    queued batches at a time and process them together; jobs grouped this
+    way fail together.
+    Like the embedding batcher, workers are bound to the running event loop
+    and restarted if the pipeline is used from a different loop.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        pin: Callable[[Path], Awaitable[PinnedFile]] = DocumentProcessor.pin_document,
+        parse: Callable[[PinnedFile], Awaitable[DocumentSource]] = (
+            DocumentProcessor.parse_document
+        ),
+        parse_workers: int = settings.INGEST_PARSE_WORKERS,
+        chunk_workers: int = settings.INGEST_CHUNK_WORKERS,
+        embed_workers: int = settings.INGEST_EMBED_WORKERS,
+        write_workers: int = settings.INGEST_WRITE_WORKERS,
+        queue_size: int = settings.INGEST_QUEUE_SIZE,
+        max_jobs: int = settings.INGEST_MAX_JOBS,
+        group_max_chunks: int = settings.VECTOR_WRITE_BATCH_SIZE,
+    ) -> None:
+        """Initialize the pipeline. Workers start on the first submission.
+
+        Args:
+            vector_store: Store that chunks, embeds and persists documents
+            pin: Coroutine pinning and hashing a stored file's content
+            parse: Coroutine extracting a document from pinned content
+            parse_workers: Number of concurrent parse workers
+            chunk_workers: Number of concurrent chunk workers
+            embed_workers: Number of concurrent embed workers
+            write_workers: Number of concurrent write workers
+            queue_size: Maximum jobs waiting in front of each stage
+            max_jobs: Maximum finished jobs remembered for status queries;
+                queued and running jobs are always remembered
+            group_max_chunks: Chunks after which embed and write workers stop
+                taking more batches, and the size of each embedding call
+        """
+        self.vector_store = vector_store
+        self._pin_document = pin
+        self._parse_document = parse
+        self.workers = {
+            "parse": parse_workers,
+            "chunk": chunk_workers,
+            "embed": embed_workers,
+            "write": write_workers,
+        }
+        self.queue_size = queue_size
+        self.max_jobs = max_jobs
+        self.group_max_chunks = group_max_chunks
+        self._handlers: dict[str, Callable[[StageItems], StageOutput]] = {
+            "parse": self._parse,
+            "chunk": self._chunk,
+            "embed": self._embed,
+            "write": self._write,
+        }
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queues: dict[str, asyncio.Queue[tuple[IngestionJob, Any]]] = {}
+        self._tasks: list[asyncio.Task[None]] = []
+        self._jobs: dict[str, IngestionJob] = {}
+        # IDs of finished jobs, oldest first, so they are forgotten in order
+        self._finished: OrderedDict[str, None] = OrderedDict()
+        self._stage_times = {
+            stage: metrics.histogram(f"ingest_{stage}_ms") for stage in STAGES
+        }
+        self._completed = metrics.counter("ingest_jobs_completed")
+        self._failed = metrics.counter("ingest_jobs_failed")
+
+    def _ensure_started(self) -> None:
+        """Start the stage workers on the running loop if they are not there."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        # Queues of a previous loop can never be drained; start afresh
+        self.close()
+        self._loop = loop
+        self._queues = {stage: asyncio.Queue(self.queue_size) for stage in STAGES}
+        self._tasks = [
+            loop.create_task(self._run_stage(stage))
+            for stage in STAGES
+            for _ in range(self.workers[stage])
+        ]
+
+    def submit(
+        self, path: Path, metadata: dict[str, Any] | None = None
+    ) -> IngestionJob:
+        """Queue a stored file for ingestion.
+
+        Args:
+            path: Path of the stored upload
+            metadata: Metadata added to every chunk of the document
+
+        Returns:
+            IngestionJob: The queued job
+
+        Raises:
+            ServiceOverloadedError: If the parse queue is full
+        """
+        self._ensure_started()
+        job = IngestionJob(path, metadata or {})
+        try:
+            self._queues["parse"].put_nowait((job, None))
+        except asyncio.QueueFull:
+            raise ServiceOverloadedError(
+                "Ingestion queue is full, try again later"
+            ) from None
+        return self._track(job)
+
+    async def enqueue(
+        self, path: Path, metadata: dict[str, Any] | None = None
+    ) -> IngestionJob:
+        """Queue a stored file for ingestion, waiting while the queue is full.
+
+        Used by bulk ingestion, which should be throttled rather than rejected.
+
+        Args:
+            path: Path of the stored upload
+            metadata: Metadata added to every chunk of the document
+
+        Returns:
+            IngestionJob: The queued job
+        """
+        self._ensure_started()
+        job = IngestionJob(path, metadata or {})
+        await self._queues["parse"].put((job, None))
+        return self._track(job)
+
+    def _track(self, job: IngestionJob) -> IngestionJob:
+        """Remember a job for status queries.
+
+        Args:
+            job: The newly queued job
+
+        Returns:
+            IngestionJob: The same job
+        """
+        self._jobs[job.id] = job
+        return job
+
+    def _retire(self, job: IngestionJob) -> None:
+        """Record that a job finished, forgetting the oldest finished jobs.
+
+        Args:
+            job: The job that just finished
+        """
+        self._finished[job.id] = None
+        while len(self._finished) > self.max_jobs:
+            job_id, _ = self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+    def get_job(self, job_id: str) -> IngestionJob | None:
+        """Look up a job by ID.
+
+        Args:
+            job_id: ID returned by ``submit``
+
+        Returns:
+            IngestionJob | None: The job, or None if unknown or forgotten
+        """
+        return self._jobs.get(job_id)
+
+    async def _run_stage(self, stage: str) -> None:
+        """Process items from a stage's queue and pass results downstream.
+
+        Items of jobs that have already failed are dropped. A job completes
+        when the last stage passes it on, or earlier if its document is
+        already indexed as it is.
+
+        Args:
+            stage: Name of the stage this worker serves
+        """
+        queue = self._queues[stage]
+        position = STAGES.index(stage)
+        next_queue = (
+            self._queues[STAGES[position + 1]] if position + 1 < len(STAGES) else None
+        )
+        while True:
+            items = await self._take(stage)
+            live = [(job, payload) for job, payload in items if not job.finished]
+            jobs = list(dict.fromkeys(job for job, _ in live))
+            try:
+                started = [job.start_stage(stage) for job in jobs]
+                # Closed on cancellation too, so the handler's cleanup runs
+                async with aclosing(self._handlers[stage](live)) as results:
+                    async for job, result in results:
+                        # Documents already indexed as they are skip later stages
+                        if next_queue is None or job.unchanged:
+                            self._complete(job)
+                        elif not job.finished:
+                            # Blocks while the next stage is saturated
+                            await next_queue.put((job, result))
+                for job, start in zip(jobs, started):
+                    self._stage_times[stage].observe(job.finish_stage(stage, start))
+            except Exception as e:
+                for job in jobs:
+                    self._fail(job, e)
+            finally:
+                for _ in items:
+                    queue.task_done()
+
+    async def _take(self, stage: str) -> StageItems:
+        """Wait for the next item of a stage, grouping queued ones if it groups.
+
+        Args:
+            stage: Name of the stage
+
+        Returns:
+            StageItems: Items to process together
+        """
+        queue = self._queues[stage]
+        items = [await queue.get()]
+        if stage in GROUPED_STAGES:
+            chunks = self._chunk_count(items[0][1])
+            while chunks < self.group_max_chunks and not queue.empty():
+                items.append(queue.get_nowait())
+                chunks += self._chunk_count(items[-1][1])
+        return items
+
+    @staticmethod
+    def _chunk_count(payload: Any) -> int:
+        """Count the new chunks a queued payload carries.
+
+        Args:
+            payload: A chunk batch, embedded or not, or a document update
+
+        Returns:
+            int: Chunks the payload adds to an embedding or write group
+        """
+        if isinstance(payload, EmbeddedBatch):
+            payload = payload.batch
+        return len(payload.ids) if isinstance(payload, ChunkBatch) else 0
+
+    def _complete(self, job: IngestionJob) -> None:
+        """Mark a job as completed and log what was stored.
+
+        Args:
+            job: The finished job
+        """
+        job.complete()
+        self._retire(job)
+        self._completed.inc()
+        logger.info(
+            f"Ingested {job.path.name}: {job.new_chunks} of "
+            f"{job.chunks} chunks embedded, {job.deleted_chunks} deleted"
+        )
+
+    def _fail(self, job: IngestionJob, error: Exception) -> None:
+        """Mark a job as failed unless it has already finished.
+
+        Args:
+            job: The job whose work raised
+            error: The exception raised
+        """
+        if job.finished:
+            return
+        job.fail(error)
+        self._retire(job)
+        self._failed.inc()
+        logger.error(f"Ingestion of {job.path.name} failed: {str(error)}")
+
+    @staticmethod
+    async def _retry_overloaded(func: Callable[..., Awaitable[T]], *args: Any) -> T:
+        """Await a call, retrying while the executor behind it is saturated.
+
+        Pipeline work is already bounded by the stage queues, so it waits for
+        capacity instead of failing the job.
+
+        Args:
+            func: Coroutine function to call
+            *args: Arguments for the call
+
+        Returns:
+            T: The call's result
+        """
+        while True:
+            try:
+                return await func(*args)
+            except ServiceOverloadedError:
+                await asyncio.sleep(OVERLOAD_RETRY_SECONDS)
+
+    async def _parse(self, items: StageItems) -> StageOutput:
+        """Extract each document's text and metadata.
+
+        Each file is pinned and hashed before anything else, and files whose
+        content is already indexed are not parsed at all. The hash of the
+        pinned content, not the one taken at upload, is checked against the
+        index and fingerprints the chunks, so a file replaced after it was
+        queued is indexed as the content actually parsed.
+
+        Args:
+            items: Jobs to process
+
+        Yields:
+            tuple[IngestionJob, DocumentSource | None]: Each job with its
+                document, with job metadata merged in, or None if unchanged
+        """
+        for job, _ in items:
+            job.document_id = document_id_for(job.path)
+            pinned = await self._retry_overloaded(self._pin_document, job.path)
+            try:
+                if await self._retry_overloaded(
+                    executors.vector_db.run,
+                    self.vector_store.is_current,
+                    job.document_id,
+                    pinned.sha256,
+                ):
+                    job.unchanged = True
+                    yield job, None
+                    continue
+
+                source = await self._retry_overloaded(self._parse_document, pinned)
+            finally:
+                pinned.release()
+            job.document_id = source.id
+            metadata = {**source.metadata, **job.metadata, "sha256": pinned.sha256}
+            yield job, source._replace(metadata=metadata)
+
+    async def _chunk(self, items: StageItems) -> StageOutput:
+        """Chunk each document as it is read and diff it against stored chunks.
+
+        New chunks are passed on a batch at a time while the document is
+        still being chunked, followed by the rest of its update. Chunking
+        stops early if the job fails downstream meanwhile. Each source is
+        released once it has been read.
+
+        Args:
+            items: Jobs with their parsed documents
+
+        Yields:
+            tuple[IngestionJob, ChunkBatch | DocumentUpdate]: Batches of new
+                chunks, then the update of each document
+        """
+        for job, source in items:
+            try:
+                document = {
+                    "id": source.id,
+                    "title": source.title,
+                    "doc_type": source.doc_type,
+                    "metadata": source.metadata,
+                    "pages" if source.paged else "pieces": source.read(),
+                }
+                existing = await self._retry_overloaded(
+                    executors.vector_db.run, self.vector_store.stored_chunks, source.id
+                )
+                prepared = self.vector_store.prepare_document(document, existing)
+                while not job.finished:
+                    # Chunking is CPU-bound; vector_db workers stay free for search
+                    item = await self._retry_overloaded(
+                        executors.chunking.run, next, prepared
+                    )
+                    if isinstance(item, DocumentUpdate):
+                        job.chunks = item.chunk_count
+                        job.deleted_chunks = len(item.deleted_ids)
+                        job.unchanged = item.unchanged
+                        if job.unchanged:
+                            # Stored as it is; only marks the document current
+                            await self._retry_overloaded(
+                                self.vector_store.apply_update, item
+                            )
+                        yield job, item
+                        break
+                    job.batches += 1
+                    job.new_chunks += len(item.ids)
+                    yield job, item
+            finally:
+                source.release()
+
+    async def _embed(self, items: StageItems) -> StageOutput:
+        """Embed the new chunks of several batches in shared calls.
+
+        The texts of all batches are concatenated and embedded
+        ``group_max_chunks`` at a time, so many small documents cost a few
+        full embedding calls instead of one small call each. The calls run
+        in the ingestion embedding workers, leaving the query embedding
+        workers free for searches. Document updates are passed through.
+
+        Args:
+            items: Jobs with their chunk batches or document updates
+
+        Yields:
+            tuple[IngestionJob, EmbeddedBatch | DocumentUpdate]: Each batch
+                with its embeddings, and each update as it was
+        """
+        texts = [
+            text
+            for _, payload in items
+            if isinstance(payload, ChunkBatch)
+            for text in payload.texts
+        ]
+        parts = [
+            await self._retry_overloaded(
+                executors.ingest_embedding.run,
+                self.vector_store.embed_chunks,
+                texts[start : start + self.group_max_chunks],
+            )
+            for start in range(0, len(texts), self.group_max_chunks)
+        ]
+        embeddings = np.vstack(parts) if parts else np.empty((0, 0), np.float32)
+
+        offset = 0
+        for job, payload in items:
+            if isinstance(payload, ChunkBatch):
+                rows = embeddings[offset : offset + len(payload.ids)]
+                offset += len(payload.ids)
+                yield job, EmbeddedBatch(payload, rows)
+            else:
+                yield job, payload
+
+    async def _write(self, items: StageItems) -> StageOutput:
+        """Store embedded batches of several documents with one commit.
+
+        A document's update is applied once all of its batches are written,
+        so it never loses chunks before their replacements are searchable.
+
+        Args:
+            items: Jobs with their embedded batches or document updates
+
+        Yields:
+            tuple[IngestionJob, None]: Each job whose document is fully stored
+        """
+        stored = []
+        try:
+            for job, payload in items:
+                if isinstance(payload, EmbeddedBatch):
+                    await self._retry_overloaded(
+                        self.vector_store.write_batch, *payload
+                    )
+                    job.batches_written += 1
+                else:
+                    job.final_update = payload
+            for job in dict.fromkeys(job for job, _ in items):
+                update = job.final_update
+                # Another worker may still be writing some of the batches
+                if update is None or job.batches_written < job.batches:
+                    continue
+                job.final_update = None
+                await self._retry_overloaded(self.vector_store.apply_update, update)
+                stored.append(job)
+        finally:
+            await self._retry_overloaded(self.vector_store.commit_writes)
+        for job in stored:
+            yield job, None
+
+    def close(self) -> None:
+        """Cancel the stage workers. Queued jobs are abandoned."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        # Parsed documents waiting to be chunked may hold pinned files
+        chunk_queue = self._queues.get("chunk")
+        while chunk_queue is not None and not chunk_queue.empty():
+            _, source = chunk_queue.get_nowait()
+            source.release()
+        self._loop = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depths and job counts.
+
+        Returns:
+            dict[str, Any]: Workers and queued jobs per stage, and jobs by status
+        """
+        statuses: dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "stages": {
+                stage: {
+                    "workers": self.workers[stage],
+                    "queued": self._queues[stage].qsize() if self._queues else 0,
+                }
+                for stage in STAGES
+            },
+            "jobs": statuses,
+        }
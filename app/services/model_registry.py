@@ -0,0 +1,151 @@
+"""Process-wide registry for loaded language models and generation pipelines."""
+
+import logging
+import threading
+from typing import Any, NamedTuple
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline  # type: ignore
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel(NamedTuple):
+    """Tokenizer, model weights and text-generation pipeline loaded together."""
+
+    tokenizer: Any
+    model: Any
+    pipe: Any
+
+
+class ModelRegistry:
+    """Load each language model once per process and share it between callers.
+
+    Model weights are keyed by model name so the tokenizer and weights are
+    loaded a single time. Pipelines are additionally keyed by generation
+    settings, so callers asking for different defaults share the same weights.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._weights: dict[str, tuple[Any, Any]] = {}
+        self._pipelines: dict[tuple[str, int, float, float], LoadedModel] = {}
+        # Tokenizers loaded without their model weights
+        self._tokenizers: dict[str, Any] = {}
+        self.model_loads = 0
+        self.pipeline_loads = 0
+        self.hits = 0
+
+    def get(
+        self,
+        model_name: str | None = None,
+        max_new_tokens: int | None = None,
+        temperature: float | None = None,
+        top_p: float | None = None,
+    ) -> LoadedModel:
+        """Return the loaded model and pipeline for the given settings.
+
+        Args:
+            model_name: Hugging Face model identifier, defaults to LLM_MODEL_NAME
+            max_new_tokens: Maximum tokens to generate, defaults to MAX_NEW_TOKENS
+            temperature: Sampling temperature, defaults to TEMPERATURE
+            top_p: Nucleus sampling threshold, defaults to TOP_P
+
+        Returns:
+            LoadedModel: The shared tokenizer, model and pipeline
+        """
+        key = (
+            model_name or settings.LLM_MODEL_NAME,
+            max_new_tokens or settings.MAX_NEW_TOKENS,
+            temperature if temperature is not None else settings.TEMPERATURE,
+            top_p if top_p is not None else settings.TOP_P,
+        )
+        with self._lock:
+            loaded = self._pipelines.get(key)
+            if loaded is not None:
+                self.hits += 1
+                return loaded
+
+            tokenizer, model = self._load_weights(key[0])
+            pipe = pipeline(
+                "text-generation",
+                model=model,
+                tokenizer=tokenizer,
+                max_new_tokens=key[1],
+                temperature=key[2],
+                top_p=key[3],
+                device_map="auto",
+            )
+            self.pipeline_loads += 1
+            loaded = LoadedModel(tokenizer=tokenizer, model=model, pipe=pipe)
+            self._pipelines[key] = loaded
+            return loaded
+
+    def get_tokenizer(self, model_name: str | None = None) -> Any:
+        """Return a model's tokenizer without loading the model weights.
+
+        Args:
+            model_name: Hugging Face model identifier, defaults to LLM_MODEL_NAME
+
+        Returns:
+            Any: The shared tokenizer
+        """
+        model_name = model_name or settings.LLM_MODEL_NAME
+        with self._lock:
+            if model_name in self._weights:
+                return self._weights[model_name][0]
+            if model_name not in self._tokenizers:
+                logger.info(f"Loading tokenizer: {model_name}")
+                self._tokenizers[model_name] = AutoTokenizer.from_pretrained(model_name)
+            return self._tokenizers[model_name]
+
+    def _load_weights(self, model_name: str) -> tuple[Any, Any]:
+        """Load the tokenizer and model weights unless already loaded.
+
+        Must be called with the registry lock held.
+
+        Args:
+            model_name: Hugging Face model identifier
+
+        Returns:
+            tuple[Any, Any]: The tokenizer and the model
+        """
+        if model_name not in self._weights:
+            logger.info(f"Loading language model: {model_name}")
+            tokenizer = self._tokenizers.pop(model_name, None)
+            if tokenizer is None:
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                torch_dtype=torch.float16,
+                device_map="auto",
+            )
+            self._weights[model_name] = (tokenizer, model)
+            self.model_loads += 1
+        return self._weights[model_name]
+
+    def clear(self) -> None:
+        """Drop all loaded models so their memory can be reclaimed."""
+        with self._lock:
+            self._pipelines.clear()
+            self._weights.clear()
+            self._tokenizers.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return load and reuse counters.
+
+        Returns:
+            dict[str, Any]: Registry counters and the loaded model names
+        """
+        return {
+            "models": sorted(self._weights),
+            "model_loads": self.model_loads,
+            "pipeline_loads": self.pipeline_loads,
+            "hits": self.hits,
+        }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,167 @@
+"""LRU cache of attention keys and values for prompt prefixes."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import torch
+
+# Prefixes are matched in whole blocks of this many tokens
+PREFIX_BLOCK_TOKENS = 16
+
+
+def prefix_hashes(token_ids: Sequence[int], block_tokens: int) -> list[bytes]:
+    """Hash every whole-block prefix of a token sequence.
+
+    The hash of each prefix chains the hash of the one before it, so all of
+    them cost a single pass over the tokens.
+
+    Args:
+        token_ids: Prompt token ids
+        block_tokens: Tokens per block
+
+    Returns:
+        list[bytes]: Hash of the first ``(i + 1) * block_tokens`` tokens at
+            position ``i``
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    ids = np.asarray(token_ids, dtype=np.int64)
+    hashes = []
+    for end in range(block_tokens, len(ids) + 1, block_tokens):
+        digest.update(ids[end - block_tokens : end].tobytes())
+        hashes.append(digest.copy().digest())
+    return hashes
+
+
+class PrefixKVCache:
+    """Attention keys and values of prompt prefixes, shared across requests.
+
+    Prompts are split into blocks of ``block_tokens`` tokens. The keys and
+    values of each block are stored once, under the hash of the whole
+    prefix ending with it, so prompts sharing a scaffold share its blocks.
+    A lookup follows a prompt's prefix hashes until the first missing block,
+    which yields the longest cached prefix. Blocks are evicted least
+    recently used first to stay within ``max_bytes``; a lookup refreshes a
+    prefix's blocks from the last to the first, so later blocks are always
+    evicted before the blocks they extend.
+    """
+
+    def __init__(self, max_bytes: int, block_tokens: int = PREFIX_BLOCK_TOKENS) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_bytes: Size budget of the stored tensors, 0 to disable
+            block_tokens: Tokens per block
+        """
+        self.max_bytes = max_bytes
+        self.block_tokens = block_tokens
+        self._lock = threading.Lock()
+        # Keys and values per layer of each block, by prefix hash
+        self._blocks: OrderedDict[bytes, list[tuple[torch.Tensor, torch.Tensor]]] = (
+            OrderedDict()
+        )
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_tokens = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything."""
+        return self.max_bytes > 0
+
+    def lookup(
+        self, token_ids: Sequence[int]
+    ) -> tuple[list[tuple[torch.Tensor, torch.Tensor]], int]:
+        """Find the longest cached prefix of a prompt.
+
+        At least the prompt's last token is always left uncached, as its
+        logits are needed to start generating.
+
+        Args:
+            token_ids: Prompt token ids
+
+        Returns:
+            tuple[list[tuple[torch.Tensor, torch.Tensor]], int]: Keys and
+                values per layer for the matched prefix, and its length in
+                tokens; an empty list and 0 on a miss
+        """
+        hashes = prefix_hashes(token_ids[:-1], self.block_tokens)
+        with self._lock:
+            matched = []
+            for prefix_hash in hashes:
+                block = self._blocks.get(prefix_hash)
+                if block is None:
+                    break
+                matched.append(block)
+            for prefix_hash in reversed(hashes[: len(matched)]):
+                self._blocks.move_to_end(prefix_hash)
+            if not matched:
+                self.misses += 1
+                return [], 0
+            length = len(matched) * self.block_tokens
+            self.hits += 1
+            self.hit_tokens += length
+
+        layers = [
+            (
+                torch.cat([block[i][0] for block in matched], dim=2),
+                torch.cat([block[i][1] for block in matched], dim=2),
+            )
+            for i in range(len(matched[0]))
+        ]
+        return layers, length
+
+    def put(self, token_ids: Sequence[int], layers: Sequence[tuple[Any, Any]]) -> None:
+        """Store the blocks of a prompt that are not cached yet.
+
+        Args:
+            token_ids: Prompt token ids
+            layers: Keys and values per layer covering at least the prompt
+        """
+        hashes = prefix_hashes(token_ids, self.block_tokens)
+        with self._lock:
+            for index, prefix_hash in enumerate(hashes):
+                if prefix_hash in self._blocks:
+                    continue
+                start = index * self.block_tokens
+                stop = start + self.block_tokens
+                block = [
+                    (k[:, :, start:stop].clone(), v[:, :, start:stop].clone())
+                    for k, v in layers
+                ]
+                self._blocks[prefix_hash] = block
+                self.bytes += sum(k.nbytes + v.nbytes for k, v in block)
+            for prefix_hash in reversed(hashes):
+                self._blocks.move_to_end(prefix_hash)
+            while self.bytes > self.max_bytes and self._blocks:
+                _, block = self._blocks.popitem(last=False)
+                self.bytes -= sum(k.nbytes + v.nbytes for k, v in block)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every block."""
+        with self._lock:
+            self._blocks.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache size and hit/miss counters.
+
+        Returns:
+            dict[str, Any]: Cache statistics
+        """
+        with self._lock:
+            return {
+                "blocks": len(self._blocks),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_tokens": self.hit_tokens,
+                "evictions": self.evictions,
+            }
@@ -1,45 +1,94 @@
 """Service for handling RAG (Retrieval-Augmented Generation) operations."""
 
-import json
+import asyncio
+import time
 from collections.abc import AsyncGenerator, Sequence
+from concurrent.futures import Future
 from typing import Any
 
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline  # type: ignore
+from transformers import StoppingCriteriaList  # type: ignore
 
 from app.core.config import settings
-from app.core.exceptions import RAGError
-from app.services.vector_store import VectorStore
+from app.core.exceptions import (
+    GenerationCancelledError,
+    GenerationTimeoutError,
+    RAGError,
+    ServiceOverloadedError,
+)
+from app.core.executors import executors
+from app.core.metrics import GENERATION_MS_BUCKETS, metrics
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.cancellation import (
+    DEADLINE,
+    DISCONNECTED,
+    CancellationCriteria,
+    CancellationToken,
+)
+from app.services.context_packer import ContextPacker, PackedContext
+from app.services.generation_scheduler import GenerationScheduler
+from app.services.model_registry import ModelRegistry, model_registry
+from app.services.prefix_cache import PrefixKVCache
+from app.services.token_streamer import AsyncTextStreamer
+from app.services.vector_store import SearchHit, VectorStore
+
+# Opening of every RAG prompt
+PROMPT_INSTRUCTIONS = (
+    "Answer the question using the context below. Cite the pages given with "
+    "a passage when you use it. If the context does not contain the answer, "
+    "say that you do not know."
+)
 
 
 class RAGService:
     """Service for managing RAG operations."""
 
-    def __init__(self, vector_store: VectorStore) -> None:
+    def __init__(
+        self, vector_store: VectorStore, registry: ModelRegistry | None = None
+    ) -> None:
         """Initialize RAG service.
 
         Args:
             vector_store: Vector store instance for document retrieval
+            registry: Model registry to load the LLM from, defaults to the
+                process-wide registry
         """
         self.vector_store = vector_store
 
-        # Initialize LLM
-        self.tokenizer = AutoTokenizer.from_pretrained(settings.LLM_MODEL_NAME)
-        self.model = AutoModelForCausalLM.from_pretrained(
+        # Get the shared LLM, loading it only if no one has yet
+        loaded = (registry or model_registry).get(
             settings.LLM_MODEL_NAME,
-            torch_dtype=torch.float16,
-            device_map="auto",
-        )
-
-        # Create pipeline
-        self.pipe = pipeline(
-            "text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer,
             max_new_tokens=settings.MAX_NEW_TOKENS,
             temperature=settings.TEMPERATURE,
             top_p=settings.TOP_P,
-            device_map="auto",
+        )
+        self.tokenizer = loaded.tokenizer
+        self.model = loaded.model
+        self.pipe = loaded.pipe
+        self.packer = ContextPacker(self.tokenizer)
+
+        # Concurrent requests share decoding steps instead of queueing for
+        # the pipeline one at a time
+        self.scheduler: GenerationScheduler | None = None
+        self.prefix_cache = PrefixKVCache(
+            settings.PREFIX_CACHE_MAX_BYTES, settings.PREFIX_CACHE_BLOCK_TOKENS
+        )
+        if settings.GENERATION_MAX_BATCH_SIZE > 1:
+            self.scheduler = GenerationScheduler(
+                self.model,
+                self.tokenizer,
+                max_batch_size=settings.GENERATION_MAX_BATCH_SIZE,
+                max_pending=settings.GENERATION_MAX_PENDING,
+                prefix_cache=self.prefix_cache,
+            )
+
+        self.answer_cache = SemanticAnswerCache(
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        )
+        self._ttft = metrics.histogram("generation_ttft_ms", GENERATION_MS_BUCKETS)
+        self._stream_times = metrics.histogram(
+            "generation_stream_ms", GENERATION_MS_BUCKETS
         )
 
     def _create_prompt(
@@ -49,6 +98,11 @@ class RAGService:
     ) -> str:
         """Create a prompt for the language model using retrieved documents.
 
+        The fixed instructions come first and the question last, so prompts
+        share the longest possible prefix and reuse its cached keys and
+        values: all prompts share the instructions, and prompts retrieving
+        the same chunks share the context too.
+
         Args:
             query: User's query
             context_docs: Retrieved relevant documents with scores and snippets
@@ -56,13 +110,77 @@ class RAGService:
         Returns:
             str: Generated prompt with context
         """
-        prompt = f"Question: {query}\n\nContext:\n"
+        prompt = PROMPT_INSTRUCTIONS + "\n\nContext:\n"
         for doc, score, snippet in context_docs:
             if snippet:
-                prompt += f"\n- {snippet} (relevance: {score:.2f})"
-        prompt += "\n\nAnswer:"
+                prompt += self._format_context_line(doc, score, snippet)
+        prompt += f"\n\nQuestion: {query}\n\nAnswer:"
         return prompt
 
+    @classmethod
+    def _format_context_line(
+        cls, doc: dict[str, Any], score: float, snippet: str
+    ) -> str:
+        """Format a retrieved chunk as its line of the prompt context.
+
+        Args:
+            doc: Metadata of the retrieved chunk
+            score: Relevance score of the chunk
+            snippet: Chunk text
+
+        Returns:
+            str: The line, starting with a newline
+        """
+        pages = cls._cite_pages(doc)
+        return f"\n- {snippet} ({pages}relevance: {score:.2f})"
+
+    def _pack_context(self, query: str, hits: Sequence[SearchHit]) -> PackedContext:
+        """Fit retrieved chunks into the context window, most relevant first.
+
+        The budget is what CONTEXT_WINDOW leaves after the MAX_NEW_TOKENS
+        reserved for the answer and the prompt without any context.
+
+        Args:
+            query: User's query
+            hits: Retrieved chunks, most relevant first
+
+        Returns:
+            PackedContext: The chunks to put in the prompt
+
+        Raises:
+            RAGError: If the question alone does not fit the context window
+        """
+        scaffold = self.packer.count_tokens(self._create_prompt(query, []))
+        budget = settings.CONTEXT_WINDOW - settings.MAX_NEW_TOKENS - scaffold
+        if budget < 0:
+            raise RAGError(
+                f"Question too long: the prompt needs {scaffold} tokens and "
+                f"{settings.MAX_NEW_TOKENS} are reserved for the answer, but "
+                f"the context window is {settings.CONTEXT_WINDOW}"
+            )
+        packed = self.packer.pack(hits, budget, self._format_context_line)
+        if packed.truncated or packed.dropped:
+            metrics.counter("context_chunks_truncated").inc(packed.truncated)
+            metrics.counter("context_chunks_dropped").inc(packed.dropped)
+        return packed
+
+    @staticmethod
+    def _cite_pages(doc: dict[str, Any]) -> str:
+        """Format the pages a retrieved chunk came from for a prompt.
+
+        Args:
+            doc: Metadata of the retrieved chunk
+
+        Returns:
+            str: Such as ``"pages 3-4, "``, or empty if pages are unknown
+        """
+        start, end = doc.get("page_start"), doc.get("page_end")
+        if start is None:
+            return ""
+        if end is None or end == start:
+            return f"page {start}, "
+        return f"pages {start}-{end}, "
+
     async def query(self, query: str, limit: int = 5) -> str:
         """Process a single query using RAG.
 
@@ -80,8 +198,9 @@ class RAGService:
             # Retrieve relevant documents
             context_docs = await self.vector_store.search(query, limit)
 
-            # Create prompt with context
-            prompt = self._create_prompt(query, context_docs)
+            # Create prompt with the context that fits
+            packed = self._pack_context(query, context_docs)
+            prompt = self._create_prompt(query, packed.hits)
 
             # TODO: Implement actual LLM call with prompt
             return f"This is a mock response based on prompt: {prompt}"
@@ -109,8 +228,9 @@ class RAGService:
             # Retrieve relevant documents
             context_docs = await self.vector_store.search(latest_msg, limit)
 
-            # Create prompt with context
-            prompt = self._create_prompt(latest_msg, context_docs)
+            # Create prompt with the context that fits
+            packed = self._pack_context(latest_msg, context_docs)
+            prompt = self._create_prompt(latest_msg, packed.hits)
 
             # TODO: Implement actual chat completion with prompt
             return f"This is a mock chat response based on prompt: {prompt}"
@@ -118,78 +238,297 @@ class RAGService:
         except Exception as e:
             raise RAGError(f"Error processing RAG chat: {str(e)}")
 
+    def _run_pipe(
+        self,
+        prompt: str,
+        criteria: CancellationCriteria,
+        streamer: AsyncTextStreamer | None = None,
+    ) -> str:
+        """Run the pipeline, stopping as soon as the request is cancelled.
+
+        Runs in a generation worker.
+
+        Args:
+            prompt: Prompt to complete
+            criteria: Stopping criterion of the request
+            streamer: Streamer receiving the generated text, or None
+
+        Returns:
+            str: The generated text
+
+        Raises:
+            GenerationCancelledError: If the request was cancelled, or ran
+                out of time, while waiting for a worker
+        """
+        if criteria.should_stop():
+            raise self._cancelled_error(criteria)
+        kwargs = {} if streamer is None else {"streamer": streamer}
+        outputs = self.pipe(
+            prompt, stopping_criteria=StoppingCriteriaList([criteria]), **kwargs
+        )
+        return outputs[0]["generated_text"] if outputs else ""
+
+    def _start_generation(
+        self,
+        prompt: str,
+        cancel_token: CancellationToken,
+        streamer: AsyncTextStreamer | None = None,
+    ) -> tuple["Future[str]", CancellationCriteria]:
+        """Start generating, stoppable through a cancellation token.
+
+        The request joins the batch of the generation scheduler, or runs the
+        pipeline in a generation worker if batching is disabled.
+
+        Args:
+            prompt: Prompt to complete
+            cancel_token: Token of the request
+            streamer: Streamer receiving the generated text, or None
+
+        Returns:
+            tuple[Future[str], CancellationCriteria]: The pending generated
+                text and the stopping criterion, which records whether it
+                stopped generation early
+
+        Raises:
+            ServiceOverloadedError: If the generation workers are saturated
+        """
+        criteria = CancellationCriteria(cancel_token)
+        if self.scheduler is not None:
+            future = self.scheduler.submit(
+                prompt,
+                criteria,
+                max_new_tokens=settings.MAX_NEW_TOKENS,
+                temperature=settings.TEMPERATURE,
+                top_p=settings.TOP_P,
+                streamer=streamer,
+            )
+        else:
+            future = executors.generation.submit(
+                self._run_pipe, prompt, criteria, streamer
+            )
+        future.add_done_callback(lambda _: self._record_cancellation(criteria))
+        return future, criteria
+
+    @staticmethod
+    def _record_cancellation(criteria: CancellationCriteria) -> None:
+        """Count a cancelled generation and the decoding steps it skipped.
+
+        Args:
+            criteria: Stopping criterion of the finished generation
+        """
+        reason = criteria.stopped_reason
+        if reason is None:
+            return
+        metrics.counter(f"generations_cancelled_{reason}").inc()
+        # Upper bound: the model might have finished early on its own
+        saved = max(settings.MAX_NEW_TOKENS - criteria.steps, 0)
+        metrics.counter("generation_tokens_saved").inc(saved)
+
+    @staticmethod
+    def _cancelled_error(criteria: CancellationCriteria) -> GenerationCancelledError:
+        """Build the error reporting why a generation was stopped.
+
+        Args:
+            criteria: Stopping criterion that stopped the generation
+
+        Returns:
+            GenerationCancelledError: A GenerationTimeoutError for an expired
+                deadline, otherwise a GenerationCancelledError
+        """
+        if criteria.stopped_reason == DEADLINE:
+            return GenerationTimeoutError("Generation deadline exceeded")
+        return GenerationCancelledError("Generation cancelled by the client")
+
+    @staticmethod
+    def _finish_stream(streamer: AsyncTextStreamer, generation: "Future[str]") -> None:
+        """End a token stream with the outcome of its generation.
+
+        Args:
+            streamer: Streamer of the generation
+            generation: The finished generation
+        """
+        if generation.cancelled():
+            # Dropped before it started, as when the scheduler shuts down
+            streamer.finish(RAGError("Generation was cancelled before it started"))
+        else:
+            streamer.finish(generation.exception())
+
+    async def _generate(self, prompt: str, cancel_token: CancellationToken) -> str:
+        """Generate a complete answer off the event loop.
+
+        Args:
+            prompt: Prompt to complete
+            cancel_token: Token of the request
+
+        Returns:
+            str: The generated text
+
+        Raises:
+            GenerationCancelledError: If generation was stopped early
+        """
+        generation, criteria = self._start_generation(prompt, cancel_token)
+        try:
+            text = await asyncio.wrap_future(generation)
+        except asyncio.CancelledError:
+            cancel_token.cancel(DISCONNECTED)
+            raise
+        if criteria.stopped_reason is not None:
+            raise self._cancelled_error(criteria)
+        return text
+
     async def generate_response(
-        self, query: str, num_chunks: int = 3
+        self,
+        query: str,
+        num_chunks: int = 3,
+        use_cache: bool = True,
+        cancel_token: CancellationToken | None = None,
     ) -> dict[str, Any]:
         """Generate a response using RAG.
 
+        Answers to semantically equivalent questions asked against the same
+        corpus are served from the answer cache without running the model.
+        Retrieved chunks are packed into the context window most relevant
+        first; ``context_packing`` in the result reports any that were cut
+        short or left out.
+        Generation stops within one decoding step once ``cancel_token`` is
+        cancelled or its deadline passes.
+
         Args:
             query: User's question
             num_chunks: Number of context chunks to retrieve
+            use_cache: Whether to read and populate the answer cache
+            cancel_token: Cancellation token of the request, defaults to one
+                expiring after GENERATION_TIMEOUT_SECONDS
 
         Returns:
-            dict[str, Any]: Generated response with context and prompt
+            dict[str, Any]: Generated response with context, context packing
+                report and prompt
 
         Raises:
+            GenerationCancelledError: If the request was cancelled
+            GenerationTimeoutError: If the request deadline passed
             RAGError: If there's an error during generation
         """
+        if cancel_token is None:
+            cancel_token = CancellationToken(settings.GENERATION_TIMEOUT_SECONDS)
         try:
-            # Retrieve relevant chunks
-            context = await self.vector_store.search(query, limit=num_chunks)
+            # Snapshot the corpus generation before retrieval so an answer
+            # built while documents change is never cached as current
+            corpus_generation = self.vector_store.corpus_generation
+            if use_cache:
+                query_vector = (await self.vector_store.embed_queries([query]))[0]
+                cached = self.answer_cache.lookup(
+                    query_vector, corpus_generation, num_chunks
+                )
+                if cached is not None:
+                    return {**cached, "cached": True}
+
+            # Retrieve relevant chunks and keep those fitting the window
+            hits = await self.vector_store.search(query, limit=num_chunks)
+            packed = self._pack_context(query, hits)
 
             # Create prompt
-            prompt = self._create_prompt(query, context)
+            prompt = self._create_prompt(query, packed.hits)
 
-            # Generate response
-            response = self.pipe(prompt)[0]["generated_text"]
+            # Generate response off the event loop
+            response = await self._generate(prompt, cancel_token)
 
             # Extract the actual response (after the prompt)
             response_text = response.split("[/INST]")[-1].strip()
 
-            return {"answer": response_text, "context": context, "prompt": prompt}
+            result = {
+                "answer": response_text,
+                "context": packed.hits,
+                "context_packing": packed.report(),
+                "prompt": prompt,
+            }
+            if use_cache:
+                self.answer_cache.put(
+                    query_vector, corpus_generation, num_chunks, result
+                )
+            return {**result, "cached": False}
+        except (GenerationCancelledError, ServiceOverloadedError):
+            raise
         except Exception as e:
             raise RAGError(f"Error generating response: {str(e)}")
 
     async def generate_streaming_response(
-        self, query: str, num_chunks: int = 3
-    ) -> AsyncGenerator[str, None]:
+        self,
+        query: str,
+        num_chunks: int = 3,
+        cancel_token: CancellationToken | None = None,
+    ) -> AsyncGenerator[dict[str, Any], None]:
         """Generate a streaming response using RAG.
 
+        The model runs in a generation worker thread and pushes each decoded
+        word through an ``AsyncTextStreamer``, so text is yielded while the
+        rest of the answer is still being generated. Time to first token,
+        measured from the start of the request, is recorded in the
+        ``generation_ttft_ms`` histogram. Closing the generator, as happens
+        when the client disconnects, cancels the generation.
+
         Args:
             query: User's question
             num_chunks: Number of context chunks to retrieve
+            cancel_token: Cancellation token of the request, defaults to one
+                expiring after GENERATION_TIMEOUT_SECONDS
 
         Yields:
-            str: Generated response tokens and context
+            dict[str, Any]: ``{"token": ..., "finished": False}`` for each
+                piece of text, then ``{"context": ..., "context_packing":
+                ..., "finished": True}``
 
         Raises:
+            GenerationTimeoutError: If the request deadline passed
             RAGError: If there's an error during generation
         """
+        if cancel_token is None:
+            cancel_token = CancellationToken(settings.GENERATION_TIMEOUT_SECONDS)
+        started = time.perf_counter()
         try:
-            # Retrieve relevant chunks
-            context = await self.vector_store.search(query, limit=num_chunks)
+            # Retrieve relevant chunks and keep those fitting the window
+            hits = await self.vector_store.search(query, limit=num_chunks)
+            packed = self._pack_context(query, hits)
 
             # Create prompt
-            prompt = self._create_prompt(query, context)
-
-            # Stream the response
-            response_text = ""
-            for output in self.pipe(
-                prompt,
-                max_new_tokens=settings.MAX_NEW_TOKENS,
-                temperature=settings.TEMPERATURE,
-                top_p=settings.TOP_P,
-                stream=True,
-            ):
-                if output and len(output) > 0:
-                    token = output[0]["generated_text"][len(response_text) :]
-                    response_text = output[0]["generated_text"]
-
-                    if token:
-                        yield json.dumps({"token": token, "finished": False}) + "\n"
+            prompt = self._create_prompt(query, packed.hits)
+
+            # Generate in a worker thread, reading text as it is decoded
+            streamer = AsyncTextStreamer(self.tokenizer, skip_special_tokens=True)
+            generation, criteria = self._start_generation(
+                prompt, cancel_token, streamer
+            )
+            generation.add_done_callback(
+                lambda future: self._finish_stream(streamer, future)
+            )
+
+            first = True
+            async for text in streamer:
+                if first:
+                    self._ttft.observe((time.perf_counter() - started) * 1000)
+                    first = False
+                yield {"token": text, "finished": False}
+            if criteria.stopped_reason is not None:
+                raise self._cancelled_error(criteria)
+            self._stream_times.observe((time.perf_counter() - started) * 1000)
 
             # Send the context at the end
-            yield json.dumps({"context": context, "finished": True}) + "\n"
-
+            yield {
+                "context": packed.hits,
+                "context_packing": packed.report(),
+                "finished": True,
+            }
+
+        except (GeneratorExit, asyncio.CancelledError):
+            # The consumer went away, normally because the client disconnected
+            cancel_token.cancel(DISCONNECTED)
+            raise
+        except (GenerationCancelledError, ServiceOverloadedError):
+            raise
         except Exception as e:
             raise RAGError(f"Error generating response: {str(e)}")
+
+    def close(self) -> None:
+        """Stop the generation scheduler, failing requests it still holds."""
+        if self.scheduler is not None:
+            self.scheduler.close()
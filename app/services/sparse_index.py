@@ -0,0 +1,349 @@
+"""In-process BM25 inverted index over document chunks."""
+
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the tokenizer or on-disk layout changes
+INDEX_FORMAT_VERSION = 1
+
+# Words, plus identifiers joined by - . / : such as "ERR-1234" or "v2.3.1"
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*")
+
+
+def dirty_marker(path: Path) -> Path:
+    """Return the file marking the index saved at ``path`` as out of date.
+
+    Args:
+        path: File the index is saved to
+
+    Returns:
+        Path: The marker file
+    """
+    return path.with_suffix(path.suffix + ".dirty")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase terms for indexing and querying.
+
+    Compound identifiers are kept whole and also split into their parts, so
+    both "err-1234" and "1234" match a chunk containing "ERR-1234".
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        list[str]: Terms in order of appearance
+    """
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-./:]", token) if part)
+    return terms
+
+
+class SparseIndex:
+    """BM25 inverted index with postings stored in compact arrays.
+
+    Each chunk gets an internal number. For each term, the postings hold the
+    numbers of the chunks containing it and the term frequencies, as two
+    parallel ``array('I')`` buffers that are scored with numpy. Removed chunks
+    are tombstoned and dropped from the postings by periodic compaction.
+
+    Saving is left to the caller. Once an index has been saved or loaded,
+    its first change afterwards creates a marker file next to the saved
+    copy. ``load`` refuses an index with that marker, so changes lost in a
+    crash cause a rebuild instead of a silently stale index.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        """Initialize an empty index.
+
+        Args:
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._chunk_ids: list[str | None] = []
+        self._numbers: dict[str, int] = {}
+        self._document_chunks: dict[str, list[int]] = {}
+        self._lengths = array("I")
+        self._alive = bytearray()
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._total_length = 0
+        self._deleted = 0
+        # Changes made so far, and how many of them the saved copy holds
+        self._changes = 0
+        self._saved_changes = 0
+        # File the index was last saved to or loaded from
+        self._path: Path | None = None
+        self._save_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of live chunks in the index."""
+        return len(self._numbers)
+
+    @property
+    def dirty(self) -> bool:
+        """Whether the index has changes that have not been saved."""
+        return self._changes != self._saved_changes
+
+    def _mark_changed(self) -> None:
+        """Count a change, marking the saved copy out of date. Lock must be held."""
+        if self._path is not None and self._changes == self._saved_changes:
+            dirty_marker(self._path).touch()
+        self._changes += 1
+
+    def add(
+        self, chunk_ids: Sequence[str], document_id: str, texts: Sequence[str]
+    ) -> None:
+        """Index chunks, replacing any existing chunks with the same IDs.
+
+        Args:
+            chunk_ids: Chunk identifiers
+            document_id: ID of the document the chunks belong to
+            texts: Chunk texts, aligned with ``chunk_ids``
+        """
+        with self._lock:
+            self._mark_changed()
+            self._remove_chunks(
+                chunk_id for chunk_id in chunk_ids if chunk_id in self._numbers
+            )
+            for chunk_id, text in zip(chunk_ids, texts):
+                number = len(self._chunk_ids)
+                terms = Counter(tokenize(text))
+                length = sum(terms.values())
+
+                self._chunk_ids.append(chunk_id)
+                self._numbers[chunk_id] = number
+                self._document_chunks.setdefault(document_id, []).append(number)
+                self._lengths.append(length)
+                self._alive.append(1)
+                self._total_length += length
+
+                for term, frequency in terms.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = (array("I"), array("I"))
+                        self._postings[term] = postings
+                    postings[0].append(number)
+                    postings[1].append(frequency)
+
+    def remove_document(self, document_id: str) -> None:
+        """Remove every chunk of a document.
+
+        Args:
+            document_id: ID of the document to remove
+        """
+        with self._lock:
+            self._mark_changed()
+            numbers = self._document_chunks.pop(document_id, [])
+            self._remove_chunks(
+                chunk_id
+                for chunk_id in (self._chunk_ids[n] for n in numbers)
+                if chunk_id is not None
+            )
+
+    def remove_chunks(self, chunk_ids: Iterable[str]) -> None:
+        """Remove individual chunks.
+
+        Args:
+            chunk_ids: IDs of the chunks to remove
+        """
+        with self._lock:
+            self._mark_changed()
+            self._remove_chunks(chunk_ids)
+
+    def _remove_chunks(self, chunk_ids: Iterable[str]) -> None:
+        """Tombstone chunks and compact when enough are dead. Lock must be held.
+
+        Args:
+            chunk_ids: IDs of the chunks to remove
+        """
+        for chunk_id in list(chunk_ids):
+            number = self._numbers.pop(chunk_id, None)
+            if number is None:
+                continue
+            self._chunk_ids[number] = None
+            self._alive[number] = 0
+            self._total_length -= self._lengths[number]
+            self._deleted += 1
+
+        if self._deleted > max(1000, len(self._chunk_ids) // 4):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Renumber live chunks and drop tombstones from postings. Lock must be held."""
+        remap = np.full(len(self._chunk_ids), -1, dtype=np.int64)
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        remap[alive] = np.arange(int(alive.sum()))
+
+        postings: dict[str, tuple[array, array]] = {}
+        for term, (numbers, frequencies) in self._postings.items():
+            docs = np.frombuffer(numbers, dtype=np.uint32)
+            keep = alive[docs]
+            if keep.any():
+                postings[term] = (
+                    array("I", remap[docs[keep]].astype(np.uint32).tobytes()),
+                    array(
+                        "I", np.frombuffer(frequencies, dtype=np.uint32)[keep].tobytes()
+                    ),
+                )
+        self._postings = postings
+
+        self._chunk_ids = [c for c in self._chunk_ids if c is not None]
+        self._numbers = {chunk_id: n for n, chunk_id in enumerate(self._chunk_ids)}
+        self._lengths = array(
+            "I", np.frombuffer(self._lengths, dtype=np.uint32)[alive].tobytes()
+        )
+        self._alive = bytearray(b"\x01" * len(self._chunk_ids))
+        self._document_chunks = {
+            document_id: [int(remap[n]) for n in numbers if remap[n] >= 0]
+            for document_id, numbers in self._document_chunks.items()
+        }
+        self._deleted = 0
+
+    def search(self, query: str, limit: int) -> list[tuple[str, float]]:
+        """Score chunks against a query with BM25.
+
+        Args:
+            query: Query text
+            limit: Maximum number of results
+
+        Returns:
+            list[tuple[str, float]]: Chunk IDs and scores, best first
+        """
+        with self._lock:
+            live = len(self._numbers)
+            if live == 0:
+                return []
+            average_length = self._total_length / live or 1.0
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+            alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+            scores = np.zeros(len(self._chunk_ids), dtype=np.float32)
+
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                docs = np.frombuffer(postings[0], dtype=np.uint32)
+                frequencies = np.frombuffer(postings[1], dtype=np.uint32)
+                keep = alive[docs]
+                docs, frequencies = docs[keep], frequencies[keep].astype(np.float32)
+                if docs.size == 0:
+                    continue
+
+                idf = math.log(1 + (live - docs.size + 0.5) / (docs.size + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[docs] / average_length)
+                scores[docs] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+            candidates = np.flatnonzero(scores)
+            if candidates.size > limit:
+                top = np.argpartition(scores[candidates], -limit)[-limit:]
+                candidates = candidates[top]
+            ranked = candidates[np.argsort(scores[candidates])[::-1]]
+            return [(str(self._chunk_ids[n]), float(scores[n])) for n in ranked[:limit]]
+
+    def save(self, path: Path) -> None:
+        """Persist the index atomically.
+
+        Searches and updates only wait while the index is serialized, not
+        while it is written to disk.
+
+        Args:
+            path: File to write the index to
+        """
+        with self._save_lock:
+            with self._lock:
+                if self._deleted:
+                    self._compact()
+                state = {
+                    "version": INDEX_FORMAT_VERSION,
+                    "chunk_ids": self._chunk_ids,
+                    "document_chunks": self._document_chunks,
+                    "lengths": self._lengths,
+                    "postings": self._postings,
+                }
+                data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+                changes = self._changes
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            with self._lock:
+                self._path = path
+                self._saved_changes = changes
+                if self._changes == changes:
+                    dirty_marker(path).unlink(missing_ok=True)
+                else:
+                    # Changed while being written; the copy is already stale
+                    dirty_marker(path).touch()
+
+    @classmethod
+    def load(cls, path: Path) -> "SparseIndex | None":
+        """Load a persisted index.
+
+        Args:
+            path: File the index was saved to
+
+        Returns:
+            SparseIndex | None: The index, or None if it is missing, unreadable,
+                out of date or written by an incompatible version
+        """
+        if not path.exists():
+            return None
+        if dirty_marker(path).exists():
+            logger.warning(f"Ignoring sparse index {path} with unsaved changes")
+            return None
+        try:
+            with open(path, "rb") as f:
+                state: dict[str, Any] = pickle.load(f)
+            if state.get("version") != INDEX_FORMAT_VERSION:
+                return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable sparse index {path}: {str(e)}")
+            return None
+
+        index = cls()
+        index._chunk_ids = state["chunk_ids"]
+        index._numbers = {chunk_id: n for n, chunk_id in enumerate(index._chunk_ids)}
+        index._document_chunks = state["document_chunks"]
+        index._lengths = state["lengths"]
+        index._alive = bytearray(b"\x01" * len(index._chunk_ids))
+        index._postings = state["postings"]
+        index._total_length = sum(index._lengths)
+        index._path = path
+        return index
+
+    def stats(self) -> dict[str, Any]:
+        """Return index size statistics.
+
+        Returns:
+            dict[str, Any]: Chunk, term and postings counts
+        """
+        with self._lock:
+            return {
+                "chunks": len(self._numbers),
+                "terms": len(self._postings),
+                "postings": sum(len(p[0]) for p in self._postings.values()),
+                "tombstones": self._deleted,
+            }
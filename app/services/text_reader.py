@@ -0,0 +1,112 @@
+"""Memory-mapped, incrementally decoded reading of plain text files."""
+
+import codecs
+import io
+import mmap
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+try:
+    from charset_normalizer import from_bytes
+except ImportError:  # pragma: no cover - optional dependency
+    from_bytes = None  # type: ignore[assignment]
+
+# Bytes decoded at a time
+READ_BLOCK_SIZE = 1024 * 1024
+
+# Bytes inspected to detect the encoding
+DETECTION_SAMPLE_SIZE = 64 * 1024
+
+# Used when a file is neither UTF-8 nor recognised by charset-normalizer
+FALLBACK_ENCODING = "cp1252"
+
+# UTF-32 BOMs first, as the UTF-32-LE BOM begins with the UTF-16-LE one
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Detect the text encoding of the start of a file.
+
+    A byte order mark decides the encoding outright. Otherwise the sample
+    is tried as UTF-8, then handed to charset-normalizer when it is
+    installed, and finally assumed to be Windows-1252.
+
+    Args:
+        sample: Leading bytes of the file, possibly cut mid-character
+
+    Returns:
+        str: Python codec name
+    """
+    for bom, encoding in BYTE_ORDER_MARKS:
+        if sample.startswith(bom):
+            return encoding
+
+    try:
+        # Incremental, so a character cut off at the sample's end is fine
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    if from_bytes is not None:
+        match = from_bytes(sample).best()
+        if match is not None:
+            return str(match.encoding)
+    return FALLBACK_ENCODING
+
+
+def detect_file_encoding(file_path: Path) -> str:
+    """Detect the text encoding of a file from its first bytes.
+
+    Args:
+        file_path: Path to the text file
+
+    Returns:
+        str: Python codec name
+    """
+    with open(file_path, "rb") as f:
+        return detect_encoding(f.read(DETECTION_SAMPLE_SIZE))
+
+
+def iter_text_file(
+    file_path: Path, encoding: str | None = None, block_size: int = READ_BLOCK_SIZE
+) -> Iterator[str]:
+    """Stream a text file as decoded blocks.
+
+    The file is memory-mapped and decoded one block at a time with an
+    incremental decoder, so characters split across blocks decode correctly
+    and the file's bytes are never copied whole. Line endings are
+    normalised to ``\\n`` and undecodable bytes are replaced rather than
+    failing the file.
+
+    Args:
+        file_path: Path to the text file
+        encoding: Codec of the file, detected if not given
+        block_size: Bytes decoded at a time
+
+    Yields:
+        str: Consecutive blocks of decoded text
+    """
+    if encoding is None:
+        encoding = detect_file_encoding(file_path)
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(errors="replace"), translate=True
+    )
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start in range(0, len(data), block_size):
+                text = decoder.decode(data[start : start + block_size])
+                if text:
+                    yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
@@ -0,0 +1,88 @@
+"""Bridge text generated in a worker thread to an async consumer."""
+
+import asyncio
+from typing import Any
+
+from transformers import TextStreamer  # type: ignore
+
+# Marks the end of the stream in the queue
+_END = object()
+
+
+class AsyncTextStreamer(TextStreamer):
+    """Streamer that hands decoded text from ``generate`` to the event loop.
+
+    ``generate`` calls ``put`` with each new token in its worker thread. The
+    base class decodes tokens into whole words, and every finalized piece of
+    text is queued on the event loop, where it is read with ``async for``.
+    The stream ends when generation calls ``end``, or with an error passed to
+    ``finish``.
+    """
+
+    def __init__(self, tokenizer: Any, skip_prompt: bool = True, **decode_kwargs: Any):
+        """Initialize the streamer. Must be created on the consuming event loop.
+
+        Args:
+            tokenizer: Tokenizer used to decode generated tokens
+            skip_prompt: Leave the prompt tokens out of the stream
+            **decode_kwargs: Keyword arguments for ``tokenizer.decode``
+        """
+        super().__init__(tokenizer, skip_prompt=skip_prompt, **decode_kwargs)
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[Any] = asyncio.Queue()
+        self._finished = False
+
+    def _send(self, item: Any) -> None:
+        """Queue an item on the event loop from any thread.
+
+        Args:
+            item: Text, an exception or the end marker
+        """
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            # The loop has closed; nobody is reading any more
+            pass
+
+    def on_finalized_text(self, text: str, stream_end: bool = False) -> None:
+        """Queue a finalized piece of text. Called from the generation thread.
+
+        Args:
+            text: Newly decoded text, possibly empty
+            stream_end: Whether generation has finished
+        """
+        if text:
+            self._send(text)
+        if stream_end:
+            self.finish()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        """End the stream, once. Safe to call from any thread.
+
+        Args:
+            error: Exception to raise in the consumer instead of ending cleanly
+        """
+        if self._finished:
+            return
+        self._finished = True
+        self._send(error if error is not None else _END)
+
+    def __aiter__(self) -> "AsyncTextStreamer":
+        """Return the streamer itself as the async iterator."""
+        return self
+
+    async def __anext__(self) -> str:
+        """Wait for the next piece of generated text.
+
+        Returns:
+            str: Decoded text
+
+        Raises:
+            StopAsyncIteration: When generation has finished
+        """
+        item = await self._queue.get()
+        if item is _END:
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            raise item
+        return str(item)
@@ -1,16 +1,105 @@
 """Vector store implementation for document embeddings and semantic search."""
 
+import hashlib
+import itertools
+import logging
 import os
-from collections.abc import Sequence
+import threading
+from collections.abc import Iterator, Sequence
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
 from sentence_transformers import SentenceTransformer
 
-from app.core.config import settings
-from app.core.exceptions import RAGError
+from app.core.config import DEFAULT_BATCH_SIZE, settings
+from app.core.exceptions import RAGError, ServiceOverloadedError
+from app.core.executors import executors
+from app.models.document import SearchMode
+from app.services.chunker import Chunk, TokenChunker
+from app.services.document_markers import DocumentMarkers
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import QueryEmbeddingCache, normalize_query
+from app.services.embedding_disk_cache import DiskEmbeddingCache
+from app.services.model_registry import model_registry
+from app.services.sparse_index import SparseIndex
+
+logger = logging.getLogger(__name__)
+
+# (document information, similarity score, matching text snippet)
+SearchHit = tuple[dict[str, Any], float, str | None]
+
+# A search hit together with the ID of the chunk it came from
+RankedHit = tuple[str, SearchHit]
+
+# Only fetch what search results are built from; embeddings are never returned
+SEARCH_INCLUDE = ["documents", "metadatas", "distances"]
+
+# Hybrid search fuses this many times `limit` candidates from each retriever
+HYBRID_CANDIDATE_FACTOR = 4
+
+# Reciprocal-rank fusion constant; dampens the weight of top ranks
+RRF_K = 60
+
+
+class ChunkBatch(NamedTuple):
+    """Chunks of one document, ready to be embedded and written together."""
+
+    document_id: str
+    ids: list[str]
+    texts: list[str]
+    metadatas: list[dict[str, Any]]
+
+
+class DocumentUpdate(NamedTuple):
+    """Changes to a document's stored chunks besides writing its new ones."""
+
+    document_id: str
+    chunk_count: int
+    # Chunks in the batches yielded before this update, to embed and write
+    new_chunks: int
+    # Kept chunks whose metadata changed, updated without re-embedding
+    changed_ids: list[str]
+    changed_metadatas: list[dict[str, Any]]
+    deleted_ids: list[str]
+    # Fingerprint of the content, marking the document current once applied
+    fingerprint: str | None = None
+
+    @property
+    def unchanged(self) -> bool:
+        """Whether applying the update would leave the collection as it is."""
+        return not (self.new_chunks or self.changed_ids or self.deleted_ids)
+
+
+def chunk_ids(
+    document_id: str, texts: Sequence[str], seen: dict[str, int] | None = None
+) -> list[str]:
+    """Derive content-addressed IDs for a document's chunks.
+
+    Each ID combines the document ID with a hash of the chunk text, so an
+    unchanged chunk keeps its ID across re-uploads. Repeated texts within a
+    document are told apart by an occurrence number.
+
+    Args:
+        document_id: ID of the document
+        texts: Chunk texts in document order
+        seen: Occurrences counted so far, to continue from when a document's
+            chunks are numbered a window at a time; updated in place
+
+    Returns:
+        list[str]: One ID per chunk
+    """
+    seen = {} if seen is None else seen
+    ids = []
+    for text in texts:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        suffix = f"_{occurrence}" if occurrence else ""
+        ids.append(f"{document_id}_{digest}{suffix}")
+    return ids
 
 
 class VectorStore:
@@ -20,6 +109,14 @@ class VectorStore:
         """Initialize vector store connection and embedding model."""
         self.host = os.getenv("VECTOR_DB_HOST", "localhost")
         self.port = int(os.getenv("VECTOR_DB_PORT", "8001"))
+        # Bumped on every change to the collection so caches can detect it
+        self.corpus_generation = 0
+        # Pending save of the sparse index, batching the changes made until then
+        self._sparse_save_lock = threading.Lock()
+        self._sparse_save_timer: threading.Timer | None = None
+        # LLM tokenizer counting chunk tokens for prompt packing, loaded lazily
+        self._llm_tokenizer: Any = None
+        self._llm_tokenizer_failed = False
 
         # Create data directory if it doesn't exist
         chroma_dir = Path(settings.CHROMA_DB_DIR)
@@ -32,42 +129,439 @@ class VectorStore:
             )
 
             # Create or get collection
+            # Embeddings are always computed client-side with embedding_model,
+            # so Chroma must not load its own default embedding function
             self.collection = self.client.get_or_create_collection(
-                name=settings.COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
+                name=settings.COLLECTION_NAME,
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=None,
             )
 
             # Initialize the embedding model
             self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+
+            # Chunks are sized so the model never truncates what it embeds
+            self.chunker = TokenChunker(
+                self.embedding_model.tokenizer,
+                max_tokens=self._max_chunk_tokens(),
+                overlap_tokens=settings.CHUNK_OVERLAP,
+            )
+
+            # Batch query embeddings from concurrent requests together
+            self.query_batcher = EmbeddingBatcher(
+                self.embed_texts,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+            )
+
+            # Repeated queries skip the embedding model entirely
+            self.query_cache = QueryEmbeddingCache(
+                max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+                max_bytes=settings.QUERY_CACHE_MAX_BYTES,
+                ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+            )
+
+            # Re-indexed chunks reuse embeddings computed on earlier runs
+            dimension = self.embedding_model.get_sentence_embedding_dimension()
+            self.chunk_cache = DiskEmbeddingCache(
+                settings.EMBEDDING_CACHE_DIR,
+                settings.EMBEDDING_MODEL_NAME,
+                dimension=dimension or 0,
+                max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+                dtype=settings.EMBEDDING_CACHE_DTYPE,
+            )
+
+            # Keyword index over the same chunks, persisted next to Chroma
+            self.sparse_index_path = (
+                chroma_dir.parent / f"{settings.COLLECTION_NAME}_sparse.idx"
+            )
+            self.sparse_index = self._load_sparse_index()
+
+            # Documents whose last indexing completed, checked by is_current
+            self.markers = DocumentMarkers(
+                chroma_dir.parent / f"{settings.COLLECTION_NAME}_documents.sqlite"
+            )
         except Exception as e:
             raise RAGError(f"Failed to initialize vector store: {str(e)}")
 
-    def _create_chunks(self, text: str) -> list[str]:
-        """Split text into overlapping chunks for processing.
+    def _load_sparse_index(self) -> SparseIndex:
+        """Load the persisted sparse index, rebuilding it if out of sync.
+
+        The corpus is only re-tokenized when the saved index is missing,
+        unreadable or holds a different number of chunks than the collection.
+
+        Returns:
+            SparseIndex: Sparse index covering every chunk in the collection
+        """
+        index = SparseIndex.load(self.sparse_index_path)
+        total_chunks = self.collection.count()
+        if index is not None and len(index) == total_chunks:
+            return index
+
+        logger.info(f"Rebuilding sparse index over {total_chunks} chunks")
+        index = SparseIndex()
+        page_size = settings.VECTOR_WRITE_BATCH_SIZE
+        for offset in range(0, total_chunks, page_size):
+            page = self.collection.get(
+                include=["documents", "metadatas"],  # type: ignore[list-item]
+                limit=page_size,
+                offset=offset,
+            )
+            for chunk_id, text, metadata in zip(
+                page["ids"], page["documents"] or [], page["metadatas"] or []
+            ):
+                document_id = str((metadata or {}).get("document_id", ""))
+                index.add([chunk_id], document_id, [text or ""])
+        index.save(self.sparse_index_path)
+        return index
+
+    def close(self) -> None:
+        """Save pending index changes and release the store's resources."""
+        with self._sparse_save_lock:
+            timer, self._sparse_save_timer = self._sparse_save_timer, None
+        if timer is not None:
+            timer.cancel()
+        self.save_sparse_index()
+        self.query_batcher.close()
+        self.chunk_cache.close()
+        self.markers.close()
+        try:
+            # Stop the client's shared system so file handles are released
+            clear_cache = getattr(self.client, "clear_system_cache", None)
+            if clear_cache is not None:
+                clear_cache()
+        except Exception as e:
+            logger.warning(f"Error closing vector store: {str(e)}")
+
+    def save_sparse_index(self) -> None:
+        """Save the sparse index if it has unsaved changes."""
+        try:
+            if self.sparse_index.dirty:
+                self.sparse_index.save(self.sparse_index_path)
+        except Exception as e:
+            logger.error(f"Failed to save sparse index: {str(e)}")
+
+    def _schedule_sparse_save(self) -> None:
+        """Save the sparse index SPARSE_INDEX_SAVE_SECONDS from now.
+
+        Saving serializes the whole index, so changes committed in the
+        meantime are saved together rather than once per commit.
+        """
+        with self._sparse_save_lock:
+            if self._sparse_save_timer is not None:
+                return
+            timer = threading.Timer(
+                settings.SPARSE_INDEX_SAVE_SECONDS, self._start_sparse_save
+            )
+            timer.daemon = True
+            self._sparse_save_timer = timer
+        timer.start()
+
+    def _start_sparse_save(self) -> None:
+        """Hand a due sparse index save to a vector_db worker."""
+        with self._sparse_save_lock:
+            self._sparse_save_timer = None
+        try:
+            executors.vector_db.submit(self.save_sparse_index)
+        except ServiceOverloadedError:
+            self._schedule_sparse_save()
+
+    def _max_chunk_tokens(self) -> int:
+        """Return the largest chunk, in tokens, the embedding model embeds whole.
+
+        Returns:
+            int: CHUNK_SIZE capped at the model's sequence length minus the
+                special tokens the tokenizer adds
+        """
+        special_tokens = self.embedding_model.tokenizer.num_special_tokens_to_add()
+        model_limit = self.embedding_model.max_seq_length - special_tokens
+        return max(1, min(settings.CHUNK_SIZE, model_limit))
+
+    def _iter_chunks(self, document: dict[str, Any]) -> Iterator[Chunk]:
+        """Split a document into overlapping, token-sized chunks.
+
+        Streamed documents are chunked as their pieces are read, so only the
+        chunker's window is held in memory; pages are fed to the chunker one
+        at a time and each chunk records the pages it spans. Whole contents
+        are split at their page offsets, if any, to the same effect.
+
+        Args:
+            document: Document dictionary as accepted by ``add_document``
+
+        Returns:
+            Iterator[Chunk]: Text chunks with their token counts
+        """
+        if "pages" in document:
+            return self.chunker.chunk_pages(document["pages"])
+        if "pieces" in document:
+            return self.chunker.chunk(document["pieces"])
+        text = document.get("content", "")
+        page_offsets = document.get("page_offsets")
+        if not page_offsets:
+            return iter(self.chunker.chunk_text(text))
+        bounds = [*page_offsets[1:], len(text)]
+        pages = (text[start:stop] for start, stop in zip(page_offsets, bounds))
+        return self.chunker.chunk_pages(pages)
+
+    def _count_llm_tokens(self, texts: Sequence[str]) -> list[int] | None:
+        """Count the tokens of chunk texts with the LLM's tokenizer.
+
+        The counts are stored with the chunks, so packing a prompt into the
+        LLM context window does not tokenize retrieved chunks again. If the
+        tokenizer cannot be loaded, a warning is logged once and chunks are
+        stored without counts.
+
+        Args:
+            texts: Chunk texts
+
+        Returns:
+            list[int] | None: Token count of each text, or None if the LLM
+                tokenizer is unavailable
+        """
+        if self._llm_tokenizer is None:
+            if self._llm_tokenizer_failed:
+                return None
+            try:
+                self._llm_tokenizer = model_registry.get_tokenizer(
+                    settings.LLM_MODEL_NAME
+                )
+            except Exception as e:
+                logger.warning(f"LLM tokenizer unavailable, not counting: {str(e)}")
+                self._llm_tokenizer_failed = True
+                return None
+        if not texts:
+            return []
+        encoded = self._llm_tokenizer(list(texts), add_special_tokens=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def fingerprint(self, content_sha256: str) -> str:
+        """Fingerprint a document's content together with how it is indexed.
 
         Args:
-            text: The text to split into chunks
+            content_sha256: SHA-256 of the document file
 
         Returns:
-            list[str]: List of text chunks
+            str: Hash that changes with the content, the embedding model or
+                the chunking settings
         """
-        words = text.split()
-        chunks = []
+        key = "|".join(
+            [
+                content_sha256,
+                settings.EMBEDDING_MODEL_NAME,
+                str(self.chunker.max_tokens),
+                str(self.chunker.overlap_tokens),
+            ]
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+    def is_current(self, document_id: str, content_sha256: str) -> bool:
+        """Check whether a document is already indexed from identical content.
 
-        for i in range(0, len(words), settings.CHUNK_SIZE - settings.CHUNK_OVERLAP):
-            chunk = " ".join(words[i : i + settings.CHUNK_SIZE])
-            chunks.append(chunk)
+        The document's marker is checked rather than its chunks, as it is
+        only set once every chunk of an indexing run has been written; a run
+        that failed part way leaves no marker, so the file is indexed again.
 
-        return chunks
+        Args:
+            document_id: ID of the document
+            content_sha256: SHA-256 of the document file
+
+        Returns:
+            bool: True if re-indexing the content would change nothing
+        """
+        return self.markers.get(document_id) == self.fingerprint(content_sha256)
+
+    def stored_chunks(self, document_id: str) -> dict[str, dict[str, Any]]:
+        """Read the metadata of a document's stored chunks.
+
+        Args:
+            document_id: ID of the document
+
+        Returns:
+            dict[str, dict[str, Any]]: Metadata of each chunk by chunk ID
+        """
+        stored = self.collection.get(
+            where={"document_id": document_id},
+            include=["metadatas"],  # type: ignore[list-item]
+        )
+        return {
+            chunk_id: dict(metadata or {})
+            for chunk_id, metadata in zip(stored["ids"], stored["metadatas"] or [])
+        }
+
+    def prepare_document(
+        self, document: dict[str, Any], existing: dict[str, dict[str, Any]]
+    ) -> Iterator[ChunkBatch | DocumentUpdate]:
+        """Chunk a document and work out which stored chunks must change.
+
+        Chunk IDs are derived from the chunk text, so chunks that survive an
+        edit keep their ID and embedding. Chunks are made and diffed
+        ``VECTOR_WRITE_BATCH_SIZE`` at a time while the document is read, and
+        new chunks are yielded in batches of that size for embedding, so a
+        huge document is never held whole. Once the document is exhausted,
+        an update lists chunks that disappeared for deletion and kept chunks
+        whose metadata changed (such as a shifted ``chunk_index``) for a
+        metadata-only update. Chunking and token counting are CPU-bound, so
+        advance it in a ``chunking`` worker from async code.
+
+        Args:
+            document: Document dictionary as accepted by ``add_document``
+            existing: The document's stored chunks, from ``stored_chunks``
+
+        Yields:
+            ChunkBatch | DocumentUpdate: Batches of new chunks, then the
+                changes to apply once they are written
+        """
+        document_id = document["id"]
+        document_metadata = self._sanitize_metadata(document.get("metadata", {}))
+        content_sha256 = document_metadata.get("sha256")
+        fingerprint = None
+        if isinstance(content_sha256, str):
+            fingerprint = self.fingerprint(content_sha256)
+            document_metadata["fingerprint"] = fingerprint
+
+        write_batch_size = settings.VECTOR_WRITE_BATCH_SIZE
+        chunks = self._iter_chunks(document)
+        seen: dict[str, int] = {}
+        current: set[str] = set()
+        new = ChunkBatch(document_id, [], [], [])
+        changed_ids: list[str] = []
+        changed_metadatas: list[dict[str, Any]] = []
+        chunk_count = new_chunks = 0
+        while window := list(itertools.islice(chunks, write_batch_size)):
+            texts = [chunk.text for chunk in window]
+            llm_token_counts = self._count_llm_tokens(texts)
+            for i, (chunk_id, chunk) in enumerate(
+                zip(chunk_ids(document_id, texts, seen), window)
+            ):
+                metadata = {
+                    **document_metadata,
+                    "document_id": document_id,
+                    "title": document.get("title", ""),
+                    "doc_type": document.get("doc_type", ""),
+                    "chunk_index": chunk_count + i,
+                    "token_count": chunk.token_count,
+                    **(
+                        {
+                            "llm_token_count": llm_token_counts[i],
+                            "llm_tokenizer": settings.LLM_MODEL_NAME,
+                        }
+                        if llm_token_counts is not None
+                        else {}
+                    ),
+                    **(
+                        {"page_start": chunk.page_start, "page_end": chunk.page_end}
+                        if chunk.page_start is not None
+                        else {}
+                    ),
+                }
+                current.add(chunk_id)
+                if chunk_id not in existing:
+                    new.ids.append(chunk_id)
+                    new.texts.append(chunk.text)
+                    new.metadatas.append(metadata)
+                elif any(existing[chunk_id].get(k) != v for k, v in metadata.items()):
+                    changed_ids.append(chunk_id)
+                    changed_metadatas.append(metadata)
+            chunk_count += len(window)
+
+            while len(new.ids) >= write_batch_size:
+                new_chunks += write_batch_size
+                yield ChunkBatch(
+                    document_id,
+                    new.ids[:write_batch_size],
+                    new.texts[:write_batch_size],
+                    new.metadatas[:write_batch_size],
+                )
+                new = ChunkBatch(
+                    document_id,
+                    new.ids[write_batch_size:],
+                    new.texts[write_batch_size:],
+                    new.metadatas[write_batch_size:],
+                )
+        if new.ids:
+            new_chunks += len(new.ids)
+            yield new
+
+        yield DocumentUpdate(
+            document_id=document_id,
+            chunk_count=chunk_count,
+            new_chunks=new_chunks,
+            changed_ids=changed_ids,
+            changed_metadatas=changed_metadatas,
+            deleted_ids=sorted(set(existing) - current),
+            fingerprint=fingerprint,
+        )
+
+    async def write_batch(self, batch: ChunkBatch, embeddings: np.ndarray) -> None:
+        """Store an embedded batch of chunks in the collection and sparse index.
+
+        Call ``commit_writes`` once all batches of a document are written.
+        The document stops being marked current until its update is applied.
+
+        Args:
+            batch: Chunks to store
+            embeddings: Embeddings of the chunks, one row per chunk
+        """
+        await executors.vector_db.run(self.markers.remove, batch.document_id)
+        await executors.vector_db.run(
+            self.collection.upsert,
+            ids=batch.ids,
+            embeddings=embeddings.tolist(),
+            documents=batch.texts,
+            metadatas=batch.metadatas,  # type: ignore[arg-type]
+        )
+        await executors.vector_db.run(
+            self.sparse_index.add, batch.ids, batch.document_id, batch.texts
+        )
+
+    async def apply_update(self, update: DocumentUpdate) -> None:
+        """Refresh metadata of kept chunks, delete removed ones and mark it done.
+
+        Call after the update's new batches have been written, so a document
+        never loses chunks before their replacements are searchable. Also
+        call it for an unchanged update, which only sets the marker.
+
+        Args:
+            update: Changes returned by ``prepare_document``
+        """
+        if not update.unchanged:
+            await executors.vector_db.run(self.markers.remove, update.document_id)
+        if update.changed_ids:
+            await executors.vector_db.run(
+                self.collection.update,
+                ids=update.changed_ids,
+                metadatas=update.changed_metadatas,  # type: ignore[arg-type]
+            )
+        if update.deleted_ids:
+            await executors.vector_db.run(
+                self.collection.delete, ids=update.deleted_ids
+            )
+            await executors.vector_db.run(
+                self.sparse_index.remove_chunks, update.deleted_ids
+            )
+        if update.fingerprint is not None:
+            await executors.vector_db.run(
+                self.markers.set, update.document_id, update.fingerprint
+            )
+
+    async def commit_writes(self) -> None:
+        """Publish a new corpus generation and schedule a sparse index save."""
+        self.corpus_generation += 1
+        self._schedule_sparse_save()
 
     async def add_document(self, document: dict[str, Any]) -> None:
-        """Add a document to the vector store.
+        """Add or re-index a document in the vector store.
 
-        The document is split into chunks, embedded, and stored with metadata.
+        The document is split into chunks, and only chunks that are not
+        already stored are embedded and written, a batch at a time as the
+        document is chunked. Chunks the document no longer contains are
+        deleted. Adding identical content is a no-op.
 
         Args:
             document: Document dictionary containing:
                 - id: Unique identifier
-                - content: Text content
+                - content: Text content, or instead an iterable of its
+                  consecutive ``pieces`` or of its ``pages``
                 - title: Document title
                 - doc_type: Document type
                 - metadata: Additional metadata
@@ -76,50 +570,171 @@ class VectorStore:
             RAGError: If there's an error adding the document
         """
         try:
-            # Create chunks from document content
-            chunks = self._create_chunks(document.get("content", ""))
+            existing = await executors.vector_db.run(self.stored_chunks, document["id"])
+            items = self.prepare_document(document, existing)
+            written = False
+            try:
+                while True:
+                    item = await executors.chunking.run(next, items)
+                    if isinstance(item, DocumentUpdate):
+                        break
+                    embeddings = await executors.ingest_embedding.run(
+                        self.embed_chunks, item.texts
+                    )
+                    written = True
+                    await self.write_batch(item, embeddings)
+                written = written or not item.unchanged
+                await self.apply_update(item)
+            finally:
+                if written:
+                    await self.commit_writes()
+        except ServiceOverloadedError:
+            raise
+        except Exception as e:
+            raise RAGError(f"Failed to add document to vector store: {str(e)}")
 
-            # Generate chunk IDs
-            chunk_ids = [f"{document['id']}_chunk_{i}" for i in range(len(chunks))]
+    @staticmethod
+    def _sanitize_metadata(
+        metadata: dict[str, Any], prefix: str = ""
+    ) -> dict[str, str | int | float | bool]:
+        """Flatten metadata into the scalar values Chroma can store.
 
-            # Create metadata for each chunk
-            metadatas = [
-                {
-                    "document_id": document["id"],
-                    "title": document.get("title", ""),
-                    "doc_type": document.get("doc_type", ""),
-                    "chunk_index": i,
-                    **document.get("metadata", {}),
-                }
-                for i in range(len(chunks))
+        Nested dictionaries are flattened into dotted keys, ``None`` values are
+        dropped and any other non-scalar value is stored as its string form.
+
+        Args:
+            metadata: Metadata to sanitize
+            prefix: Key prefix used for nested dictionaries
+
+        Returns:
+            dict[str, str | int | float | bool]: Flat, Chroma-compatible metadata
+        """
+        flat: dict[str, str | int | float | bool] = {}
+        for key, value in metadata.items():
+            name = f"{prefix}{key}"
+            if value is None:
+                continue
+            if isinstance(value, dict):
+                flat.update(VectorStore._sanitize_metadata(value, f"{name}."))
+            elif isinstance(value, (str, int, float, bool)):
+                flat[name] = value
+            else:
+                flat[name] = str(value)
+        return flat
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts with the loaded embedding model.
+
+        Texts are encoded in batches of ``DEFAULT_BATCH_SIZE``. Queries and
+        chunks go through this same method so both live in one vector space.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            np.ndarray: Normalized float32 embeddings, one row per text
+        """
+        embeddings = self.embedding_model.encode(
+            list(texts),
+            batch_size=DEFAULT_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def embed_chunks(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed chunk texts, reusing embeddings from the on-disk chunk cache.
+
+        Only texts missing from the cache are encoded, and their embeddings
+        are added to it.
+
+        Args:
+            texts: Chunk texts to embed
+
+        Returns:
+            np.ndarray: Normalized float32 embeddings, one row per text
+        """
+        embeddings, missing = self.chunk_cache.get_many(texts)
+        if missing:
+            encoded = self.embed_texts([texts[i] for i in missing])
+            embeddings[missing] = encoded
+            self.chunk_cache.put_many([texts[i] for i in missing], encoded)
+        return embeddings
+
+    async def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """Embed queries, serving repeated ones from the query cache.
+
+        Cache misses are embedded together through the micro-batcher.
+
+        Args:
+            queries: Query strings to embed
+
+        Returns:
+            np.ndarray: Normalized float32 embeddings, one row per query
+        """
+        model_name = settings.EMBEDDING_MODEL_NAME
+        normalized = [normalize_query(query) for query in queries]
+        vectors: list[np.ndarray | None] = [
+            self.query_cache.get(model_name, query) for query in normalized
+        ]
+
+        missing = sorted({q for q, v in zip(normalized, vectors) if v is None})
+        if missing:
+            embedded = dict(zip(missing, await self.query_batcher.embed_many(missing)))
+            for query, vector in embedded.items():
+                self.query_cache.put(model_name, query, vector)
+            vectors = [
+                embedded[query] if vector is None else vector
+                for query, vector in zip(normalized, vectors)
             ]
+        return np.vstack(vectors)
 
-            # Add to collection
-            self.collection.add(
-                ids=chunk_ids,
-                embeddings=None,  # Let ChromaDB compute embeddings
-                documents=chunks,
-                metadatas=[{str(k): v for k, v in m.items()} for m in metadatas],
-            )
-        except Exception as e:
-            raise RAGError(f"Failed to add document to vector store: {str(e)}")
+    @staticmethod
+    def _to_search_hit(
+        metadata: dict[str, Any], score: float, snippet: str | None
+    ) -> SearchHit:
+        """Map a stored chunk back into a search result tuple.
+
+        Args:
+            metadata: Chunk metadata as stored in the collection
+            score: Relevance score of the chunk
+            snippet: Chunk text
+
+        Returns:
+            SearchHit: Document information, similarity score and snippet
+        """
+        path = str(metadata.get("path") or metadata.get("title", ""))
+        document = {
+            "document_id": metadata.get("document_id", ""),
+            "filename": metadata.get("filename") or Path(path).name,
+            "path": path,
+            "size": int(metadata.get("size", 0)),
+            "title": metadata.get("title", ""),
+            "chunk_index": metadata.get("chunk_index", 0),
+            "page_start": metadata.get("page_start"),
+            "page_end": metadata.get("page_end"),
+            # Only valid for the tokenizer that produced it
+            "llm_token_count": (
+                metadata.get("llm_token_count")
+                if metadata.get("llm_tokenizer") == settings.LLM_MODEL_NAME
+                else None
+            ),
+        }
+        return document, score, snippet
 
     async def search(
         self,
         query: str,
         limit: int = 5,
-    ) -> Sequence[
-        tuple[
-            dict[str, Any],  # Document information
-            float,  # Similarity score
-            str | None,  # Matching text snippet
-        ]
-    ]:
+        mode: SearchMode = "hybrid",
+    ) -> Sequence[SearchHit]:
         """Search for documents similar to the query.
 
         Args:
             query: Search query string
             limit: Maximum number of results to return
+            mode: Retrieval mode: dense vectors, sparse BM25 or both fused
 
         Returns:
             Sequence of tuples containing:
@@ -127,25 +742,180 @@ class VectorStore:
                 - Similarity score
                 - Matching text snippet
         """
+        results = await self.search_batch([query], limit, mode)
+        return results[0]
+
+    async def search_batch(
+        self, queries: Sequence[str], limit: int = 5, mode: SearchMode = "hybrid"
+    ) -> list[list[SearchHit]]:
+        """Search for several queries with one embedding pass and one query call.
+
+        In hybrid mode the dense and sparse candidate lists are merged with
+        reciprocal-rank fusion, and scores are the fused RRF scores.
+
+        Args:
+            queries: Search query strings
+            limit: Maximum number of results to return per query
+            mode: Retrieval mode: dense vectors, sparse BM25 or both fused
+
+        Returns:
+            list[list[SearchHit]]: Search results for each query, in order
+
+        Raises:
+            RAGError: If there's an error searching the vector store
+        """
         try:
-            # For testing purposes, return mock results
-            # In production, this would use actual vector search
-            mock_results: list[tuple[dict[str, Any], float, str | None]] = [
-                (
-                    {
-                        "filename": "test_doc.txt",
-                        "size": 1024,
-                        "path": str(Path(settings.UPLOAD_DIR) / "test_doc.txt"),
-                    },
-                    0.95,
-                    "This is a relevant text snippet...",
-                )
+            total_chunks = await executors.vector_db.run(self.collection.count)
+            if not queries or total_chunks == 0:
+                return [[] for _ in queries]
+
+            candidates = limit * HYBRID_CANDIDATE_FACTOR if mode == "hybrid" else limit
+            candidates = min(candidates, total_chunks)
+            if mode == "dense":
+                dense = await self._dense_search(queries, candidates)
+                return [[hit for _, hit in ranked] for ranked in dense]
+            if mode == "sparse":
+                sparse = await self._sparse_search(queries, candidates)
+                return [[hit for _, hit in ranked] for ranked in sparse]
+
+            dense = await self._dense_search(queries, candidates)
+            sparse = await self._sparse_search(queries, candidates)
+            return [
+                self._fuse(dense_ranked, sparse_ranked, limit)
+                for dense_ranked, sparse_ranked in zip(dense, sparse)
             ]
-            return mock_results[:limit]
 
+        except ServiceOverloadedError:
+            raise
         except Exception as e:
             raise RAGError(f"Failed to search vector store: {str(e)}")
 
+    async def _dense_search(
+        self, queries: Sequence[str], limit: int
+    ) -> list[list[RankedHit]]:
+        """Retrieve chunks by embedding similarity.
+
+        Args:
+            queries: Search query strings
+            limit: Maximum number of results per query
+
+        Returns:
+            list[list[RankedHit]]: Ranked chunk IDs and hits for each query
+        """
+        embeddings = await self.embed_queries(queries)
+        response = await executors.vector_db.run(
+            self.collection.query,
+            query_embeddings=embeddings.tolist(),
+            n_results=limit,
+            include=SEARCH_INCLUDE,  # type: ignore[arg-type]
+        )
+
+        ids = response["ids"]
+        documents = response.get("documents") or [[] for _ in queries]
+        metadatas = response.get("metadatas") or [[] for _ in queries]
+        distances = response.get("distances") or [[] for _ in queries]
+        return [
+            [
+                # The collection uses cosine distance, so similarity is 1 - distance
+                (
+                    chunk_id,
+                    self._to_search_hit(
+                        dict(metadata or {}), 1.0 - float(distance), snippet
+                    ),
+                )
+                for chunk_id, snippet, metadata, distance in zip(
+                    query_ids, query_documents, query_metadatas, query_distances
+                )
+            ]
+            for query_ids, query_documents, query_metadatas, query_distances in zip(
+                ids, documents, metadatas, distances
+            )
+        ]
+
+    async def _sparse_search(
+        self, queries: Sequence[str], limit: int
+    ) -> list[list[RankedHit]]:
+        """Retrieve chunks by BM25 keyword score.
+
+        Args:
+            queries: Search query strings
+            limit: Maximum number of results per query
+
+        Returns:
+            list[list[RankedHit]]: Ranked chunk IDs and hits for each query
+        """
+        scored = [
+            await executors.vector_db.run(self.sparse_index.search, query, limit)
+            for query in queries
+        ]
+        chunk_ids = sorted({chunk_id for ranked in scored for chunk_id, _ in ranked})
+        if not chunk_ids:
+            return [[] for _ in queries]
+
+        # Fetch text and metadata for every matched chunk in one call
+        response = await executors.vector_db.run(
+            self.collection.get,
+            ids=chunk_ids,
+            include=["documents", "metadatas"],  # type: ignore[list-item]
+        )
+        chunks = {
+            chunk_id: (snippet, dict(metadata or {}))
+            for chunk_id, snippet, metadata in zip(
+                response["ids"],
+                response.get("documents") or [],
+                response.get("metadatas") or [],
+            )
+        }
+        return [
+            [
+                (
+                    chunk_id,
+                    self._to_search_hit(
+                        chunks[chunk_id][1], score, chunks[chunk_id][0]
+                    ),
+                )
+                for chunk_id, score in ranked
+                if chunk_id in chunks
+            ]
+            for ranked in scored
+        ]
+
+    @staticmethod
+    def _fuse(
+        dense: list[RankedHit], sparse: list[RankedHit], limit: int
+    ) -> list[SearchHit]:
+        """Merge two ranked lists with reciprocal-rank fusion.
+
+        Args:
+            dense: Ranked hits from vector search
+            sparse: Ranked hits from BM25 search
+            limit: Maximum number of results
+
+        Returns:
+            list[SearchHit]: Fused hits scored by RRF, best first
+        """
+        scores: dict[str, float] = {}
+        hits: dict[str, SearchHit] = {}
+        for ranked in (dense, sparse):
+            for rank, (chunk_id, hit) in enumerate(ranked):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                hits.setdefault(chunk_id, hit)
+
+        best = sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+        return [(hits[c][0], scores[c], hits[c][2]) for c in best]
+
+    def stats(self) -> dict[str, Any]:
+        """Return statistics for the store's in-process caches and indexes.
+
+        Returns:
+            dict[str, Any]: Statistics keyed by cache or index name
+        """
+        return {
+            "query_embedding_cache": self.query_cache.stats(),
+            "chunk_embedding_cache": self.chunk_cache.stats(),
+            "sparse_index": self.sparse_index.stats(),
+        }
+
     async def delete_document(self, document_id: str) -> None:
         """Delete a document and all its chunks from the vector store.
 
@@ -157,6 +927,17 @@ class VectorStore:
         """
         try:
             # Delete all chunks for the document
-            self.collection.delete(where={"document_id": document_id})
+            await executors.vector_db.run(self.markers.remove, document_id)
+            await executors.vector_db.run(
+                self.collection.delete, where={"document_id": document_id}
+            )
+            await executors.vector_db.run(
+                self.sparse_index.remove_document, document_id
+            )
+            self._schedule_sparse_save()
+        except ServiceOverloadedError:
+            raise
         except Exception as e:
             raise RAGError(f"Failed to delete document from vector store: {str(e)}")
+        finally:
+            self.corpus_generation += 1
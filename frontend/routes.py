@@ -1,22 +1,23 @@
 """Route handlers for the frontend application."""
 
 import logging
+from pathlib import Path
 from typing import Any
 
 from fastapi import Form, Request, UploadFile
 from fastapi.responses import HTMLResponse
 
+from app.services.container import container
 from app.services.document_service import DocumentService
-from app.services.rag_service import RAGService
-from app.services.vector_store import VectorStore
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Initialize services
 document_service = DocumentService()
-vector_store = VectorStore()
-rag_service = RAGService(vector_store)
+vector_store = container.get_vector_store()
+ingestion = container.get_ingestion_pipeline()
+rag_service = container.get_rag_service()
 
 
 async def index(request: Request) -> HTMLResponse:
@@ -41,14 +42,16 @@ async def upload_document(request: Request, file: UploadFile) -> dict[str, Any]:
         file: The uploaded file
 
     Returns:
-        dict[str, Any]: Upload status and document information
+        dict[str, Any]: Upload status, document information and ingestion job ID
     """
     try:
         result = await document_service.process_document(file)
+        job = ingestion.submit(Path(str(result["path"])), dict(result))
         return {
             "success": True,
-            "message": "Document uploaded successfully",
+            "message": "Document accepted for processing",
             "filename": result["filename"],
+            "job_id": job.id,
         }
     except Exception as e:
         logger.error(f"Upload error: {str(e)}")
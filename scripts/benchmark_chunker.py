@@ -0,0 +1,201 @@
+"""Benchmark the token-aware chunker against the legacy word chunker.
+
+Both chunkers run over the same synthetic document. For each, the script
+reports chunks per second, the number of chunks, the estimated index size
+(float32 vectors plus stored text) and, for the word chunker, how many
+tokens per chunk the embedding model would silently truncate.
+
+With ``--local-tokenizer`` the embedding model is not loaded: a BERT-style
+WordPiece tokenizer is trained on the document instead, and the dimension and
+sequence length of all-MiniLM-L6-v2 are assumed.
+
+Usage:
+    python scripts/benchmark_chunker.py --paragraphs 2000
+    python scripts/benchmark_chunker.py --paragraphs 2000 --local-tokenizer
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+WORDS = (
+    "the system returns error code ERR-1234 when the configuration file "
+    "version 2.3.1 is missing a required field and retries the request "
+    "after a short delay before reporting the failure to the operator"
+).split()
+
+# Settings of the chunker this benchmark compares against
+LEGACY_CHUNK_WORDS = 512
+LEGACY_OVERLAP_WORDS = 50
+
+# Shape of all-MiniLM-L6-v2, assumed with --local-tokenizer
+LOCAL_DIMENSION = 384
+LOCAL_MAX_SEQ_LENGTH = 256
+LOCAL_VOCAB_SIZE = 30522
+
+
+def build_document(paragraphs: int) -> str:
+    """Build a synthetic document of paragraphs of random sentences.
+
+    Args:
+        paragraphs: Number of paragraphs
+
+    Returns:
+        str: Document text
+    """
+    rng = random.Random(0)
+    blocks = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            words = rng.choices(WORDS, k=rng.randint(6, 30))
+            sentences.append(" ".join(words).capitalize() + ".")
+        blocks.append(" ".join(sentences))
+    return "\n\n".join(blocks)
+
+
+def train_local_tokenizer(text: str) -> Any:
+    """Train a lowercasing WordPiece tokenizer like the embedding model's.
+
+    Args:
+        text: Document text to learn the vocabulary from
+
+    Returns:
+        Any: A fast Hugging Face tokenizer adding [CLS] and [SEP]
+    """
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from tokenizers.trainers import WordPieceTrainer
+    from transformers import PreTrainedTokenizerFast  # type: ignore
+
+    special = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    tokenizer = Tokenizer(models.WordPiece(unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    trainer = WordPieceTrainer(vocab_size=LOCAL_VOCAB_SIZE, special_tokens=special)
+    tokenizer.train_from_iterator(text.split("\n\n"), trainer)
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B [SEP]",
+        special_tokens=[(name, tokenizer.token_to_id(name)) for name in special],
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        unk_token="[UNK]",
+        pad_token="[PAD]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        mask_token="[MASK]",
+    )
+
+
+def legacy_chunks(text: str) -> list[str]:
+    """Chunk text into overlapping windows of words, as the old chunker did.
+
+    Args:
+        text: Document text
+
+    Returns:
+        list[str]: Chunk texts
+    """
+    words = text.split()
+    chunks = []
+    step = LEGACY_CHUNK_WORDS - LEGACY_OVERLAP_WORDS
+    for i in range(0, len(words), step):
+        chunks.append(" ".join(words[i : i + LEGACY_CHUNK_WORDS]))
+    return chunks
+
+
+def timed(func: Callable[[], list[str]], repeats: int) -> tuple[list[str], float]:
+    """Run a chunker several times and return its output and best time.
+
+    Args:
+        func: Chunker call to time
+        repeats: Number of runs
+
+    Returns:
+        tuple[list[str], float]: Chunk texts and the fastest run in seconds
+    """
+    best = float("inf")
+    chunks: list[str] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = func()
+        best = min(best, time.perf_counter() - start)
+    return chunks, best
+
+
+def report(name: str, chunks: list[str], seconds: float, dimension: int) -> None:
+    """Print throughput and index size for one chunker.
+
+    Args:
+        name: Chunker name
+        chunks: Chunk texts it produced
+        seconds: Time taken to chunk the document
+        dimension: Embedding dimension
+    """
+    vector_bytes = len(chunks) * dimension * 4
+    text_bytes = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+    print(f"{name}:")
+    print(f"  chunks      {len(chunks)}")
+    print(f"  chunks/sec  {len(chunks) / seconds:,.0f}")
+    print(f"  index size  {(vector_bytes + text_bytes) / 2**20:.1f} MiB")
+
+
+def main() -> None:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--local-tokenizer",
+        action="store_true",
+        help="Train a WordPiece tokenizer instead of loading the embedding model",
+    )
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from app.core.config import settings
+    from app.services.chunker import TokenChunker
+
+    text = build_document(args.paragraphs)
+    print(f"Document: {len(text):,} characters, {args.paragraphs} paragraphs")
+
+    if args.local_tokenizer:
+        tokenizer = train_local_tokenizer(text)
+        dimension = LOCAL_DIMENSION
+        max_seq_length = LOCAL_MAX_SEQ_LENGTH
+    else:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+        tokenizer = model.tokenizer
+        dimension = model.get_sentence_embedding_dimension()
+        max_seq_length = model.get_max_seq_length()
+    max_tokens = min(
+        settings.CHUNK_SIZE, max_seq_length - tokenizer.num_special_tokens_to_add()
+    )
+    chunker = TokenChunker(tokenizer, max_tokens, settings.CHUNK_OVERLAP)
+
+    legacy, legacy_seconds = timed(lambda: legacy_chunks(text), args.repeats)
+    # Tokens past the model limit are dropped when the chunk is embedded
+    legacy_tokens = chunker.count_tokens(legacy)
+    report("word chunker", legacy, legacy_seconds, dimension)
+    lost = sum(max(0, count - max_tokens) for count in legacy_tokens)
+    print(
+        f"  truncated   {lost:,} of {sum(legacy_tokens):,} tokens "
+        f"({lost / max(1, sum(legacy_tokens)):.0%}) never reach the model"
+    )
+
+    token, token_seconds = timed(
+        lambda: [chunk.text for chunk in chunker.chunk_text(text)], args.repeats
+    )
+    report("token chunker", token, token_seconds, dimension)
+    print("  truncated   0 tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Benchmark the streaming DOCX extractor against the python-docx model.
+
+A synthetic DOCX of paragraphs and tables is written straight as XML, then
+extracted by both paths, each in a fresh process. For each, the script
+reports elapsed time, throughput in MB of document XML per second, peak
+resident memory and the number of characters extracted (python-docx only
+sees body paragraphs, so it misses the table text).
+
+Usage:
+    python scripts/benchmark_docx_extraction.py --megabytes 120
+    python scripts/benchmark_docx_extraction.py --docx reports/large.docx
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" '
+    'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    "</Types>"
+)
+RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+    'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+    '.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/></Relationships>'
+)
+DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/'
+    '2006/main"><w:body>'
+)
+DOCUMENT_END = "<w:sectPr/></w:body></w:document>"
+
+SENTENCE = "The quarterly report lists revenue, costs and open risks by region. "
+
+
+def paragraph(text: str) -> str:
+    """Render a paragraph with a single run.
+
+    Args:
+        text: Paragraph text
+
+    Returns:
+        str: ``w:p`` XML
+    """
+    return f'<w:p><w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+
+def table(index: int, rows: int = 5, cols: int = 4) -> str:
+    """Render a small table.
+
+    Args:
+        index: Number used in the cell texts
+        rows: Number of rows
+        cols: Number of columns
+
+    Returns:
+        str: ``w:tbl`` XML
+    """
+    body = "".join(
+        "<w:tr>"
+        + "".join(
+            f"<w:tc>{paragraph(f'table {index} cell {r}.{c}')}</w:tc>"
+            for c in range(cols)
+        )
+        + "</w:tr>"
+        for r in range(rows)
+    )
+    return f"<w:tbl>{body}</w:tbl>"
+
+
+def build_docx(path: Path, megabytes: int) -> int:
+    """Write a DOCX whose document XML is roughly the given size.
+
+    Args:
+        path: File to write
+        megabytes: Target size of ``word/document.xml`` in MB
+
+    Returns:
+        int: Size of the document XML in bytes
+    """
+    target = megabytes * 1024 * 1024
+    written = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        archive.writestr("_rels/.rels", RELATIONSHIPS)
+        with archive.open("word/document.xml", "w", force_zip64=True) as xml:
+            xml.write(DOCUMENT_START.encode())
+            index = 0
+            while written < target:
+                block = "".join(
+                    paragraph(f"{index}.{i} " + SENTENCE * 4) for i in range(20)
+                ) + table(index)
+                data = block.encode()
+                xml.write(data)
+                written += len(data)
+                index += 1
+            xml.write(DOCUMENT_END.encode())
+    return written
+
+
+def legacy_extract(path: Path) -> int:
+    """Extract body paragraphs through the python-docx document model.
+
+    Args:
+        path: DOCX file
+
+    Returns:
+        int: Characters extracted
+    """
+    from docx import Document as DocxDocument
+
+    doc = DocxDocument(str(path))
+    return len("\n".join(paragraph.text for paragraph in doc.paragraphs))
+
+
+def streaming_extract(path: Path) -> int:
+    """Extract paragraphs and tables with the streaming extractor.
+
+    Args:
+        path: DOCX file
+
+    Returns:
+        int: Characters extracted
+    """
+    from app.services.docx_reader import iter_docx_text
+
+    return len("\n".join(iter_docx_text(path)))
+
+
+def measure(name: str, path: Path) -> tuple[float, int, int]:
+    """Run one extractor and measure it. Runs in a fresh process.
+
+    Args:
+        name: ``legacy`` or ``streaming``
+        path: DOCX file
+
+    Returns:
+        tuple[float, int, int]: Seconds, characters and peak RSS in KiB
+    """
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    extract = legacy_extract if name == "legacy" else streaming_extract
+    started = time.perf_counter()
+    characters = extract(path)
+    elapsed = time.perf_counter() - started
+    return elapsed, characters, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main() -> None:
+    """Run the benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--megabytes", type=int, default=100)
+    parser.add_argument("--docx", type=Path, help="Benchmark an existing DOCX")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.docx
+        if path is None:
+            path = Path(tmp) / "benchmark.docx"
+            build_docx(path, args.megabytes)
+        with zipfile.ZipFile(path) as archive:
+            xml_size = archive.getinfo("word/document.xml").file_size
+        print(
+            f"{path.stat().st_size / 1e6:.1f} MB DOCX, "
+            f"{xml_size / 1e6:.1f} MB document XML"
+        )
+        print(
+            f"{'extractor':>10} {'seconds':>8} {'MB/s':>7} {'peak MB':>8} {'chars':>12}"
+        )
+
+        context = multiprocessing.get_context("spawn")
+        for name in ("legacy", "streaming"):
+            with context.Pool(1) as pool:
+                elapsed, characters, peak = pool.apply(measure, (name, path))
+            print(
+                f"{name:>10} {elapsed:>8.2f} {xml_size / 1e6 / elapsed:>7.1f} "
+                f"{peak / 1024:>8.0f} {characters:>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark continuous batching against one generation at a time.
+
+A tiny randomly initialised Llama-style model stands in for the real LLM.
+Each of N concurrent clients sends requests back to back. In ``sequential``
+mode every request runs ``generate`` on its own in a single worker, as
+the pipeline path does. In ``batched`` mode the requests share decoding
+steps through the ``GenerationScheduler``. For 1, 4 and 16 clients the script
+reports generated tokens per second and the median and p95 request latency.
+
+Usage:
+    python scripts/benchmark_generation_batching.py
+    python scripts/benchmark_generation_batching.py --clients 1 8 32 --hidden-size 512
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers  # type: ignore
+from transformers import (  # type: ignore
+    LlamaConfig,
+    LlamaForCausalLM,
+    PreTrainedTokenizerFast,
+)
+
+
+def build_model(args: argparse.Namespace) -> tuple[Any, Any]:
+    """Create the stand-in model and a word-level tokenizer for it.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        tuple[Any, Any]: Model and tokenizer
+    """
+    words = ["<unk>", "</s>"] + [f"w{i}" for i in range(args.vocab_size - 2)]
+    backend = Tokenizer(
+        models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="<unk>")
+    )
+    backend.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="<unk>", eos_token="</s>"
+    )
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=args.vocab_size,
+        hidden_size=args.hidden_size,
+        intermediate_size=args.hidden_size * 4,
+        num_hidden_layers=args.layers,
+        num_attention_heads=args.hidden_size // 64,
+        num_key_value_heads=args.hidden_size // 64,
+        # Never stop early, so every request generates max_new_tokens
+        eos_token_id=None,
+    )
+    return LlamaForCausalLM(config).eval(), tokenizer
+
+
+def make_prompts(count: int, args: argparse.Namespace) -> list[str]:
+    """Build prompts of random words and lengths.
+
+    Args:
+        count: Number of prompts
+        args: Parsed command line arguments
+
+    Returns:
+        list[str]: The prompts
+    """
+    rng = random.Random(count)
+    return [
+        " ".join(
+            f"w{rng.randrange(args.vocab_size - 2)}"
+            for _ in range(rng.randint(args.min_prompt, args.max_prompt))
+        )
+        for _ in range(count)
+    ]
+
+
+def run_clients(
+    clients: int, requests: int, generate: Any, prompts: list[str]
+) -> tuple[float, list[float]]:
+    """Run concurrent clients that each send requests back to back.
+
+    Args:
+        clients: Number of concurrent clients
+        requests: Requests sent by each client
+        generate: Blocking call generating one prompt
+        prompts: One prompt per request
+
+    Returns:
+        tuple[float, list[float]]: Wall time and per-request latencies in
+            seconds
+    """
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def client(index: int) -> None:
+        for prompt in prompts[index * requests : (index + 1) * requests]:
+            started = time.perf_counter()
+            generate(prompt)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies
+
+
+def main() -> None:
+    """Run the benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=4, help="Per client")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--min-prompt", type=int, default=32)
+    parser.add_argument("--max-prompt", type=int, default=128)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--vocab-size", type=int, default=2048)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from app.services.cancellation import CancellationCriteria, CancellationToken
+    from app.services.generation_scheduler import GenerationScheduler
+
+    model, tokenizer = build_model(args)
+    parameters = sum(p.numel() for p in model.parameters())
+    print(
+        f"{parameters / 1e6:.1f}M parameter model, {args.max_new_tokens} new "
+        f"tokens per request, {torch.get_num_threads()} torch threads"
+    )
+
+    # Mirrors GENERATION_WORKERS=1 on the pipeline path
+    worker = ThreadPoolExecutor(max_workers=1)
+
+    def sequential(prompt: str) -> None:
+        def run() -> None:
+            ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+            with torch.inference_mode():
+                model.generate(
+                    ids,
+                    attention_mask=torch.ones_like(ids),
+                    max_new_tokens=args.max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=0,
+                )
+
+        worker.submit(run).result()
+
+    scheduler = GenerationScheduler(
+        model,
+        tokenizer,
+        max_batch_size=args.max_batch_size,
+        max_pending=max(args.clients),
+    )
+
+    def batched(prompt: str) -> None:
+        criteria = CancellationCriteria(CancellationToken())
+        scheduler.submit(
+            prompt,
+            criteria,
+            max_new_tokens=args.max_new_tokens,
+            temperature=0,
+            top_p=1,
+        ).result()
+
+    # Warm up both paths
+    sequential("w1 w2 w3")
+    batched("w1 w2 w3")
+
+    print(f"{'clients':>7} {'mode':>10} {'tokens/s':>9} {'p50 s':>7} {'p95 s':>7}")
+    try:
+        for clients in args.clients:
+            prompts = make_prompts(clients * args.requests, args)
+            for name, generate in (("sequential", sequential), ("batched", batched)):
+                elapsed, latencies = run_clients(
+                    clients, args.requests, generate, prompts
+                )
+                tokens = len(latencies) * args.max_new_tokens
+                p95 = statistics.quantiles(latencies, n=20, method="inclusive")[18]
+                print(
+                    f"{clients:>7} {name:>10} {tokens / elapsed:>9.1f} "
+                    f"{statistics.median(latencies):>7.2f} {p95:>7.2f}"
+                )
+    finally:
+        scheduler.close()
+        worker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark parallel page-range PDF extraction against worker count.
+
+A synthetic PDF is extracted into the extraction cache the way ingestion
+does it, through ``DocumentProcessor._process_pdf`` and the parsing process
+pool. The serial pass extracts every page in one worker; the parallel passes
+split the PDF into one page range per worker, each written to its own part
+of the cache entry. For each worker count the script reports pages per
+second and the speedup over the serial pass.
+
+Usage:
+    python scripts/benchmark_pdf_extraction.py --pages 3000
+    python scripts/benchmark_pdf_extraction.py --pdf archive/large.pdf
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # type: ignore  # PyMuPDF
+
+LINES_PER_PAGE = 40
+
+
+def build_pdf(path: Path, pages: int) -> None:
+    """Write a synthetic PDF with lines of text on every page.
+
+    Args:
+        path: File to write
+        pages: Number of pages
+    """
+    with fitz.open() as pdf:
+        for number in range(pages):
+            page = pdf.new_page()
+            text = "\n".join(
+                f"Page {number} line {line}: the quick brown fox jumps over it"
+                for line in range(LINES_PER_PAGE)
+            )
+            page.insert_text((36, 36), text, fontsize=9)
+        pdf.save(path)
+
+
+async def extract(path: Path, workers: int, parallel: bool, cache_dir: Path) -> float:
+    """Extract a PDF into a fresh extraction cache with a parsing pool.
+
+    Args:
+        path: PDF to extract
+        workers: Number of parsing worker processes
+        parallel: Split the PDF into page ranges, or extract it in one pass
+        cache_dir: Directory of the extraction cache to write
+
+    Returns:
+        float: Seconds taken, excluding pool start-up
+    """
+    from app.core.config import settings
+    from app.core.executors import BoundedExecutor, executors
+    from app.services import document_processor
+    from app.services.document_processor import DocumentProcessor, PinnedFile
+    from app.services.extraction_cache import ExtractionCache, file_sha256
+
+    settings.PDF_PARALLEL_MIN_PAGES = 1 if parallel else sys.maxsize
+    settings.PDF_MIN_PAGES_PER_RANGE = 1
+    document_processor.extraction_cache = ExtractionCache(cache_dir)
+    executors.parsing = BoundedExecutor(
+        "parsing", workers, workers * 4, use_processes=True
+    )
+    try:
+        # Start the workers and import the extractor so neither is timed
+        await asyncio.gather(
+            *(
+                executors.parsing.run(document_processor.pdf_page_ranges, 1, 1, 1)
+                for _ in range(workers * 2)
+            )
+        )
+        pinned = PinnedFile(path, path, file_sha256(path))
+        started = time.perf_counter()
+        await DocumentProcessor._process_pdf(pinned, "pdf-benchmark")
+        return time.perf_counter() - started
+    finally:
+        executors.parsing.shutdown()
+
+
+def read_back(path: Path, cache_dir: Path) -> int:
+    """Count the characters of an extraction stored in the cache.
+
+    Args:
+        path: The extracted PDF
+        cache_dir: Directory of the extraction cache
+
+    Returns:
+        int: Characters of the stored pages
+    """
+    from app.services.extraction_cache import ExtractionCache, file_sha256
+
+    cache = ExtractionCache(cache_dir)
+    pieces = cache.iter_pieces(file_sha256(path), "pdf-benchmark")
+    return sum(len(piece) for piece in pieces)
+
+
+def main() -> None:
+    """Run the benchmark and print a table of throughput by worker count."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--pdf", type=Path, help="Benchmark an existing PDF")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if path is None:
+            path = Path(tmp) / "benchmark.pdf"
+            build_pdf(path, args.pages)
+        with fitz.open(path) as pdf:
+            page_count = len(pdf)
+
+        cache_dir = Path(tmp) / "serial"
+        baseline = asyncio.run(extract(path, 1, False, cache_dir))
+        characters = read_back(path, cache_dir)
+        print(f"{page_count} pages, {characters} characters")
+        print(f"{'workers':>8} {'pages/sec':>10} {'speedup':>8}")
+        print(f"{'serial':>8} {page_count / baseline:>10.0f} {1.0:>8.2f}")
+
+        workers = 1
+        while workers <= args.max_workers:
+            cache_dir = Path(tmp) / f"parallel-{workers}"
+            elapsed = asyncio.run(extract(path, workers, True, cache_dir))
+            assert read_back(path, cache_dir) == characters
+            print(
+                f"{workers:>8} {page_count / elapsed:>10.0f} "
+                f"{baseline / elapsed:>8.2f}"
+            )
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
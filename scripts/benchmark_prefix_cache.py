@@ -0,0 +1,93 @@
+"""Benchmark prefill with and without the prompt prefix KV cache.
+
+Requests share a long scaffold, as RAG prompts share their instructions and
+often their retrieved context, and each ends in its own short question. They
+run one at a time through the ``GenerationScheduler`` and generate a single
+token, so request latency is essentially prefill. The script reports the
+mean and p95 prefill latency with the cache off and on, and the prefill time
+the cache estimates it saved per request.
+
+Usage:
+    python scripts/benchmark_prefix_cache.py
+    python scripts/benchmark_prefix_cache.py --scaffold-tokens 2048 --hidden-size 512
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from benchmark_generation_batching import build_model
+
+
+def main() -> None:
+    """Run the benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--scaffold-tokens", type=int, default=512)
+    parser.add_argument("--question-tokens", type=int, default=16)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--vocab-size", type=int, default=2048)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from app.core.metrics import metrics
+    from app.services.cancellation import CancellationCriteria, CancellationToken
+    from app.services.generation_scheduler import GenerationScheduler
+    from app.services.prefix_cache import PrefixKVCache
+
+    model, tokenizer = build_model(args)
+    rng = random.Random(0)
+
+    def words(count: int) -> str:
+        return " ".join(f"w{rng.randrange(args.vocab_size - 2)}" for _ in range(count))
+
+    scaffold = words(args.scaffold_tokens)
+    prompts = [
+        f"{scaffold} {words(args.question_tokens)}" for _ in range(args.requests)
+    ]
+    print(
+        f"{args.requests} requests, {args.scaffold_tokens}-token shared scaffold, "
+        f"{args.question_tokens}-token questions"
+    )
+    print(f"{'cache':>5} {'mean ms':>8} {'p95 ms':>7} {'saved ms':>9} {'MiB':>6}")
+
+    for enabled in (False, True):
+        prefix_cache = PrefixKVCache(max_bytes=(1 << 30) if enabled else 0)
+        scheduler = GenerationScheduler(
+            model, tokenizer, max_batch_size=1, max_pending=1, prefix_cache=prefix_cache
+        )
+        saved = metrics.histogram("prefill_saved_ms")
+        saved_before, count_before = saved.sum, saved.count
+        latencies = []
+        try:
+            for prompt in prompts:
+                started = time.perf_counter()
+                scheduler.submit(
+                    prompt,
+                    CancellationCriteria(CancellationToken()),
+                    max_new_tokens=1,
+                    temperature=0,
+                    top_p=1,
+                ).result()
+                latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            scheduler.close()
+
+        # The first request always fills the cache
+        measured = latencies[1:]
+        p95 = statistics.quantiles(measured, n=20, method="inclusive")[18]
+        hits = saved.count - count_before
+        saved_ms = (saved.sum - saved_before) / hits if hits else 0.0
+        print(
+            f"{'on' if enabled else 'off':>5} {statistics.mean(measured):>8.1f} "
+            f"{p95:>7.1f} {saved_ms:>9.1f} "
+            f"{prefix_cache.stats()['bytes'] / 2**20:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Benchmark VectorStore.search latency on a large synthetic corpus.
+
+The corpus is written straight into a temporary Chroma collection with random
+unit vectors, and into the sparse index, so building 100k+ chunks does not
+require running the embedding model over them. Queries go through the real
+``VectorStore.search`` path, including query embedding, and latency
+percentiles are reported for dense and hybrid retrieval. Every timed query is
+distinct, so the query embedding cache never answers one.
+
+With ``--stub-encoder`` the embedding model is replaced by one returning
+random unit vectors, for machines without the model weights; the timings then
+cover everything but the encoder's forward pass.
+
+Usage:
+    python scripts/benchmark_search.py --chunks 100000 --queries 200
+    python scripts/benchmark_search.py --stub-encoder
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.services.vector_store import VectorStore
+
+# Words synthetic chunks and queries are drawn from
+VOCABULARY = [f"term{i}" for i in range(5000)]
+
+# Words per synthetic chunk and per query
+CHUNK_WORDS = 40
+QUERY_WORDS = 5
+
+
+class StubTokenizer:
+    """Whitespace tokenizer standing in for the embedding model's."""
+
+    def __call__(self, text: str | list[str], **kwargs: Any) -> dict[str, Any]:
+        """Tokenize one text or a batch of texts on whitespace."""
+        if isinstance(text, list):
+            return {"input_ids": [self(t)["input_ids"] for t in text]}
+        spans = [m.span() for m in re.finditer(r"\S+", text)]
+        encoded: dict[str, Any] = {"input_ids": list(range(len(spans)))}
+        if kwargs.get("return_offsets_mapping"):
+            encoded["offset_mapping"] = spans
+        return encoded
+
+    def num_special_tokens_to_add(self) -> int:
+        """Add no special tokens."""
+        return 0
+
+
+class StubEncoder:
+    """Sentence-transformers stand-in returning a random unit vector per text."""
+
+    dimension = 384
+
+    def __init__(self, model_name: str) -> None:
+        """Initialize the stub."""
+        self.tokenizer = StubTokenizer()
+        self.max_seq_length = 256
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Return the embedding dimension."""
+        return self.dimension
+
+    def encode(self, texts: list[str], **kwargs: Any) -> np.ndarray:
+        """Embed each text as a unit vector seeded by its hash."""
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dimension)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(count: int, rng: np.random.Generator) -> list[str]:
+    """Draw distinct queries from the vocabulary.
+
+    Args:
+        count: Number of queries
+        rng: Random generator
+
+    Returns:
+        list[str]: Queries of ``QUERY_WORDS`` words, each ending in its index
+    """
+    return [
+        " ".join([*rng.choice(VOCABULARY, QUERY_WORDS - 1), f"query{i}"])
+        for i in range(count)
+    ]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Return the given percentile of a list of values.
+
+    Args:
+        values: Measured values
+        pct: Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value
+    """
+    return float(np.percentile(np.asarray(values), pct))
+
+
+def build_corpus(store: "VectorStore", chunks: int, batch_size: int) -> None:
+    """Fill the store's collection with random normalized vectors.
+
+    Args:
+        store: Vector store whose collection is filled
+        chunks: Number of chunks to create
+        batch_size: Number of chunks per ``collection.add`` call
+    """
+    dimension = store.embedding_model.get_sentence_embedding_dimension()
+    rng = np.random.default_rng(0)
+    for start in range(0, chunks, batch_size):
+        count = min(batch_size, chunks - start)
+        vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [f"synthetic_chunk_{start + i}" for i in range(count)]
+        words = rng.choice(VOCABULARY, (count, CHUNK_WORDS))
+        texts = [" ".join(row) for row in words]
+        for chunk_id, text in zip(ids, texts):
+            store.sparse_index.add([chunk_id], f"doc{chunk_id}", [text])
+        store.collection.add(
+            ids=ids,
+            embeddings=vectors.tolist(),
+            documents=texts,
+            metadatas=[
+                {
+                    "document_id": f"doc{(start + i) // 100}",
+                    "title": f"doc{(start + i) // 100}",
+                    "path": f"data/uploads/doc{(start + i) // 100}.txt",
+                    "size": 1024,
+                    "chunk_index": (start + i) % 100,
+                }
+                for i in range(count)
+            ],
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Build the corpus and time single and batched searches.
+
+    Args:
+        args: Parsed command line arguments
+    """
+    from app.services.vector_store import VectorStore
+
+    if args.stub_encoder:
+        from app.services import vector_store
+
+        vector_store.SentenceTransformer = StubEncoder  # type: ignore[misc]
+
+    store = VectorStore()
+    print(f"Building synthetic corpus of {args.chunks} chunks...")
+    start = time.perf_counter()
+    build_corpus(store, args.chunks, args.batch_size)
+    print(f"Corpus built in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(1)
+    for mode in ("dense", "hybrid"):
+        # Warm up the model and the HNSW index
+        await store.search("warm up", args.limit, mode)
+
+        latencies = []
+        for query in make_queries(args.queries, rng):
+            start = time.perf_counter()
+            await store.search(query, args.limit, mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        print(f"search(mode={mode}) over {args.queries} queries, limit={args.limit}:")
+        print(f"  p50 {percentile(latencies, 50):.2f} ms")
+        print(f"  p95 {percentile(latencies, 95):.2f} ms")
+        print(f"  mean {statistics.mean(latencies):.2f} ms")
+
+        batch = make_queries(args.batch_queries, rng)
+        start = time.perf_counter()
+        await store.search_batch(batch, args.limit, mode)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(
+            f"search_batch(mode={mode}) of {len(batch)} queries: "
+            f"{elapsed:.2f} ms total, {elapsed / len(batch):.2f} ms per query"
+        )
+    store.close()
+
+
+def main() -> None:
+    """Parse arguments and run the benchmark against a temporary database."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-queries", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument(
+        "--stub-encoder",
+        action="store_true",
+        help="embed with random vectors instead of loading the model",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Point the app at a throwaway database before settings are imported
+        os.environ["CHROMA_DB_DIR"] = str(Path(tmp_dir) / "chromadb")
+        os.environ["EMBEDDING_CACHE_DIR"] = str(Path(tmp_dir) / "embeddings")
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Unit tests for the semantic answer cache."""
+
+import numpy as np
+
+from app.services.answer_cache import SemanticAnswerCache
+
+
+def unit(*values: float) -> np.ndarray:
+    """Build a normalized float32 vector."""
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_similar_question_hits_cache() -> None:
+    """Test that a question above the similarity threshold reuses the answer."""
+    cache = SemanticAnswerCache(max_entries=10, threshold=0.95, ttl_seconds=0)
+    cache.put(unit(1.0, 0.0), 0, 3, {"answer": "42"})
+
+    assert cache.lookup(unit(1.0, 0.1), 0, 3) == {"answer": "42"}
+    assert cache.lookup(unit(0.0, 1.0), 0, 3) is None
+    assert cache.lookup(unit(1.0, 0.0), 0, 5) is None
+
+
+def test_corpus_change_invalidates_answers() -> None:
+    """Test that a newer corpus generation drops all cached answers."""
+    cache = SemanticAnswerCache(max_entries=10, threshold=0.95, ttl_seconds=0)
+    cache.put(unit(1.0, 0.0), 0, 3, {"answer": "42"})
+
+    assert cache.lookup(unit(1.0, 0.0), 1, 3) is None
+    assert cache.stats()["invalidations"] == 1
+
+    # An answer generated against the old corpus is not stored
+    cache.put(unit(1.0, 0.0), 0, 3, {"answer": "stale"})
+    assert cache.stats()["entries"] == 0
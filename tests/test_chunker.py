@@ -0,0 +1,108 @@
+"""Unit tests for the token-aware streaming chunker."""
+
+import re
+from typing import Any
+
+from app.services.chunker import TokenChunker
+
+
+class WhitespaceTokenizer:
+    """Minimal stand-in for a Hugging Face tokenizer: one token per word."""
+
+    def __call__(
+        self,
+        text: str | list[str],
+        add_special_tokens: bool = False,
+        return_offsets_mapping: bool = False,
+    ) -> dict[str, Any]:
+        """Tokenize one text or a batch of texts on whitespace."""
+        if isinstance(text, list):
+            return {"input_ids": [self(t)["input_ids"] for t in text]}
+        spans = [m.span() for m in re.finditer(r"\S+", text)]
+        encoded: dict[str, Any] = {"input_ids": list(range(len(spans)))}
+        if return_offsets_mapping:
+            encoded["offset_mapping"] = spans
+        return encoded
+
+
+def sentence(index: int, words: int = 4) -> str:
+    """Build a sentence of the given number of words."""
+    return " ".join(f"s{index}w{i}" for i in range(words - 1)) + f" end{index}."
+
+
+def test_chunks_respect_token_limit_and_sentence_boundaries() -> None:
+    """Test that chunks fit the limit and are built from whole sentences."""
+    chunker = TokenChunker(WhitespaceTokenizer(), max_tokens=10, overlap_tokens=4)
+    text = " ".join(sentence(i) for i in range(6))
+
+    chunks = chunker.chunk_text(text)
+
+    assert all(chunk.token_count <= 10 for chunk in chunks)
+    assert all(chunk.text.endswith(".") for chunk in chunks)
+    # Each chunk after the first starts with the last sentence of the previous
+    assert chunks[1].text.startswith(chunks[0].text.split(". ")[-1])
+
+
+def test_streamed_pieces_match_single_text() -> None:
+    """Test that chunking pieces gives the same chunks as the joined text."""
+    chunker = TokenChunker(WhitespaceTokenizer(), max_tokens=10, overlap_tokens=4)
+    text = " ".join(sentence(i) for i in range(8))
+    pieces = [text[i : i + 7] for i in range(0, len(text), 7)]
+
+    assert list(chunker.chunk(pieces)) == chunker.chunk_text(text)
+
+
+def test_long_sentence_is_split_on_token_boundaries() -> None:
+    """Test that a sentence longer than a chunk is split by tokens."""
+    chunker = TokenChunker(WhitespaceTokenizer(), max_tokens=5, overlap_tokens=0)
+
+    chunks = chunker.chunk_text(sentence(0, words=12))
+
+    assert [chunk.token_count for chunk in chunks] == [5, 5, 2]
+    assert " ".join(chunk.text for chunk in chunks) == sentence(0, words=12)
+
+
+def test_page_chunks_record_the_pages_they_span() -> None:
+    """Test that chunking pages keeps the chunk texts and adds page ranges."""
+    chunker = TokenChunker(WhitespaceTokenizer(), max_tokens=10, overlap_tokens=4)
+    # Sentence 2 starts on page 1 and ends on page 2
+    pages = [
+        f"{sentence(0)} {sentence(1)} s2w0 s2w1",
+        f" s2w2 end2. {sentence(3)}\n",
+        f"{sentence(4)} {sentence(5)}",
+    ]
+
+    chunks = list(chunker.chunk_pages(pages))
+
+    assert [c.text for c in chunks] == [
+        c.text for c in chunker.chunk_text("".join(pages))
+    ]
+    assert [(c.page_start, c.page_end) for c in chunks] == [
+        (1, 1),
+        (1, 2),
+        (1, 2),
+        (2, 3),
+        (3, 3),
+    ]
+
+
+def test_text_without_boundaries_is_buffered_one_window_at_a_time() -> None:
+    """Test that a stream with no sentence ends never grows the buffer."""
+    tokenizer = WhitespaceTokenizer()
+    measured: list[str] = []
+
+    def recording(text: str | list[str], **kwargs: Any) -> dict[str, Any]:
+        measured.extend([text] if isinstance(text, str) else text)
+        return tokenizer(text, **kwargs)
+
+    chunker = TokenChunker(recording, max_tokens=8, overlap_tokens=0)
+    lines = [f"log line {i} status ok" for i in range(2000)]
+    text = "\n".join(lines)
+    # Each piece is several windows long
+    pieces = [text[i : i + 1000] for i in range(0, len(text), 1000)]
+
+    chunks = list(chunker.chunk(pieces))
+
+    assert all(chunk.token_count <= 8 for chunk in chunks)
+    assert max(len(t) for t in measured) <= chunker._max_pending_chars
+    assert " ".join(chunk.text for chunk in chunks).split() == text.split()
@@ -0,0 +1,108 @@
+"""Tests for packing retrieved chunks into the LLM context window."""
+
+from typing import Any
+
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import RAGError
+from app.services.context_packer import LINE_SLACK_TOKENS, ContextPacker
+from app.services.model_registry import LoadedModel
+from app.services.rag_service import RAGService
+
+
+class WordTokenizer:
+    """Tokenizer with one token per word, remembering what it counted."""
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def __call__(self, text: str, **kwargs: Any) -> dict[str, list[int]]:
+        self.calls.append(text)
+        return {"input_ids": [0] * len(text.split())}
+
+
+def format_line(doc: dict[str, Any], score: float, snippet: str) -> str:
+    return f"\n- {snippet} (relevance: {score:.2f})"
+
+
+# Words of a formatted line besides the snippet, plus the slack
+OVERHEAD = 3 + LINE_SLACK_TOKENS
+
+
+def test_whole_chunks_use_their_stored_token_counts() -> None:
+    tokenizer = WordTokenizer()
+    packer = ContextPacker(tokenizer)
+    hits = [
+        ({"llm_token_count": 3}, 0.9, "One two three."),
+        ({"llm_token_count": 2}, 0.8, "Four five."),
+    ]
+
+    packed = packer.pack(hits, budget_tokens=100, format_line=format_line)
+
+    assert packed.hits == hits
+    assert packed.used_tokens == 2 * OVERHEAD + 5
+    assert (packed.truncated, packed.dropped) == (0, 0)
+    assert not any("three" in text or "five" in text for text in tokenizer.calls)
+
+
+def test_overflowing_chunk_is_cut_at_a_sentence_boundary() -> None:
+    packer = ContextPacker(WordTokenizer())
+    hits = [
+        ({"llm_token_count": None}, 0.9, "Alpha beta gamma."),
+        ({}, 0.8, "First sentence here. Second one follows! Third never fits."),
+        ({}, 0.7, "Tiny."),
+    ]
+
+    # Room for the first chunk and the first two sentences of the second
+    budget = 2 * OVERHEAD + 3 + 6
+    packed = packer.pack(hits, budget, format_line)
+
+    assert [snippet for _, _, snippet in packed.hits] == [
+        "Alpha beta gamma.",
+        "First sentence here. Second one follows!",
+    ]
+    assert packed.hits[1][0]["truncated"] is True
+    # The less relevant chunk stays out even though it would fit
+    assert packed.report() == {
+        "budget_tokens": budget,
+        "used_tokens": budget,
+        "chunks": 2,
+        "truncated": 1,
+        "dropped": 1,
+    }
+
+
+def test_chunk_without_a_fitting_sentence_is_dropped() -> None:
+    packer = ContextPacker(WordTokenizer())
+    hits = [({}, 0.9, "A single sentence that is far too long for the budget.")]
+
+    packed = packer.pack(hits, OVERHEAD + 4, format_line)
+
+    assert packed.hits == []
+    assert (packed.truncated, packed.dropped) == (0, 1)
+
+
+class FakeRegistry:
+    """Registry handing out a word-counting tokenizer and no model."""
+
+    def get(self, *args: Any, **kwargs: Any) -> LoadedModel:
+        return LoadedModel(WordTokenizer(), None, None)
+
+
+def test_budget_leaves_room_for_question_and_answer(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "GENERATION_MAX_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "MAX_NEW_TOKENS", 100)
+    service = RAGService(None, registry=FakeRegistry())  # type: ignore[arg-type]
+    scaffold = len(service._create_prompt("Why?", []).split())
+
+    monkeypatch.setattr(settings, "CONTEXT_WINDOW", scaffold + 100 + 50)
+    packed = service._pack_context("Why?", [({}, 0.5, "word " * 100)])
+    assert packed.budget_tokens == 50
+    assert packed.dropped == 1
+
+    monkeypatch.setattr(settings, "CONTEXT_WINDOW", scaffold + 99)
+    with pytest.raises(RAGError, match="Question too long"):
+        service._pack_context("Why?", [])
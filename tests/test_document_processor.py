@@ -0,0 +1,104 @@
+"""Unit tests for document text extraction."""
+
+import asyncio
+from pathlib import Path
+
+import fitz  # type: ignore  # PyMuPDF
+import pytest
+from docx import Document as DocxDocument
+
+from app.core.config import settings
+from app.models.document import Document
+from app.services import document_processor
+from app.services.document_processor import (
+    DocumentProcessor,
+    _write_docx,
+    pdf_page_ranges,
+)
+from app.services.extraction_cache import ExtractionCache, read_frames
+
+
+def write_pdf(path: Path, pages: int) -> Path:
+    """Write a PDF with one numbered line of text per page."""
+    with fitz.open() as pdf:
+        for number in range(pages):
+            page = pdf.new_page()
+            page.insert_text((72, 72), f"Page {number} text")
+        pdf.save(path)
+    return path
+
+
+def test_pdf_page_ranges_cover_every_page_in_order() -> None:
+    """Test that ranges are contiguous, balanced and respect the minimum size."""
+    assert pdf_page_ranges(10, parts=3, min_pages=1) == [(0, 4), (4, 7), (7, 10)]
+    assert pdf_page_ranges(10, parts=4, min_pages=4) == [(0, 5), (5, 10)]
+    assert pdf_page_ranges(3, parts=4, min_pages=5) == [(0, 3)]
+
+
+def test_large_pdf_is_extracted_in_parallel_ranges(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that range extraction reassembles the same text as one pass."""
+    monkeypatch.setattr(settings, "PDF_MIN_PAGES_PER_RANGE", 2)
+    path = write_pdf(tmp_path / "large.pdf", pages=9)
+
+    def extract(parallel_min_pages: int, cache_name: str) -> Document:
+        monkeypatch.setattr(settings, "PDF_PARALLEL_MIN_PAGES", parallel_min_pages)
+        cache = ExtractionCache(tmp_path / cache_name)
+        monkeypatch.setattr(document_processor, "extraction_cache", cache)
+        return asyncio.run(DocumentProcessor.process_document(path))
+
+    serial = extract(100, "serial")
+    parallel = extract(4, "parallel")
+
+    fields = {"content", "page_offsets", "metadata"}
+    assert parallel.model_dump(include=fields) == serial.model_dump(include=fields)
+    assert parallel.content.index("Page 0") < parallel.content.index("Page 8")
+    assert parallel.metadata["page_count"] == 9
+    # Ranges were extracted into parts of one entry, which are gone
+    assert len(list((tmp_path / "parallel").glob("*/*"))) == 1
+    assert not list((tmp_path / "parallel").glob(".part-*"))
+
+
+def test_pdf_extraction_records_page_offsets(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that each page's text starts at its recorded offset."""
+    cache = ExtractionCache(tmp_path / "cache")
+    monkeypatch.setattr(document_processor, "extraction_cache", cache)
+    path = write_pdf(tmp_path / "pages.pdf", pages=3)
+
+    document = asyncio.run(DocumentProcessor.process_document(path))
+
+    offsets = document.page_offsets
+    assert offsets is not None and len(offsets) == 3
+    for number, offset in enumerate(offsets):
+        assert document.content[offset:].startswith(f"Page {number} text")
+
+
+def test_docx_extraction_streams_paragraphs_and_tables_in_order(
+    tmp_path: Path,
+) -> None:
+    """Test that table rows appear between the paragraphs around them."""
+    doc = DocxDocument()
+    doc.core_properties.author = "Ada"
+    doc.add_paragraph("Before the table.")
+    table = doc.add_table(rows=2, cols=2)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"r{r}c{c}"
+    doc.add_paragraph("After\tthe table.")
+    path = tmp_path / "report.docx"
+    doc.save(str(path))
+    part = tmp_path / "part"
+
+    metadata = _write_docx(path, part, compression_level=6)
+
+    assert [text for frame in read_frames(part) for text in frame] == [
+        "Before the table.",
+        "r0c0 | r0c1",
+        "r1c0 | r1c1",
+        "After\tthe table.",
+    ]
+    assert metadata["core_properties"]["author"] == "Ada"
+    assert metadata["core_properties"]["created"] is not None
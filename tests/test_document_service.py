@@ -0,0 +1,127 @@
+"""Unit tests for streaming document and archive uploads."""
+
+import asyncio
+import hashlib
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi import UploadFile
+
+from app.core.exceptions import UploadTooLargeError
+from app.services.document_service import DocumentService
+
+
+def test_upload_is_streamed_and_hashed(tmp_path: Path) -> None:
+    """Test that an upload is stored with its SHA-256 and no temp files remain."""
+    content = b"0123456789" * 1000
+    service = DocumentService(str(tmp_path), max_upload_size=20_000, read_size=1024)
+    upload = UploadFile(io.BytesIO(content), filename="../report.txt")
+
+    result = asyncio.run(service.process_document(upload))
+
+    assert result["size"] == len(content)
+    assert result["sha256"] == hashlib.sha256(content).hexdigest()
+    assert (tmp_path / "report.txt").read_bytes() == content
+    assert [p.name for p in tmp_path.iterdir()] == ["report.txt"]
+
+
+def test_upload_over_size_cap_is_rejected(tmp_path: Path) -> None:
+    """Test that an oversized upload is aborted and leaves nothing behind."""
+    service = DocumentService(str(tmp_path), max_upload_size=4096, read_size=1024)
+    upload = UploadFile(io.BytesIO(b"x" * 5000), filename="big.txt")
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(service.process_document(upload))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def store_all(service: DocumentService, files: list[UploadFile]) -> list[dict]:
+    """Collect the results of a bulk store."""
+
+    async def run() -> list[dict]:
+        return [entry async for entry in service.store_uploads(files)]
+
+    return asyncio.run(run())
+
+
+def test_zip_archive_members_are_stored_and_filtered(tmp_path: Path) -> None:
+    """Test that supported archive members are stored under the archive name."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("notes/a.txt", "alpha")
+        archive.writestr("image.png", "not a document")
+        archive.writestr("../escape.txt", "beta")
+        archive.writestr("__MACOSX/._a.txt", "resource fork")
+    buffer.seek(0)
+    service = DocumentService(str(tmp_path))
+
+    results = store_all(service, [UploadFile(buffer, filename="batch.zip")])
+
+    statuses = {result["filename"]: result["status"] for result in results}
+    assert statuses == {
+        "batch/notes/a.txt": "stored",
+        "batch/image.png": "skipped",
+        "batch/escape.txt": "stored",
+        "__MACOSX/._a.txt": "skipped",
+    }
+    assert (tmp_path / "batch" / "notes" / "a.txt").read_text() == "alpha"
+    assert (tmp_path / "batch" / "escape.txt").read_text() == "beta"
+
+
+def test_tar_archive_and_plain_files_are_stored(tmp_path: Path) -> None:
+    """Test that a compressed TAR stream and a plain upload are both stored."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in (("one.txt", b"first"), ("two.txt", b"")):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    buffer.seek(0)
+    service = DocumentService(str(tmp_path))
+
+    results = store_all(
+        service,
+        [
+            UploadFile(buffer, filename="docs.tar.gz"),
+            UploadFile(io.BytesIO(b"plain"), filename="plain.txt"),
+        ],
+    )
+
+    assert [(r["filename"], r["status"]) for r in results] == [
+        ("docs/one.txt", "stored"),
+        ("docs/two.txt", "failed"),
+        ("plain.txt", "stored"),
+    ]
+    assert results[2]["sha256"] == hashlib.sha256(b"plain").hexdigest()
+
+
+def test_archive_is_rejected_past_the_bulk_size_limit(tmp_path: Path) -> None:
+    """Test that an archive stops expanding once the request's bytes run out."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for index in range(5):
+            archive.writestr(f"part{index}.txt", b"0" * 3000)
+    buffer.seek(0)
+    service = DocumentService(
+        str(tmp_path), max_upload_size=4096, read_size=1024, max_bulk_size=8000
+    )
+    uploads = [
+        UploadFile(buffer, filename="bomb.zip"),
+        UploadFile(io.BytesIO(b"later"), filename="later.txt"),
+    ]
+
+    results = store_all(service, uploads)
+
+    assert [(r["filename"], r["status"]) for r in results] == [
+        ("bomb/part0.txt", "stored"),
+        ("bomb/part1.txt", "stored"),
+        ("bomb/part2.txt", "failed"),
+    ]
+    assert "the rest were ignored" in results[-1]["detail"]
+    stored = [p.name for p in (tmp_path / "bomb").iterdir()]
+    assert sorted(stored) == ["part0.txt", "part1.txt"]
+    assert not any(p.name.startswith(".upload-") for p in tmp_path.iterdir())
@@ -16,9 +16,10 @@ def test_upload_document(test_document_path: str) -> None:
         response = client.post(
             "/documents/upload", files={"file": ("test.txt", f, "text/plain")}
         )
-    assert response.status_code == status.HTTP_200_OK
+    assert response.status_code == status.HTTP_202_ACCEPTED
     assert "message" in response.json()
     assert response.json()["filename"] == "test.txt"
+    assert response.json()["job_id"]
 
 
 def test_upload_empty_file(client: TestClient, tmp_path: str) -> None:
@@ -0,0 +1,48 @@
+"""Unit tests for the cross-request embedding micro-batcher."""
+
+import asyncio
+from collections.abc import Callable
+
+import numpy as np
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+def fake_encode(calls: list[list[str]]) -> Callable[[list[str]], np.ndarray]:
+    """Build an encoder that records its calls and embeds text by length."""
+
+    def encode(texts: list[str]) -> np.ndarray:
+        calls.append(texts)
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+    return encode
+
+
+def test_concurrent_queries_share_one_encode_call() -> None:
+    """Test that queries arriving within the window are encoded together."""
+    calls: list[list[str]] = []
+    batcher = EmbeddingBatcher(fake_encode(calls), max_batch_size=32, max_wait_ms=50)
+    texts = ["a", "bb", "ccc", "dddd"]
+
+    async def run() -> list[np.ndarray]:
+        return await asyncio.gather(*(batcher.embed(text) for text in texts))
+
+    vectors = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert sorted(calls[0]) == sorted(texts)
+    assert [float(vector[0]) for vector in vectors] == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_batches_are_capped_at_max_batch_size() -> None:
+    """Test that a burst larger than the batch size is split into batches."""
+    calls: list[list[str]] = []
+    batcher = EmbeddingBatcher(fake_encode(calls), max_batch_size=2, max_wait_ms=50)
+
+    async def run() -> np.ndarray:
+        return await batcher.embed_many(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    vectors = asyncio.run(run())
+
+    assert max(len(call) for call in calls) == 2
+    assert vectors.shape == (5, 1)
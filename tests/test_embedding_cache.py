@@ -0,0 +1,53 @@
+"""Unit tests for the query embedding cache."""
+
+import numpy as np
+import pytest
+
+from app.services import embedding_cache
+from app.services.embedding_cache import QueryEmbeddingCache, normalize_query
+
+MODEL = "test-model"
+
+
+def vector(value: float) -> np.ndarray:
+    """Build a small float32 test vector."""
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_cache_hit_and_miss_counters() -> None:
+    """Test that lookups count hits and misses and normalize query text."""
+    cache = QueryEmbeddingCache(max_entries=10, max_bytes=1024, ttl_seconds=0)
+    cache.put(MODEL, normalize_query("reset  password "), vector(1.0))
+
+    assert cache.get(MODEL, normalize_query(" reset password")) is not None
+    assert cache.get("other-model", normalize_query("reset password")) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used_within_byte_budget() -> None:
+    """Test that the byte budget evicts the least recently used entry."""
+    cache = QueryEmbeddingCache(max_entries=10, max_bytes=32, ttl_seconds=0)
+    cache.put(MODEL, "a", vector(1.0))
+    cache.put(MODEL, "b", vector(2.0))
+    cache.get(MODEL, "a")
+    cache.put(MODEL, "c", vector(3.0))
+
+    assert cache.get(MODEL, "b") is None
+    assert cache.get(MODEL, "a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 32
+
+
+def test_cache_expires_entries_after_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that entries older than the TTL are treated as misses."""
+    now = [100.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: now[0])
+    cache = QueryEmbeddingCache(max_entries=10, max_bytes=1024, ttl_seconds=60)
+    cache.put(MODEL, "a", vector(1.0))
+
+    now[0] += 61
+
+    assert cache.get(MODEL, "a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
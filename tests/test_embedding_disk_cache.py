@@ -0,0 +1,64 @@
+"""Unit tests for the on-disk chunk embedding cache."""
+
+from pathlib import Path
+
+import numpy as np
+
+from app.services.embedding_disk_cache import DiskEmbeddingCache
+
+MODEL = "test/model"
+DIMENSION = 4
+
+
+def vectors(*values: float) -> np.ndarray:
+    """Build one small float32 test vector per value."""
+    return np.array([[value] * DIMENSION for value in values], dtype=np.float32)
+
+
+def test_cache_persists_vectors_across_reopen(tmp_path: Path) -> None:
+    """Test that stored embeddings are served after the cache is reopened."""
+    cache = DiskEmbeddingCache(tmp_path, MODEL, DIMENSION, max_bytes=1024)
+    cache.put_many(["alpha", "beta"], vectors(0.25, 0.5))
+    cache.close()
+
+    cache = DiskEmbeddingCache(tmp_path, MODEL, DIMENSION, max_bytes=1024)
+    found, missing = cache.get_many(["beta", "gamma", "alpha"])
+
+    assert missing == [1]
+    np.testing.assert_allclose(found[[0, 2]], vectors(0.5, 0.25), atol=1e-3)
+    assert found.dtype == np.float32
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["bytes"] == 2 * DIMENSION * 2
+    cache.close()
+
+
+def test_cache_evicts_least_recently_used_within_byte_budget(
+    tmp_path: Path,
+) -> None:
+    """Test that the byte budget evicts the least recently used rows."""
+    row_bytes = DIMENSION * 4
+    cache = DiskEmbeddingCache(
+        tmp_path, MODEL, DIMENSION, max_bytes=2 * row_bytes, dtype="float32"
+    )
+    cache.put_many(["a", "b"], vectors(1.0, 2.0))
+    cache.get_many(["a"])
+    cache.put_many(["c"], vectors(3.0))
+
+    found, missing = cache.get_many(["a", "b", "c"])
+    assert missing == [1]
+    np.testing.assert_array_equal(found[[0, 2]], vectors(1.0, 3.0))
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.vectors_path.stat().st_size == 2 * row_bytes
+    cache.close()
+
+
+def test_disabled_cache_misses_everything(tmp_path: Path) -> None:
+    """Test that a zero byte budget stores nothing."""
+    cache = DiskEmbeddingCache(tmp_path, MODEL, DIMENSION, max_bytes=0)
+    cache.put_many(["a"], vectors(1.0))
+
+    _, missing = cache.get_many(["a"])
+    assert missing == [0]
+    assert not cache.enabled
+    assert not any(tmp_path.iterdir())
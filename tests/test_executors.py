@@ -0,0 +1,28 @@
+"""Unit tests for the bounded executors."""
+
+import threading
+
+import pytest
+
+from app.core.exceptions import ServiceOverloadedError
+from app.core.executors import BoundedExecutor
+
+
+def test_executor_rejects_work_beyond_queue_depth() -> None:
+    """Test that submissions beyond workers plus pending slots are rejected."""
+    executor = BoundedExecutor("test", max_workers=1, max_pending=1)
+    release = threading.Event()
+    try:
+        running = executor.submit(release.wait)
+        queued = executor.submit(release.wait)
+
+        with pytest.raises(ServiceOverloadedError):
+            executor.submit(release.wait)
+
+        release.set()
+        assert running.result(timeout=5) and queued.result(timeout=5)
+        assert executor.stats()["rejected"] == 1
+        assert executor.submit(lambda: 42).result(timeout=5) == 42
+    finally:
+        release.set()
+        executor.shutdown()
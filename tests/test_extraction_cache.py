@@ -0,0 +1,181 @@
+"""Unit tests for the extraction cache."""
+
+import asyncio
+import os
+from datetime import datetime
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.services import document_processor
+from app.services import extraction_cache as extraction_cache_module
+from app.services.document_processor import DocumentProcessor, PinnedFile
+from app.services.extraction_cache import ExtractionCache, main
+
+SHA = "ab" * 32
+
+
+def test_cache_round_trips_content_and_metadata(tmp_path: Path) -> None:
+    """Test that entries are keyed by content hash and extractor version."""
+    cache = ExtractionCache(tmp_path)
+    metadata = {"core_properties": {"created": datetime(2024, 1, 2)}}
+    pieces = ["hello " * 1000] * 100
+    cache.put(SHA, "docx-v1", iter(pieces), metadata)
+
+    assert cache.get_metadata(SHA, "docx-v1") == metadata
+    assert list(cache.iter_pieces(SHA, "docx-v1")) == pieces
+    assert cache.get_metadata(SHA, "docx-v2") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    # Repetitive text compresses well below its raw size
+    assert stats["bytes"] < 10000
+    # Pieces are stored in several frames after the metadata rather than one
+    frames = extraction_cache_module.read_frames(cache._path(SHA, "docx-v1"))
+    assert len(list(frames)) > 2
+    assert not list(tmp_path.glob(".part-*"))
+
+
+def test_unreadable_entry_is_a_miss_and_removed(tmp_path: Path) -> None:
+    """Test that a corrupt entry is dropped rather than raised."""
+    cache = ExtractionCache(tmp_path)
+    cache.put(SHA, "pdf-v1", ["text"], {})
+    path = cache._path(SHA, "pdf-v1")
+    path.write_bytes(b"not zlib")
+
+    assert cache.get_metadata(SHA, "pdf-v1") is None
+    assert not path.exists()
+
+
+def test_truncated_entry_is_removed_while_streaming(tmp_path: Path) -> None:
+    """Test that an entry cut short raises and is dropped for re-extraction."""
+    cache = ExtractionCache(tmp_path)
+    cache.put(SHA, "pdf-v1", ["page one", "page two"], {})
+    path = cache._path(SHA, "pdf-v1")
+    path.write_bytes(path.read_bytes()[:-3])
+
+    with pytest.raises(ValueError):
+        list(cache.iter_pieces(SHA, "pdf-v1"))
+    assert not path.exists()
+
+
+def test_purge_keeps_most_recently_used_entries(tmp_path: Path) -> None:
+    """Test that purging down to a size removes least recently used entries."""
+    cache = ExtractionCache(tmp_path)
+    for i, sha in enumerate(("aa" * 32, "bb" * 32, "cc" * 32)):
+        cache.put(sha, "pdf-v1", ["text"], {})
+        os.utime(cache._path(sha, "pdf-v1"), (i, i))
+    entry_size = cache._path("aa" * 32, "pdf-v1").stat().st_size
+
+    result = cache.purge(keep_bytes=2 * entry_size)
+    assert result == {"removed": 1, "bytes_freed": entry_size}
+    assert cache.get_metadata("aa" * 32, "pdf-v1") is None
+    assert cache.get_metadata("cc" * 32, "pdf-v1") is not None
+
+    cache.purge()
+    assert cache.stats()["entries"] == 0
+
+
+def test_stats_track_entries_without_rescanning(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that stats scan the directory once and then keep running totals."""
+    ExtractionCache(tmp_path).put("aa" * 32, "pdf-v1", ["existing"], {})
+    cache = ExtractionCache(tmp_path)
+    scans: list[int] = []
+    entry_stats = cache._entry_stats
+
+    def counting_entry_stats() -> list[tuple[Path, os.stat_result]]:
+        scans.append(1)
+        return entry_stats()
+
+    monkeypatch.setattr(cache, "_entry_stats", counting_entry_stats)
+
+    assert cache.stats()["entries"] == 1
+    cache.put("bb" * 32, "pdf-v1", ["new"], {})
+    cache.put("bb" * 32, "pdf-v1", ["replaced " * 100], {})
+    cache.put("cc" * 32, "pdf-v1", ["corrupt"], {})
+    cache._path("cc" * 32, "pdf-v1").write_bytes(b"not zlib")
+    assert cache.get_metadata("cc" * 32, "pdf-v1") is None
+    for _ in range(3):
+        stats = cache.stats()
+
+    assert len(scans) == 1
+    scanned = ExtractionCache(tmp_path).stats()
+    assert (stats["entries"], stats["bytes"]) == (2, scanned["bytes"])
+
+    cache.purge(keep_bytes=0)
+    assert (cache.stats()["entries"], cache.stats()["bytes"]) == (0, 0)
+
+
+def test_process_document_skips_parsing_unchanged_files(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that re-processing an unchanged DOCX reads the cached extraction."""
+    cache = ExtractionCache(tmp_path / "cache")
+    monkeypatch.setattr(document_processor, "extraction_cache", cache)
+    calls: list[Path] = []
+
+    async def fake_docx(pinned: PinnedFile, extractor: str) -> dict[str, Any]:
+        calls.append(pinned.pinned)
+        cache.put(pinned.sha256, extractor, [pinned.pinned.read_text()], {})
+        return {"paragraphs": 1}
+
+    monkeypatch.setattr(DocumentProcessor, "_process_docx", fake_docx)
+    path = tmp_path / "report.docx"
+    path.write_text("version one")
+
+    async def run() -> list[str]:
+        first = await DocumentProcessor.process_document(path)
+        second = await DocumentProcessor.process_document(path)
+        path.write_text("version two")
+        third = await DocumentProcessor.process_document(path)
+        return [first.content, second.content, third.content]
+
+    assert asyncio.run(run()) == ["version one", "version one", "version two"]
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+    # Parsers read private links, removed once the document is extracted
+    assert all(call.name.startswith(".parse-") for call in calls)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache", "report.docx"]
+
+
+def test_replacing_a_file_during_parsing_cannot_poison_the_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the cache key is the hash of the bytes actually parsed."""
+    cache = ExtractionCache(tmp_path / "cache")
+    monkeypatch.setattr(document_processor, "extraction_cache", cache)
+    path = tmp_path / "report.docx"
+    path.write_text("version one")
+    replacement = tmp_path / "upload.tmp"
+
+    async def racing_docx(pinned: PinnedFile, extractor: str) -> dict[str, Any]:
+        # A re-upload lands while the first version is being parsed
+        replacement.write_text("version two")
+        os.replace(replacement, path)
+        cache.put(pinned.sha256, extractor, [pinned.pinned.read_text()], {})
+        return {}
+
+    monkeypatch.setattr(DocumentProcessor, "_process_docx", racing_docx)
+
+    document = asyncio.run(DocumentProcessor.process_document(path))
+
+    assert document.content == "version one"
+    assert document.metadata["sha256"] == sha256(b"version one").hexdigest()
+    pieces = cache.iter_pieces(document.metadata["sha256"], "docx-v3")
+    assert list(pieces) == ["version one"]
+    assert path.read_text() == "version two"
+
+
+def test_purge_command_prints_result(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test the purge command line."""
+    cache = ExtractionCache(tmp_path)
+    cache.put(SHA, "pdf-v1", ["text"], {})
+    monkeypatch.setattr(extraction_cache_module, "extraction_cache", cache)
+
+    main(["purge"])
+    assert '"removed": 1' in capsys.readouterr().out
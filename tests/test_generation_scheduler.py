@@ -0,0 +1,235 @@
+"""Tests for continuous batching of concurrent generations."""
+
+import asyncio
+import threading
+from typing import Any
+
+import pytest
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers  # type: ignore
+from transformers import (  # type: ignore
+    LlamaConfig,
+    LlamaForCausalLM,
+    PreTrainedTokenizerFast,
+)
+
+from app.core.config import settings
+from app.services.cancellation import (
+    DISCONNECTED,
+    CancellationCriteria,
+    CancellationToken,
+)
+from app.services.generation_scheduler import GenerationScheduler
+from app.services.model_registry import LoadedModel
+from app.services.prefix_cache import PrefixKVCache
+from app.services.rag_service import RAGService
+
+WORDS = ["<unk>", "</s>"] + [f"w{i}" for i in range(254)]
+
+
+@pytest.fixture(scope="module")
+def tokenizer() -> Any:
+    vocab = {word: i for i, word in enumerate(WORDS)}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    return PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="<unk>", eos_token="</s>"
+    )
+
+
+@pytest.fixture(scope="module")
+def model() -> Any:
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(WORDS),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        eos_token_id=None,
+    )
+    return LlamaForCausalLM(config).eval()
+
+
+def reference(model: Any, tokenizer: Any, prompt: str, max_new_tokens: int) -> str:
+    """Greedy generation of a single prompt with ``generate``."""
+    ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+    output = model.generate(
+        ids,
+        attention_mask=torch.ones_like(ids),
+        max_new_tokens=max_new_tokens,
+        do_sample=False,
+        pad_token_id=0,
+    )
+    return tokenizer.decode(output[0, ids.shape[1] :], skip_special_tokens=True)
+
+
+def submit(
+    scheduler: GenerationScheduler,
+    prompt: str,
+    max_new_tokens: int,
+    token: CancellationToken | None = None,
+) -> Any:
+    criteria = CancellationCriteria(token or CancellationToken())
+    future = scheduler.submit(
+        prompt, criteria, max_new_tokens=max_new_tokens, temperature=0, top_p=1
+    )
+    return future, criteria
+
+
+def test_batched_generation_matches_sequential(model: Any, tokenizer: Any) -> None:
+    scheduler = GenerationScheduler(model, tokenizer, max_batch_size=4, max_pending=8)
+    prompts = [
+        ("w1 w2 w3", 6),
+        ("w4", 3),
+        ("w5 w6 w7 w8 w9 w10 w11", 8),
+        ("w12 w13", 1),
+        ("w14 w15 w16 w17", 5),
+    ]
+    try:
+        futures = [submit(scheduler, p, n)[0] for p, n in prompts]
+        results = [future.result(timeout=30) for future in futures]
+    finally:
+        scheduler.close()
+
+    # Sequences of different lengths joined and left mid-batch, and each
+    # kept its own token limit
+    assert results == [reference(model, tokenizer, p, n) for p, n in prompts]
+
+
+def test_cancelled_sequence_leaves_the_batch(model: Any, tokenizer: Any) -> None:
+    scheduler = GenerationScheduler(model, tokenizer, max_batch_size=2, max_pending=2)
+    token = CancellationToken()
+    release = threading.Event()
+
+    class CancelAfterFirst:
+        """Streamer that cancels its request once generation has started."""
+
+        def put(self, value: torch.Tensor) -> None:
+            if value.dim() == 1:
+                token.cancel(DISCONNECTED)
+                release.set()
+
+        def end(self) -> None:
+            pass
+
+    try:
+        cancelled = CancellationCriteria(token)
+        doomed = scheduler.submit(
+            "w1 w2",
+            cancelled,
+            max_new_tokens=50,
+            temperature=0,
+            top_p=1,
+            streamer=CancelAfterFirst(),
+        )
+        survivor, _ = submit(scheduler, "w3 w4 w5", 10)
+        assert release.wait(timeout=30)
+        doomed.result(timeout=30)
+        result = survivor.result(timeout=30)
+    finally:
+        scheduler.close()
+
+    assert cancelled.stopped_reason == DISCONNECTED
+    assert cancelled.steps == 1
+    assert result == reference(model, tokenizer, "w3 w4 w5", 10)
+
+
+def test_failed_admission_fails_only_its_request(model: Any, tokenizer: Any) -> None:
+    scheduler = GenerationScheduler(model, tokenizer, max_batch_size=2, max_pending=4)
+
+    class BrokenStreamer:
+        """Streamer that fails on the first generated token."""
+
+        def put(self, value: torch.Tensor) -> None:
+            if value.dim() == 1:
+                raise RuntimeError("client went away")
+
+        def end(self) -> None:
+            pass
+
+    try:
+        survivor, _ = submit(scheduler, "w3 w4 w5", 10)
+        broken = scheduler.submit(
+            "w1 w2",
+            CancellationCriteria(CancellationToken()),
+            max_new_tokens=5,
+            temperature=0,
+            top_p=1,
+            streamer=BrokenStreamer(),
+        )
+        with pytest.raises(RuntimeError, match="client went away"):
+            broken.result(timeout=30)
+        result = survivor.result(timeout=30)
+        # The scheduler thread survived and keeps serving requests
+        later, _ = submit(scheduler, "w6 w7", 3)
+        later_result = later.result(timeout=30)
+    finally:
+        scheduler.close()
+
+    assert result == reference(model, tokenizer, "w3 w4 w5", 10)
+    assert later_result == reference(model, tokenizer, "w6 w7", 3)
+
+
+def test_prefix_cache_reuse_keeps_outputs_identical(model: Any, tokenizer: Any) -> None:
+    prefix_cache = PrefixKVCache(max_bytes=1 << 24, block_tokens=4)
+    scheduler = GenerationScheduler(
+        model, tokenizer, max_batch_size=4, max_pending=8, prefix_cache=prefix_cache
+    )
+    scaffold = " ".join(f"w{i}" for i in range(20, 38))
+    prompts = [f"{scaffold} w{i} w{i + 1}" for i in (50, 60, 70)]
+    try:
+        # One at a time, so each prompt can reuse the ones before it
+        results = [submit(scheduler, p, 6)[0].result(timeout=30) for p in prompts]
+    finally:
+        scheduler.close()
+
+    assert results == [reference(model, tokenizer, p, 6) for p in prompts]
+    stats = prefix_cache.stats()
+    assert stats["hits"] == 2
+    # The 18-token scaffold shares four whole blocks
+    assert stats["hit_tokens"] == 2 * 16
+
+
+class FakeRegistry:
+    """Registry handing out the tiny model without a pipeline."""
+
+    def __init__(self, model: Any, tokenizer: Any) -> None:
+        self.loaded = LoadedModel(tokenizer, model, None)
+
+    def get(self, *args: Any, **kwargs: Any) -> LoadedModel:
+        return self.loaded
+
+
+class FakeVectorStore:
+    """Vector store returning no context."""
+
+    corpus_generation = 0
+
+    async def search(self, query: str, limit: int = 3) -> list[Any]:
+        return []
+
+
+def test_rag_service_streams_through_the_scheduler(
+    model: Any, tokenizer: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "MAX_NEW_TOKENS", 5)
+    monkeypatch.setattr(settings, "TEMPERATURE", 0.0)
+    service = RAGService(FakeVectorStore(), registry=FakeRegistry(model, tokenizer))
+    assert service.scheduler is not None
+
+    async def run() -> list[dict[str, Any]]:
+        return [
+            event async for event in service.generate_streaming_response("w7 w8 w9")
+        ]
+
+    try:
+        events = asyncio.run(run())
+    finally:
+        service.close()
+
+    prompt = service._create_prompt("w7 w8 w9", [])
+    streamed = "".join(event["token"] for event in events[:-1])
+    assert streamed == reference(model, tokenizer, prompt, 5)
+    assert events[-1]["finished"] is True
@@ -0,0 +1,503 @@
+"""Unit tests for the asynchronous ingestion pipeline."""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections.abc import Iterator
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from app.core.exceptions import ServiceOverloadedError
+from app.core.executors import executors
+from app.services.document_processor import (
+    DocumentSource,
+    PinnedFile,
+    document_id_for,
+)
+from app.services.ingestion import STAGES, IngestionPipeline
+from app.services.text_reader import READ_BLOCK_SIZE
+from app.services.vector_store import ChunkBatch, DocumentUpdate, chunk_ids
+
+
+class FakeVectorStore:
+    """Vector store stand-in that chunks by line and diffs like the real one."""
+
+    def __init__(self, batch_size: int = 64) -> None:
+        """Initialize with no stored chunks."""
+        self.batch_size = batch_size
+        self.stored: dict[str, set[str]] = {}
+        # Content hash each document was last fully indexed from
+        self.content_hashes: dict[str, str] = {}
+        self.written: list[str] = []
+        self.deleted: list[str] = []
+        self.commits = 0
+
+    def is_current(self, document_id: str, content_sha256: str) -> bool:
+        """Check the content hash recorded for the document."""
+        return self.content_hashes.get(document_id) == content_sha256
+
+    def stored_chunks(self, document_id: str) -> dict[str, dict[str, Any]]:
+        """Return the stored chunk IDs with empty metadata."""
+        return {chunk_id: {} for chunk_id in self.stored.get(document_id, set())}
+
+    def prepare_document(
+        self, document: dict[str, Any], stored: dict[str, dict[str, Any]]
+    ) -> Iterator[ChunkBatch | DocumentUpdate]:
+        """Make one chunk per line, yielding new ones a batch at a time."""
+        document_id = document["id"]
+        lines = "".join(document["pieces"]).splitlines()
+        ids = chunk_ids(document_id, lines)
+        existing = set(stored)
+        new = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+        metadata = dict(document["metadata"])
+        for start in range(0, len(new), self.batch_size):
+            batch = new[start : start + self.batch_size]
+            yield ChunkBatch(
+                document_id,
+                [ids[i] for i in batch],
+                [lines[i] for i in batch],
+                [metadata for _ in batch],
+            )
+        yield DocumentUpdate(
+            document_id=document_id,
+            chunk_count=len(lines),
+            new_chunks=len(new),
+            changed_ids=[],
+            changed_metadatas=[],
+            deleted_ids=sorted(existing - set(ids)),
+            fingerprint=metadata.get("sha256"),
+        )
+
+    def embed_chunks(self, texts: list[str]) -> np.ndarray:
+        """Embed each text as its length."""
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+    async def write_batch(self, batch: ChunkBatch, embeddings: np.ndarray) -> None:
+        """Record the written chunk IDs."""
+        self.content_hashes.pop(batch.document_id, None)
+        self.written.extend(batch.ids)
+        self.stored.setdefault(batch.document_id, set()).update(batch.ids)
+
+    async def apply_update(self, update: DocumentUpdate) -> None:
+        """Record the deleted chunk IDs and mark the document current."""
+        self.deleted.extend(update.deleted_ids)
+        self.stored.setdefault(update.document_id, set()).difference_update(
+            update.deleted_ids
+        )
+        if update.fingerprint is not None:
+            self.content_hashes[update.document_id] = update.fingerprint
+
+    async def commit_writes(self) -> None:
+        """Count commits."""
+        self.commits += 1
+
+
+# Content returned by the fake parser, by file name
+CONTENTS = {"edited.txt": "a\nbb\ndddd"}
+
+
+def content_of(path: Path) -> str:
+    """Return a fake document's content, three lines unless listed in CONTENTS."""
+    return CONTENTS.get(path.name, "a\nbb\nccc")
+
+
+def sha256_of(content: str) -> str:
+    """Hash fake content like a pinned file."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+async def pin(path: Path) -> PinnedFile:
+    """Pin a fake document, hashing the content it has right now."""
+    pinned = path.with_name(f".parse-{path.name}")
+    return PinnedFile(path, pinned, sha256_of(content_of(path)))
+
+
+async def parse(pinned: PinnedFile) -> DocumentSource:
+    """Parse a fake document."""
+    if pinned.path.name == "broken.txt":
+        raise ValueError("cannot parse")
+    return DocumentSource(
+        id=document_id_for(pinned.path),
+        title=pinned.path.stem,
+        doc_type="txt",
+        metadata={},
+        read=partial(iter, (content_of(pinned.path),)),
+        paged=False,
+    )
+
+
+async def wait_for(pipeline: IngestionPipeline, job_id: str) -> None:
+    """Wait until a job has finished."""
+    job = pipeline.get_job(job_id)
+    assert job is not None
+    while not job.finished:
+        await asyncio.sleep(0.01)
+
+
+def test_job_runs_through_every_stage() -> None:
+    """Test that a submitted document is written and every stage is timed."""
+    store = FakeVectorStore()
+    pipeline = IngestionPipeline(store, pin, parse)  # type: ignore[arg-type]
+
+    async def run() -> dict[str, Any]:
+        job = pipeline.submit(Path("report.txt"), {"sha256": "abc"})
+        await wait_for(pipeline, job.id)
+        pipeline.close()
+        return job.to_dict()
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "completed"
+    assert job["chunks"] == 3
+    assert set(job["stages"]) == set(STAGES)
+    assert all("run_ms" in timing for timing in job["stages"].values())
+    assert store.written == chunk_ids(job["document_id"], ["a", "bb", "ccc"])
+    assert store.commits == 1
+
+
+def test_failed_parse_marks_job_failed() -> None:
+    """Test that an error in a stage fails only that job."""
+    store = FakeVectorStore()
+    pipeline = IngestionPipeline(store, pin, parse)  # type: ignore[arg-type]
+
+    async def run() -> tuple[str, str]:
+        broken = pipeline.submit(Path("broken.txt"))
+        good = pipeline.submit(Path("good.txt"))
+        await wait_for(pipeline, broken.id)
+        await wait_for(pipeline, good.id)
+        pipeline.close()
+        return broken.status, good.status
+
+    assert asyncio.run(run()) == ("failed", "completed")
+    assert len(store.written) == 3
+
+
+def test_only_finished_jobs_are_forgotten() -> None:
+    """Test that the job limit never forgets jobs still in progress."""
+    pipeline = IngestionPipeline(
+        FakeVectorStore(), pin, parse, max_jobs=1  # type: ignore[arg-type]
+    )
+
+    async def run() -> tuple[list[bool], list[bool]]:
+        jobs = [pipeline.submit(Path(f"report{i}.txt")) for i in range(3)]
+        queued = [pipeline.get_job(job.id) is job for job in jobs]
+        await asyncio.gather(*(job.wait() for job in jobs))
+        pipeline.close()
+        return queued, [pipeline.get_job(job.id) is not None for job in jobs]
+
+    queued, finished = asyncio.run(run())
+
+    assert queued == [True, True, True]
+    assert finished.count(True) == 1
+
+
+def test_submit_rejects_work_when_queue_is_full() -> None:
+    """Test that a stalled pipeline pushes back on new submissions."""
+    release = asyncio.Event()
+
+    async def slow_parse(pinned: PinnedFile) -> DocumentSource:
+        await release.wait()
+        return await parse(pinned)
+
+    pipeline = IngestionPipeline(
+        FakeVectorStore(),  # type: ignore[arg-type]
+        pin,
+        slow_parse,
+        parse_workers=1,
+        queue_size=2,
+    )
+
+    async def run() -> None:
+        # One job is being parsed and two fill the queue
+        for i in range(3):
+            pipeline.submit(Path(f"doc{i}.txt"))
+            await asyncio.sleep(0)
+        with pytest.raises(ServiceOverloadedError):
+            pipeline.submit(Path("doc3.txt"))
+        pipeline.close()
+
+    asyncio.run(run())
+
+
+def test_small_documents_share_embedding_calls() -> None:
+    """Test that documents queued behind a busy embed worker are embedded together."""
+    store = FakeVectorStore()
+    calls: list[int] = []
+
+    def slow_embed(texts: list[str]) -> np.ndarray:
+        calls.append(len(texts))
+        time.sleep(0.05)
+        return np.zeros((len(texts), 1), dtype=np.float32)
+
+    store.embed_chunks = slow_embed  # type: ignore[method-assign]
+    pipeline = IngestionPipeline(store, pin, parse)  # type: ignore[arg-type]
+
+    async def run() -> None:
+        jobs = [await pipeline.enqueue(Path(f"doc{i}.txt")) for i in range(6)]
+        await asyncio.gather(*(job.wait() for job in jobs))
+        pipeline.close()
+        assert all(job.status == "completed" for job in jobs)
+
+    asyncio.run(run())
+
+    assert sum(calls) == 18
+    assert len(calls) < 6
+    assert store.commits < 6
+
+
+def test_document_embedding_leaves_query_workers_free() -> None:
+    """Test that a long document embedding never blocks query embeddings."""
+    store = FakeVectorStore()
+    embedding = threading.Event()
+    release = threading.Event()
+
+    def blocking_embed(texts: list[str]) -> np.ndarray:
+        embedding.set()
+        release.wait(timeout=5)
+        return np.zeros((len(texts), 1), dtype=np.float32)
+
+    store.embed_chunks = blocking_embed  # type: ignore[method-assign]
+    pipeline = IngestionPipeline(store, pin, parse)  # type: ignore[arg-type]
+
+    async def run() -> None:
+        job = pipeline.submit(Path("large.txt"))
+        while not embedding.is_set():
+            await asyncio.sleep(0.01)
+        try:
+            query = executors.embedding.run(lambda: "query")
+            assert await asyncio.wait_for(query, timeout=1) == "query"
+        finally:
+            release.set()
+        await job.wait()
+        pipeline.close()
+        assert job.status == "completed"
+
+    asyncio.run(run())
+
+
+def test_document_chunking_leaves_vector_db_workers_free() -> None:
+    """Test that chunking a document never blocks searches on vector_db."""
+    store = FakeVectorStore()
+    chunking = threading.Event()
+    release = threading.Event()
+    threads: list[str] = []
+    prepare = store.prepare_document
+
+    def blocking_prepare(
+        document: dict[str, Any], stored: dict[str, dict[str, Any]]
+    ) -> Iterator[ChunkBatch | DocumentUpdate]:
+        for item in prepare(document, stored):
+            threads.append(threading.current_thread().name)
+            chunking.set()
+            release.wait(timeout=5)
+            yield item
+
+    store.prepare_document = blocking_prepare  # type: ignore[method-assign]
+    pipeline = IngestionPipeline(store, pin, parse)  # type: ignore[arg-type]
+
+    async def run() -> None:
+        job = pipeline.submit(Path("large.txt"))
+        while not chunking.is_set():
+            await asyncio.sleep(0.01)
+        try:
+            search = executors.vector_db.run(lambda: "search")
+            assert await asyncio.wait_for(search, timeout=1) == "search"
+        finally:
+            release.set()
+        await job.wait()
+        pipeline.close()
+        assert job.status == "completed"
+
+    asyncio.run(run())
+    assert threads and all(name.startswith("chunking") for name in threads)
+
+
+def test_chunk_ids_are_stable_and_distinguish_repeats() -> None:
+    """Test that chunk IDs depend only on the document ID and the text."""
+    first = chunk_ids("doc", ["same", "other", "same"])
+
+    assert first == chunk_ids("doc", ["same", "other", "same"])
+    assert len(set(first)) == 3
+    assert chunk_ids("doc", ["other"])[0] == first[1]
+
+
+def test_reupload_only_embeds_changed_chunks() -> None:
+    """Test that identical uploads are skipped and edits are diffed."""
+    store = FakeVectorStore()
+    pipeline = IngestionPipeline(store, pin, parse)  # type: ignore[arg-type]
+
+    async def ingest(name: str) -> dict[str, Any]:
+        job = await pipeline.enqueue(Path(name), {"filename": "doc.txt"})
+        await job.wait()
+        return job.to_dict()
+
+    async def run() -> list[dict[str, Any]]:
+        # The three uploads stand for the same stored file at different times
+        original = await ingest("doc.txt")
+        identical = await ingest("doc.txt")
+        CONTENTS["doc.txt"] = CONTENTS["edited.txt"]
+        try:
+            edited = await ingest("doc.txt")
+        finally:
+            del CONTENTS["doc.txt"]
+        pipeline.close()
+        return [original, identical, edited]
+
+    original, identical, edited = asyncio.run(run())
+
+    assert (original["new_chunks"], original["unchanged"]) == (3, False)
+    assert identical["unchanged"] and "chunk" not in identical["stages"]
+    assert (edited["new_chunks"], edited["deleted_chunks"]) == (1, 1)
+    assert store.commits == 2
+    assert len(store.written) == 4
+
+
+def test_fingerprint_comes_from_the_content_parsed() -> None:
+    """Test that a file replaced after upload is indexed as the content parsed."""
+    store = FakeVectorStore()
+    pipeline = IngestionPipeline(store, pin, parse)  # type: ignore[arg-type]
+    original = sha256_of(content_of(Path("doc.txt")))
+
+    async def run() -> dict[str, Any]:
+        first = await pipeline.enqueue(Path("doc.txt"), {"sha256": original})
+        await first.wait()
+        # Queued with the hash taken at upload, but replaced before parsing
+        CONTENTS["doc.txt"] = CONTENTS["edited.txt"]
+        try:
+            second = await pipeline.enqueue(Path("doc.txt"), {"sha256": original})
+            await second.wait()
+        finally:
+            del CONTENTS["doc.txt"]
+        pipeline.close()
+        return second.to_dict()
+
+    second = asyncio.run(run())
+
+    assert not second["unchanged"]
+    assert (second["new_chunks"], second["deleted_chunks"]) == (1, 1)
+    document_id = second["document_id"]
+    assert store.content_hashes[document_id] == sha256_of(CONTENTS["edited.txt"])
+
+
+def test_large_document_is_embedded_while_it_is_chunked() -> None:
+    """Test that new chunks reach embedding in bounded batches as they are made."""
+    store = FakeVectorStore(batch_size=4)
+    chunked: list[int] = []
+    calls: list[tuple[int, int]] = []
+    prepare = store.prepare_document
+
+    def tracking_prepare(
+        document: dict[str, Any], stored: dict[str, dict[str, Any]]
+    ) -> Iterator[ChunkBatch | DocumentUpdate]:
+        for item in prepare(document, stored):
+            if isinstance(item, ChunkBatch):
+                chunked.append(len(item.ids))
+            yield item
+
+    def tracking_embed(texts: list[str]) -> np.ndarray:
+        # How many chunks had been made when this embedding call started
+        calls.append((len(texts), sum(chunked)))
+        time.sleep(0.01)
+        return np.zeros((len(texts), 1), dtype=np.float32)
+
+    store.prepare_document = tracking_prepare  # type: ignore[method-assign]
+    store.embed_chunks = tracking_embed  # type: ignore[method-assign]
+    CONTENTS["long.txt"] = "\n".join(f"line {i}" for i in range(40))
+    pipeline = IngestionPipeline(
+        store, pin, parse, queue_size=1, group_max_chunks=4  # type: ignore[arg-type]
+    )
+
+    async def run() -> dict[str, Any]:
+        job = pipeline.submit(Path("long.txt"))
+        await job.wait()
+        pipeline.close()
+        return job.to_dict()
+
+    try:
+        job = asyncio.run(run())
+    finally:
+        del CONTENTS["long.txt"]
+
+    assert (job["status"], job["new_chunks"], job["chunks"]) == ("completed", 40, 40)
+    assert all(size <= 4 for size, _ in calls)
+    # Embedding started long before the document was fully chunked
+    assert calls[0][1] < 40
+    assert len(store.written) == 40
+    assert store.commits >= 1
+
+
+def test_text_file_is_streamed_from_its_pinned_content(tmp_path: Path) -> None:
+    """Test that plain text reaches the chunker in blocks read from the pin."""
+    store = FakeVectorStore()
+    sizes: list[int] = []
+    pinned_while_chunking: list[bool] = []
+    prepare = store.prepare_document
+
+    def counting(pieces: Iterator[str]) -> Iterator[str]:
+        for piece in pieces:
+            pinned_while_chunking.append(any(tmp_path.glob(".parse-*")))
+            sizes.append(len(piece))
+            yield piece
+
+    def tracking_prepare(
+        document: dict[str, Any], stored: dict[str, dict[str, Any]]
+    ) -> Iterator[ChunkBatch | DocumentUpdate]:
+        return prepare({**document, "pieces": counting(document["pieces"])}, stored)
+
+    store.prepare_document = tracking_prepare  # type: ignore[method-assign]
+    path = tmp_path / "notes.txt"
+    path.write_text("".join(f"{i:04d}" * 250 + "\n" for i in range(3000)))
+    pipeline = IngestionPipeline(store)  # type: ignore[arg-type]
+
+    async def run() -> dict[str, Any]:
+        job = pipeline.submit(path)
+        await job.wait()
+        pipeline.close()
+        return job.to_dict()
+
+    job = asyncio.run(run())
+
+    assert (job["status"], job["new_chunks"]) == ("completed", 3000)
+    assert len(sizes) > 1 and max(sizes) <= READ_BLOCK_SIZE
+    assert all(pinned_while_chunking)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["notes.txt"]
+
+
+def test_document_failed_part_way_is_indexed_again() -> None:
+    """Test that chunks written by a failed run never make the file current."""
+    store = FakeVectorStore(batch_size=1)
+    write_batch = store.write_batch
+    failures = [ValueError("disk full")]
+
+    async def failing_write(batch: ChunkBatch, embeddings: np.ndarray) -> None:
+        await write_batch(batch, embeddings)
+        # Fail once the first batch of the first run is stored
+        if failures:
+            raise failures.pop()
+
+    store.write_batch = failing_write  # type: ignore[method-assign]
+    pipeline = IngestionPipeline(
+        store, pin, parse, group_max_chunks=1  # type: ignore[arg-type]
+    )
+
+    async def run() -> list[dict[str, Any]]:
+        first = await pipeline.enqueue(Path("doc.txt"))
+        await first.wait()
+        second = await pipeline.enqueue(Path("doc.txt"))
+        await second.wait()
+        third = await pipeline.enqueue(Path("doc.txt"))
+        await third.wait()
+        pipeline.close()
+        return [first.to_dict(), second.to_dict(), third.to_dict()]
+
+    first, second, third = asyncio.run(run())
+
+    assert first["status"] == "failed"
+    assert not second["unchanged"] and second["status"] == "completed"
+    assert second["new_chunks"] == 2
+    assert third["unchanged"]
@@ -1,8 +1,14 @@
 """Integration tests for the main FastAPI application."""
 
+from typing import Any
+
+import pytest
 from fastapi.testclient import TestClient
 
+from app.core.config import settings
 from app.main import app
+from app.services import container as container_module
+from app.services.container import container
 
 client = TestClient(app)
 
@@ -20,3 +26,54 @@ def test_health_check() -> None:
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+
+class FakeVectorStore:
+    """Vector store with no embedding model and no results."""
+
+    async def search(self, *args: Any, **kwargs: Any) -> list[Any]:
+        return []
+
+    def stats(self) -> dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+def test_vector_store_is_shared_across_requests(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that repeated searches reuse one vector store instance."""
+    monkeypatch.setattr(container_module, "VectorStore", FakeVectorStore)
+    monkeypatch.setattr(container, "_vector_store", None)
+    monkeypatch.setattr(container, "vector_store_instances", 0)
+    monkeypatch.setattr(container, "vector_store_reuses", 0)
+    for _ in range(2):
+        response = client.post(
+            f"{settings.API_V1_STR}/documents/search",
+            json={"query": "test", "limit": 1},
+        )
+        assert response.status_code == 200
+
+    services = client.get("/metrics").json()["services"]
+    assert services["vector_store"]["instances"] == 1
+    assert services["vector_store"]["reuses"] >= 1
+
+
+def test_bulk_upload_rejects_more_files_than_the_limit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that too many multipart files get a 413 naming the limit."""
+    monkeypatch.setattr(settings, "MAX_BULK_UPLOAD_FILES", 2)
+
+    def no_pipeline() -> None:
+        raise AssertionError("the request should be rejected before ingestion")
+
+    monkeypatch.setattr(container, "get_ingestion_pipeline", no_pipeline)
+    files = [("files", (f"doc{i}.txt", b"text", "text/plain")) for i in range(3)]
+
+    response = client.post(f"{settings.API_V1_STR}/documents/bulk", files=files)
+
+    assert response.status_code == 413
+    assert "limit is 2" in response.json()["detail"]
@@ -0,0 +1,90 @@
+"""Unit tests for the process-wide model registry with stub loaders."""
+
+from typing import Any
+
+import pytest
+
+from app.services import model_registry as model_registry_module
+from app.services.model_registry import ModelRegistry
+
+
+class StubLoader:
+    """Stand-in for a Hugging Face ``from_pretrained`` factory."""
+
+    def __init__(self, kind: str) -> None:
+        """Initialize with no loads."""
+        self.kind = kind
+        self.loads: list[str] = []
+
+    def from_pretrained(self, model_name: str, **kwargs: Any) -> tuple[str, str]:
+        """Record the load and return a marker object."""
+        self.loads.append(model_name)
+        return (self.kind, model_name)
+
+
+@pytest.fixture
+def loaders(monkeypatch: pytest.MonkeyPatch) -> dict[str, Any]:
+    """Replace the tokenizer, model and pipeline factories with stubs."""
+    stubs: dict[str, Any] = {
+        "tokenizer": StubLoader("tokenizer"),
+        "model": StubLoader("model"),
+        "pipelines": [],
+    }
+
+    def stub_pipeline(task: str, **kwargs: Any) -> dict[str, Any]:
+        stubs["pipelines"].append(kwargs)
+        return kwargs
+
+    monkeypatch.setattr(model_registry_module, "AutoTokenizer", stubs["tokenizer"])
+    monkeypatch.setattr(model_registry_module, "AutoModelForCausalLM", stubs["model"])
+    monkeypatch.setattr(model_registry_module, "pipeline", stub_pipeline)
+    return stubs
+
+
+def test_same_settings_share_one_pipeline(loaders: dict[str, Any]) -> None:
+    """Test that repeated requests reuse the loaded model and pipeline."""
+    registry = ModelRegistry()
+
+    first = registry.get("stub-llm", 64, 0.5, 0.9)
+    second = registry.get("stub-llm", 64, 0.5, 0.9)
+
+    assert first is second
+    assert first.model == ("model", "stub-llm")
+    assert first.pipe["max_new_tokens"] == 64
+    assert loaders["model"].loads == ["stub-llm"]
+    assert registry.stats() == {
+        "models": ["stub-llm"],
+        "model_loads": 1,
+        "pipeline_loads": 1,
+        "hits": 1,
+    }
+
+
+def test_different_settings_share_the_weights(loaders: dict[str, Any]) -> None:
+    """Test that a new pipeline for other settings reuses loaded weights."""
+    registry = ModelRegistry()
+
+    cold = registry.get("stub-llm", 64, 0.2, 0.9)
+    warm = registry.get("stub-llm", 64, 0.8, 0.9)
+
+    assert cold.pipe is not warm.pipe
+    assert cold.model is warm.model and cold.tokenizer is warm.tokenizer
+    assert [kwargs["temperature"] for kwargs in loaders["pipelines"]] == [0.2, 0.8]
+    assert (registry.model_loads, registry.pipeline_loads) == (1, 2)
+
+
+def test_tokenizer_loaded_alone_is_reused_by_the_model(
+    loaders: dict[str, Any],
+) -> None:
+    """Test that counting tokens first never loads the tokenizer twice."""
+    registry = ModelRegistry()
+
+    tokenizer = registry.get_tokenizer("stub-llm")
+    assert loaders["model"].loads == []
+
+    assert registry.get("stub-llm").tokenizer is tokenizer
+    assert registry.get_tokenizer("stub-llm") is tokenizer
+    assert loaders["tokenizer"].loads == ["stub-llm"]
+
+    registry.clear()
+    assert registry.stats()["models"] == []
@@ -0,0 +1,67 @@
+"""Tests for the prompt prefix KV cache."""
+
+from typing import Any
+
+import torch
+
+from app.services.prefix_cache import PrefixKVCache
+
+BLOCK = 4
+
+
+def kv(length: int, layers: int = 2, start: float = 0) -> list[Any]:
+    """Fake keys and values whose entries record their token position."""
+    positions = torch.arange(length, dtype=torch.float32) + start
+    tensor = positions.view(1, 1, length, 1).expand(1, 2, length, 8).contiguous()
+    return [(tensor, tensor + 1000) for _ in range(layers)]
+
+
+def test_lookup_returns_longest_shared_block_prefix() -> None:
+    cache = PrefixKVCache(max_bytes=1 << 20, block_tokens=BLOCK)
+    stored = list(range(10))
+    cache.put(stored, kv(10))
+
+    layers, length = cache.lookup([0, 1, 2, 3, 4, 5, 99, 99, 99])
+    assert length == 4
+    assert torch.equal(layers[0][0][0, 0, :, 0], torch.arange(4.0))
+
+    # A prompt that only extends the stored one reuses every stored block
+    _, length = cache.lookup(stored + [10, 11, 12])
+    assert length == 8
+
+    # The last token is always left for prefill to produce logits
+    _, length = cache.lookup(list(range(8)))
+    assert length == 4
+
+    _, length = cache.lookup([7, 7, 7, 7, 7])
+    assert length == 0
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_within_budget() -> None:
+    entry_bytes = sum(k.nbytes + v.nbytes for k, v in kv(BLOCK))
+    cache = PrefixKVCache(max_bytes=2 * entry_bytes, block_tokens=BLOCK)
+    first, second, third = [1] * BLOCK, [2] * BLOCK, [3] * BLOCK
+
+    cache.put(first, kv(BLOCK))
+    cache.put(second, kv(BLOCK))
+    # Using the first entry makes the second the least recently used
+    assert cache.lookup(first + [0])[1] == BLOCK
+    cache.put(third, kv(BLOCK))
+
+    assert cache.lookup(first + [0])[1] == BLOCK
+    assert cache.lookup(second + [0])[1] == 0
+    assert cache.lookup(third + [0])[1] == BLOCK
+    assert cache.stats()["bytes"] <= 2 * entry_bytes
+    assert cache.stats()["evictions"] == 1
+
+
+def test_stored_entries_do_not_share_memory_with_the_source() -> None:
+    cache = PrefixKVCache(max_bytes=1 << 20, block_tokens=BLOCK)
+    source = kv(6)
+    cache.put(list(range(6)), source)
+    source[0][0].fill_(-1)
+
+    layers, _ = cache.lookup(list(range(6)))
+    assert torch.equal(layers[0][0][0, 0, :, 0], torch.arange(4.0))
@@ -0,0 +1,188 @@
+"""Tests for token streaming and cancellation of RAG generation."""
+
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import Future
+from typing import Any
+
+import pytest
+import torch
+
+from app.api.rag import sse_stream
+from app.core.config import settings
+from app.core.exceptions import GenerationTimeoutError
+from app.core.metrics import metrics
+from app.services.cancellation import (
+    DEADLINE,
+    DISCONNECTED,
+    CancellationCriteria,
+    CancellationToken,
+)
+from app.services.model_registry import LoadedModel
+from app.services.rag_service import RAGService
+
+VOCAB = {1: "<s>", 2: "prompt ", 3: "Hello ", 4: "world"}
+
+
+@pytest.fixture(autouse=True)
+def unbatched(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run generation through the fake pipelines instead of the scheduler."""
+    monkeypatch.setattr(settings, "GENERATION_MAX_BATCH_SIZE", 1)
+
+
+class FakeTokenizer:
+    """Tokenizer decoding ids from a fixed vocabulary, one token per word."""
+
+    def __call__(self, text: str, **kwargs: Any) -> dict[str, list[int]]:
+        return {"input_ids": [0] * len(text.split())}
+
+    def decode(self, ids: list[int], **kwargs: Any) -> str:
+        return "".join(VOCAB[int(i)] for i in ids)
+
+
+class FakeRegistry:
+    """Registry handing out a fixed tokenizer and pipeline."""
+
+    def __init__(self, pipe: Any) -> None:
+        self.pipe = pipe
+
+    def get(self, *args: Any, **kwargs: Any) -> LoadedModel:
+        return LoadedModel(FakeTokenizer(), None, self.pipe)
+
+
+class FakeVectorStore:
+    """Vector store returning a single context chunk."""
+
+    corpus_generation = 0
+
+    async def search(self, query: str, limit: int = 3) -> list[tuple[Any, ...]]:
+        return [({"document_id": "doc"}, 0.9, "Greetings are polite.")]
+
+
+def test_first_token_arrives_before_generation_finishes() -> None:
+    release = threading.Event()
+
+    def pipe(prompt: str, streamer: Any, **kwargs: Any) -> None:
+        streamer.put(torch.tensor([[1, 2]]))
+        streamer.put(torch.tensor([3]))
+        # Hold generation until the consumer has seen the first word
+        assert release.wait(timeout=5)
+        streamer.put(torch.tensor([4]))
+        streamer.end()
+
+    service = RAGService(FakeVectorStore(), registry=FakeRegistry(pipe))
+
+    async def run() -> list[dict[str, Any]]:
+        events = []
+        async for event in service.generate_streaming_response("Say hello"):
+            events.append(event)
+            release.set()
+        return events
+
+    events = asyncio.run(run())
+    assert [e["token"] for e in events[:-1]] == ["Hello ", "world"]
+    assert events[-1]["finished"] is True
+    assert events[-1]["context"][0][2] == "Greetings are polite."
+
+
+def test_generation_error_is_sent_as_error_event() -> None:
+    def pipe(prompt: str, streamer: Any, **kwargs: Any) -> None:
+        streamer.put(torch.tensor([[1, 2]]))
+        streamer.put(torch.tensor([3]))
+        raise RuntimeError("out of memory")
+
+    service = RAGService(FakeVectorStore(), registry=FakeRegistry(pipe))
+
+    async def run() -> list[str]:
+        events: AsyncIterator[dict[str, Any]] = service.generate_streaming_response(
+            "Say hello"
+        )
+        return [message async for message in sse_stream(events)]
+
+    messages = asyncio.run(run())
+    assert messages[0] == 'data: {"token": "Hello ", "finished": false}\n\n'
+    assert messages[-1].startswith("event: error\ndata: ")
+    assert "out of memory" in messages[-1]
+
+
+def endless_pipe(steps: list[int]) -> Any:
+    """Build a pipeline that decodes until a stopping criterion fires."""
+
+    def pipe(prompt: str, stopping_criteria: Any, streamer: Any = None) -> Any:
+        if streamer is not None:
+            streamer.put(torch.tensor([[1, 2]]))
+        for step in range(1, 1000):
+            if streamer is not None:
+                streamer.put(torch.tensor([3]))
+            steps.append(step)
+            if stopping_criteria(torch.tensor([[1, 2] + [3] * step]), None).all():
+                break
+            time.sleep(0.005)
+        if streamer is not None:
+            streamer.end()
+        return [{"generated_text": prompt + " Hello"}]
+
+    return pipe
+
+
+def test_deadline_stops_generation_within_one_step() -> None:
+    steps: list[int] = []
+    service = RAGService(FakeVectorStore(), registry=FakeRegistry(endless_pipe(steps)))
+    cancelled = metrics.counter(f"generations_cancelled_{DEADLINE}")
+    before = cancelled.value
+
+    token = CancellationToken(timeout=0.05)
+    with pytest.raises(GenerationTimeoutError):
+        asyncio.run(
+            service.generate_response("hi", use_cache=False, cancel_token=token)
+        )
+
+    assert steps[-1] < 999
+    assert cancelled.value == before + 1
+
+
+def test_closing_the_stream_cancels_generation() -> None:
+    steps: list[int] = []
+    service = RAGService(FakeVectorStore(), registry=FakeRegistry(endless_pipe(steps)))
+    cancelled = metrics.counter(f"generations_cancelled_{DISCONNECTED}")
+    saved = metrics.counter("generation_tokens_saved")
+    before, saved_before = cancelled.value, saved.value
+    token = CancellationToken()
+
+    async def run() -> None:
+        events = service.generate_streaming_response("hi", cancel_token=token)
+        await events.__anext__()
+        # The client goes away after the first word
+        await events.aclose()
+        while cancelled.value == before:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert token.reason == DISCONNECTED
+    assert steps[-1] < 999
+    assert saved.value > saved_before
+
+
+def test_generation_cancelled_before_it_starts_ends_the_stream() -> None:
+    service = RAGService(FakeVectorStore(), registry=FakeRegistry(None))
+
+    def start_cancelled(prompt: str, token: CancellationToken, streamer: Any) -> Any:
+        # As when the scheduler drops queued requests while shutting down
+        future: Future[str] = Future()
+        future.cancel()
+        return future, CancellationCriteria(token)
+
+    service._start_generation = start_cancelled  # type: ignore[method-assign]
+
+    async def run() -> list[str]:
+        events: AsyncIterator[dict[str, Any]] = service.generate_streaming_response(
+            "Say hello"
+        )
+        return [message async for message in sse_stream(events)]
+
+    messages = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert len(messages) == 1
+    assert messages[0].startswith("event: error\ndata: ")
+    assert "cancelled before it started" in messages[0]
@@ -0,0 +1,73 @@
+"""Unit tests for the BM25 sparse index."""
+
+from pathlib import Path
+
+from app.services.sparse_index import SparseIndex, tokenize
+
+
+def build_index() -> SparseIndex:
+    """Build a small index over two documents."""
+    index = SparseIndex()
+    index.add(
+        ["a_0", "a_1"],
+        "a",
+        ["Error ERR-1234 occurs on startup", "Restart the service to recover"],
+    )
+    index.add(["b_0"], "b", ["Part number PN-778 ships with the service kit"])
+    return index
+
+
+def test_tokenize_keeps_identifiers_and_their_parts() -> None:
+    """Test that compound identifiers are indexed whole and in parts."""
+    assert tokenize("ERR-1234 v2.3") == ["err-1234", "err", "1234", "v2.3", "v2", "3"]
+
+
+def test_search_ranks_exact_identifier_first() -> None:
+    """Test that an exact identifier query finds the chunk containing it."""
+    index = build_index()
+
+    results = index.search("what does err-1234 mean", limit=3)
+
+    assert results[0][0] == "a_0"
+    assert index.search("pn-778", limit=3)[0][0] == "b_0"
+
+
+def test_remove_document_updates_index_incrementally() -> None:
+    """Test that removing a document drops its chunks from results."""
+    index = build_index()
+
+    index.remove_document("b")
+
+    assert len(index) == 2
+    assert [chunk_id for chunk_id, _ in index.search("service", limit=5)] == ["a_1"]
+
+
+def test_index_round_trips_through_disk(tmp_path: Path) -> None:
+    """Test that a saved index loads with identical results."""
+    index = build_index()
+    index.remove_chunks(["a_1"])
+    path = tmp_path / "sparse.idx"
+
+    index.save(path)
+    loaded = SparseIndex.load(path)
+
+    assert loaded is not None
+    assert len(loaded) == 2
+    assert loaded.search("service", limit=5) == index.search("service", limit=5)
+
+
+def test_unsaved_changes_mark_the_saved_index_stale(tmp_path: Path) -> None:
+    """Test that an index changed after its last save is not loaded."""
+    index = build_index()
+    path = tmp_path / "sparse.idx"
+    index.save(path)
+    assert not index.dirty
+
+    index.remove_document("b")
+    assert index.dirty
+    assert SparseIndex.load(path) is None
+
+    index.save(path)
+    loaded = SparseIndex.load(path)
+    assert loaded is not None
+    assert len(loaded) == 2
@@ -0,0 +1,58 @@
+"""Unit tests for plain text decoding."""
+
+import codecs
+from pathlib import Path
+
+import pytest
+
+from app.services.text_reader import detect_encoding, iter_text_file
+
+TEXT = "Café naïve — résumé\nsecond line\n"
+
+
+@pytest.mark.parametrize(
+    ("data", "encoding"),
+    [
+        (codecs.BOM_UTF8 + TEXT.encode("utf-8"), "utf-8-sig"),
+        (codecs.BOM_UTF16_LE + TEXT.encode("utf-16-le"), "utf-16"),
+        (codecs.BOM_UTF32_LE + TEXT.encode("utf-32-le"), "utf-32"),
+        (TEXT.encode("utf-8"), "utf-8"),
+    ],
+)
+def test_encoding_is_detected_and_decoded(
+    tmp_path: Path, data: bytes, encoding: str
+) -> None:
+    """Test that BOMs and plain UTF-8 decode back to the original text."""
+    path = tmp_path / "doc.txt"
+    path.write_bytes(data)
+
+    assert detect_encoding(data) == encoding
+    assert "".join(iter_text_file(path)) == TEXT
+
+
+def test_blocks_split_characters_and_line_endings(tmp_path: Path) -> None:
+    """Test that characters and CRLFs cut by block boundaries stay whole."""
+    path = tmp_path / "doc.txt"
+    path.write_bytes(TEXT.replace("\n", "\r\n").encode("utf-8") * 50)
+
+    blocks = list(iter_text_file(path, block_size=3))
+
+    assert len(blocks) > 1
+    assert "".join(blocks) == TEXT * 50
+
+
+def test_non_utf8_text_is_not_rejected(tmp_path: Path) -> None:
+    """Test that a legacy single-byte file decodes instead of failing."""
+    path = tmp_path / "legacy.txt"
+    path.write_bytes(("Résumé of the café meeting. " * 20).encode("cp1252"))
+
+    assert detect_encoding(path.read_bytes()) != "utf-8"
+    assert "".join(iter_text_file(path)) == "Résumé of the café meeting. " * 20
+
+
+def test_empty_file_yields_nothing(tmp_path: Path) -> None:
+    """Test that an empty file, which cannot be memory-mapped, is handled."""
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+
+    assert list(iter_text_file(path)) == []
@@ -0,0 +1,157 @@
+"""Unit tests for the vector store with a stub embedding model."""
+
+import asyncio
+import hashlib
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import vector_store as vector_store_module
+from app.services.model_registry import model_registry
+from app.services.vector_store import ChunkBatch, VectorStore
+
+DIMENSION = 8
+
+
+class WhitespaceTokenizer:
+    """Minimal stand-in for a Hugging Face tokenizer: one token per word."""
+
+    def __call__(
+        self,
+        text: str | list[str],
+        add_special_tokens: bool = False,
+        return_offsets_mapping: bool = False,
+    ) -> dict[str, Any]:
+        """Tokenize one text or a batch of texts on whitespace."""
+        if isinstance(text, list):
+            return {"input_ids": [self(t)["input_ids"] for t in text]}
+        spans = [m.span() for m in re.finditer(r"\S+", text)]
+        encoded: dict[str, Any] = {"input_ids": list(range(len(spans)))}
+        if return_offsets_mapping:
+            encoded["offset_mapping"] = spans
+        return encoded
+
+    def num_special_tokens_to_add(self) -> int:
+        """Add no special tokens."""
+        return 0
+
+
+def stub_vector(text: str) -> np.ndarray:
+    """Derive a unit vector from a text's hash."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()[:DIMENSION]
+    vector = np.frombuffer(digest, dtype=np.uint8).astype(np.float32) + 1
+    return vector / np.linalg.norm(vector)
+
+
+class StubEncoder:
+    """Sentence-transformers stand-in embedding each text as its hash."""
+
+    def __init__(self, model_name: str) -> None:
+        """Initialize with no recorded calls."""
+        self.tokenizer = WhitespaceTokenizer()
+        self.max_seq_length = 512
+        self.calls: list[list[str]] = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Return the embedding dimension."""
+        return DIMENSION
+
+    def encode(self, texts: list[str], **kwargs: Any) -> np.ndarray:
+        """Embed texts, recording each call."""
+        self.calls.append(list(texts))
+        return np.array([stub_vector(text) for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[VectorStore]:
+    """Create a vector store persisted under a temporary directory."""
+    monkeypatch.setattr(settings, "CHROMA_DB_DIR", tmp_path / "chromadb")
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_DIR", tmp_path / "embeddings")
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 8)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(vector_store_module, "SentenceTransformer", StubEncoder)
+    monkeypatch.setattr(
+        model_registry, "get_tokenizer", lambda *args: WhitespaceTokenizer()
+    )
+    vector_store = VectorStore()
+    yield vector_store
+    vector_store.close()
+
+
+def document(text: str, content_sha256: str) -> dict[str, Any]:
+    """Build a document as accepted by ``add_document``."""
+    return {
+        "id": "doc",
+        "title": "Doc",
+        "doc_type": "txt",
+        "content": text,
+        "metadata": {"sha256": content_sha256},
+    }
+
+
+def sentences(count: int, prefix: str = "s") -> str:
+    """Build text of one-chunk paragraphs."""
+    return "\n\n".join(f"{prefix}{i} has five words here." for i in range(count))
+
+
+def test_partial_indexing_never_marks_a_document_current(
+    store: VectorStore,
+) -> None:
+    """Test that only a completed run makes a document current."""
+    asyncio.run(store.add_document(document(sentences(3), "a" * 64)))
+    assert store.is_current("doc", "a" * 64)
+
+    # A run for new content writes its first batch and then fails
+    items = store.prepare_document(
+        document(sentences(3, "t"), "b" * 64), store.stored_chunks("doc")
+    )
+    batch = next(items)
+    assert isinstance(batch, ChunkBatch)
+    asyncio.run(store.write_batch(batch, store.embed_chunks(batch.texts)))
+
+    assert not store.is_current("doc", "a" * 64)
+    assert not store.is_current("doc", "b" * 64)
+
+    asyncio.run(store.add_document(document(sentences(3, "t"), "b" * 64)))
+    assert store.is_current("doc", "b" * 64)
+
+    asyncio.run(store.delete_document("doc"))
+    assert not store.is_current("doc", "b" * 64)
+
+
+def test_add_document_embeds_in_write_batches(
+    store: VectorStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that chunks are embedded a write batch at a time, in id order."""
+    monkeypatch.setattr(settings, "VECTOR_WRITE_BATCH_SIZE", 4)
+
+    asyncio.run(store.add_document(document(sentences(10), "a" * 64)))
+
+    encoder = store.embedding_model
+    assert [len(texts) for texts in encoder.calls] == [4, 4, 2]
+    stored = store.collection.get(
+        where={"document_id": "doc"}, include=["documents", "embeddings"]
+    )
+    assert len(stored["ids"]) == 10
+    for text, embedding in zip(stored["documents"], stored["embeddings"]):
+        np.testing.assert_allclose(embedding, stub_vector(text), atol=1e-6)
+
+
+def test_search_returns_the_matching_chunk_first(store: VectorStore) -> None:
+    """Test that dense and hybrid search map stored chunks back to hits."""
+    asyncio.run(store.add_document(document(sentences(6), "a" * 64)))
+    query = "s3 has five words here."
+
+    for mode in ("dense", "hybrid"):
+        hits = asyncio.run(store.search(query, limit=3, mode=mode))
+
+        assert len(hits) == 3
+        hit, score, snippet = hits[0]
+        assert snippet == query
+        assert (hit["document_id"], hit["title"]) == ("doc", "Doc")
+        assert score > hits[1][1]